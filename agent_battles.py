@@ -14,4 +14,11 @@ async def agent_battles():
     print(f"Player {second_player.username} won {second_player.n_won_battles} out of {second_player.n_finished_battles} played")
 
 if __name__ == "__main__":
-    asyncio.get_event_loop().run_until_complete(agent_battles())
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] == "farm":
+        from battle_farm import run_farm
+        n_workers = int(sys.argv[2]) if len(sys.argv) > 2 else None
+        run_farm("random", "random", n_battles=100, n_workers=n_workers, battle_format="gen8randombattle", output_dir=None)
+    else:
+        asyncio.get_event_loop().run_until_complete(agent_battles())
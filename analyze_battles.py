@@ -1,81 +1,44 @@
 import asyncio
-import json
-from poke_env.player import RandomPlayer, MaxBasePowerPlayer
-from poke_env import ServerConfiguration
+from poke_env.player import RandomPlayer
 from custom_strategy_bot import CustomStrategyPlayer, check_super_effective, check_stab_bonus, check_avoid_ineffective, check_high_base_power, check_high_accuracy
+from damage_calc import MaxDamagePlayer
+from tournament import BotConfig, Tournament
+
+
+def make_custom_player(**kwargs):
+    custom = CustomStrategyPlayer(battle_logger=None, **kwargs)
+    custom.add_check("super_effective", check_super_effective, priority=3)
+    custom.add_check("stab", check_stab_bonus, priority=2)
+    custom.add_check("avoid_ineffective", check_avoid_ineffective, priority=2)
+    custom.add_check("base_power", check_high_base_power, priority=1)
+    custom.add_check("accuracy", check_high_accuracy, priority=1)
+    return custom
+
+
+BOTS = [
+    BotConfig("random", RandomPlayer),
+    BotConfig("maxdamage", MaxDamagePlayer),
+    BotConfig("custom", make_custom_player),
+]
+
+
+async def run_bot_comparison(n_battles=50, battle_budget=30, resume=False):
+    tournament = Tournament(
+        BOTS,
+        n_battles=n_battles,
+        battle_format="gen9randombattle",
+        battle_budget=battle_budget,
+        results_path="project_site/battle_results.json",
+        resume=resume,
+    )
+    return await tournament.run()
 
-LOCAL_SERVER = ServerConfiguration(
-    "ws://localhost:8000/showdown/websocket",
-    "http://localhost:8000/action.php?"
-)
-
-async def run_bot_comparison(n_battles=50):
-
-    results = {
-        "random_vs_maxdamage": {"p1_wins": 0, "p2_wins": 0},
-        "random_vs_custom": {"p1_wins": 0, "p2_wins": 0},
-        "maxdamage_vs_custom": {"p1_wins": 0, "p2_wins": 0},
-    }
-
-    print(f"Running {n_battles} battles for each matchup...\n")
-
-    print("=== Random vs MaxDamage ===")
-    random1 = RandomPlayer(battle_format="gen9randombattle", server_configuration=LOCAL_SERVER, max_concurrent_battles=10)
-    maxdamage1 = MaxBasePowerPlayer(battle_format="gen9randombattle", server_configuration=LOCAL_SERVER, max_concurrent_battles=10)
-
-    await random1.battle_against(maxdamage1, n_battles=n_battles)
-    results["random_vs_maxdamage"]["p1_wins"] = random1.n_won_battles
-    results["random_vs_maxdamage"]["p2_wins"] = maxdamage1.n_won_battles
-
-    print(f"Random: {random1.n_won_battles} wins")
-    print(f"MaxDamage: {maxdamage1.n_won_battles} wins\n")
-
-    await random1.close()
-    await maxdamage1.close()
-
-    print("=== Random vs Custom Strategy ===")
-    random2 = RandomPlayer(battle_format="gen9randombattle", server_configuration=LOCAL_SERVER, max_concurrent_battles=10)
-    custom1 = CustomStrategyPlayer(battle_logger=None, battle_format="gen9randombattle", server_configuration=LOCAL_SERVER, max_concurrent_battles=10)
-    custom1.add_check("super_effective", check_super_effective, priority=3)
-    custom1.add_check("stab", check_stab_bonus, priority=2)
-    custom1.add_check("avoid_ineffective", check_avoid_ineffective, priority=2)
-    custom1.add_check("base_power", check_high_base_power, priority=1)
-    custom1.add_check("accuracy", check_high_accuracy, priority=1)
-
-    await random2.battle_against(custom1, n_battles=n_battles)
-    results["random_vs_custom"]["p1_wins"] = random2.n_won_battles
-    results["random_vs_custom"]["p2_wins"] = custom1.n_won_battles
-
-    print(f"Random: {random2.n_won_battles} wins")
-    print(f"Custom: {custom1.n_won_battles} wins\n")
-
-    await random2.close()
-    await custom1.close()
-
-    print("=== MaxDamage vs Custom Strategy ===")
-    maxdamage2 = MaxBasePowerPlayer(battle_format="gen9randombattle", server_configuration=LOCAL_SERVER, max_concurrent_battles=10)
-    custom2 = CustomStrategyPlayer(battle_logger=None, battle_format="gen9randombattle", server_configuration=LOCAL_SERVER, max_concurrent_battles=10)
-    custom2.add_check("super_effective", check_super_effective, priority=3)
-    custom2.add_check("stab", check_stab_bonus, priority=2)
-    custom2.add_check("avoid_ineffective", check_avoid_ineffective, priority=2)
-    custom2.add_check("base_power", check_high_base_power, priority=1)
-    custom2.add_check("accuracy", check_high_accuracy, priority=1)
-
-    await maxdamage2.battle_against(custom2, n_battles=n_battles)
-    results["maxdamage_vs_custom"]["p1_wins"] = maxdamage2.n_won_battles
-    results["maxdamage_vs_custom"]["p2_wins"] = custom2.n_won_battles
-
-    print(f"MaxDamage: {maxdamage2.n_won_battles} wins")
-    print(f"Custom: {custom2.n_won_battles} wins\n")
-
-    await maxdamage2.close()
-    await custom2.close()
-
-    with open('project_site/battle_results.json', 'w') as f:
-        json.dump(results, f, indent=2)
+if __name__ == "__main__":
+    import sys
 
-    print("Results saved to project_site/battle_results.json")
-    return results
+    N_BATTLES = 50
+    positional = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    if positional:
+        N_BATTLES = int(positional[0])
 
-if __name__ == "__main__":
-    asyncio.run(run_bot_comparison(n_battles=50))
+    asyncio.run(run_bot_comparison(n_battles=N_BATTLES, resume="--resume" in sys.argv))
@@ -0,0 +1,245 @@
+import csv
+import json
+import sqlite3
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from tournament import write_json_atomic
+
+Row = Dict[str, Any]
+DECIDED_KEYS = 1 << 17
+
+
+def _is_set(value) -> bool:
+    return value is not None and value != ''
+
+
+def _number(value) -> float:
+    return float(value) if _is_set(value) else 0.0
+
+
+def iter_csv_rows(path: str, offset: int = 0) -> Iterator[Tuple[Row, int]]:
+    with open(path, 'rb') as f:
+        header = next(csv.reader([f.readline().decode('utf-8')]))
+        if offset:
+            f.seek(offset)
+        else:
+            offset = f.tell()
+
+        def complete_lines():
+            nonlocal offset
+            for line in f:
+                if not line.endswith(b'\n'):
+                    return
+                offset += len(line)
+                yield line.decode('utf-8')
+
+        for values in csv.reader(complete_lines()):
+            yield dict(zip(header, values)), offset
+
+
+def iter_sqlite_rows(path: str, offset: int = 0) -> Iterator[Tuple[Row, int]]:
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    conn.row_factory = sqlite3.Row
+    try:
+        for row in conn.execute("SELECT * FROM battle_turns WHERE id > ? ORDER BY id", (offset,)):
+            yield dict(row), row['id']
+    finally:
+        conn.close()
+
+
+READERS = {'.csv': iter_csv_rows, '.db': iter_sqlite_rows, '.sqlite': iter_sqlite_rows}
+
+
+def iter_rows(path: str, offset: int = 0) -> Iterator[Tuple[Row, int]]:
+    reader = READERS.get(Path(path).suffix)
+    if reader is None:
+        raise ValueError(f"Unsupported battle log format: {path}")
+    return reader(path, offset)
+
+
+class BattleAnalytics:
+
+    def __init__(self):
+        self.offsets: Dict[str, int] = {}
+        self.owners: Dict[str, str] = {}
+        self.decided: OrderedDict = OrderedDict()
+        self.bots: Dict[str, Dict[str, float]] = {}
+        self.moves: Dict[str, Counter] = {}
+        self.matchups: Dict[str, List[float]] = {}
+        self.rows = 0
+        self.duplicate_rows = 0
+        self.skipped_rows = 0
+
+    def consume(self, path: str, version: Optional[str] = None) -> int:
+        version = version or Path(path).stem
+        start_rows = self.rows
+        offset = self.offsets.get(path, 0)
+        try:
+            for row, offset in iter_rows(path, offset):
+                self.add(row, version)
+        finally:
+            self.offsets[path] = offset
+        return self.rows - start_rows
+
+    def add(self, row: Row, version: str):
+        self.rows += 1
+        bot = row.get('player_username')
+        tag = row.get('battle_tag')
+        if not bot or not tag:
+            self.skipped_rows += 1
+            return
+        battle_key = f"{tag}|{bot}"
+        label = f"{bot}@{version}"
+        owner = self.owners.get(battle_key)
+        if owner is None:
+            if battle_key in self.decided:
+                self.duplicate_rows += 1
+                return
+            self.owners[battle_key] = version
+            if label not in self.bots:
+                self.bots[label] = {'battles': 0, 'wins': 0, 'losses': 0, 'ties': 0, 'decisions': 0, 'damage': 0.0, 'turns': 0}
+                self.moves[label] = Counter()
+            self.bots[label]['battles'] += 1
+        elif owner != version:
+            self.duplicate_rows += 1
+            return
+        stats = self.bots[label]
+
+        won = row.get('won_battle')
+        if _is_set(won):
+            won = int(float(won))
+            stats['wins' if won > 0 else 'losses' if won == 0 else 'ties'] += 1
+            stats['turns'] += int(_number(row.get('turn')))
+            del self.owners[battle_key]
+            self.decided[battle_key] = version
+            if len(self.decided) > DECIDED_KEYS:
+                self.decided.popitem(last=False)
+            return
+
+        damage = max(_number(row.get('damage_dealt')), 0.0)
+        stats['decisions'] += 1
+        stats['damage'] += damage
+        move = row.get('selected_move')
+        if _is_set(move):
+            self.moves[label][move] += 1
+
+        matchup_key = f"{row.get('active_pokemon') or '?'}|{row.get('opponent_pokemon') or '?'}"
+        matchup = self.matchups.get(matchup_key)
+        if matchup is None:
+            matchup = self.matchups[matchup_key] = [0, 0.0, 0]
+        matchup[0] += 1
+        matchup[1] += damage
+        matchup[2] += int(_number(row.get('fainted')))
+
+    def summary(self, top_moves: int = 5, top_matchups: int = 10) -> Dict[str, Any]:
+        bots = {}
+        for label, stats in self.bots.items():
+            decided = stats['wins'] + stats['losses'] + stats.get('ties', 0)
+            bots[label] = {
+                'battles': stats['battles'],
+                'wins': stats['wins'],
+                'losses': stats['losses'],
+                'ties': stats.get('ties', 0),
+                'undecided': stats['battles'] - decided,
+                'win_rate': round(stats['wins'] / decided * 100, 1) if decided else None,
+                'decisions': stats['decisions'],
+                'damage_per_turn': round(stats['damage'] / stats['decisions'], 2) if stats['decisions'] else 0.0,
+                'turns_per_battle': round(stats['turns'] / decided, 1) if decided else None,
+                'top_moves': dict(self.moves[label].most_common(top_moves)),
+            }
+        matchups = sorted(self.matchups.items(), key=lambda item: (-item[1][0], item[0]))[:top_matchups]
+        return {
+            'rows': self.rows,
+            'duplicate_rows': self.duplicate_rows,
+            'skipped_rows': self.skipped_rows,
+            'bots': bots,
+            'matchups': {
+                key: {'decisions': decisions, 'damage_per_turn': round(damage / decisions, 2), 'knockouts': knockouts}
+                for key, (decisions, damage, knockouts) in matchups
+            },
+        }
+
+    def save(self, checkpoint_path: str):
+        write_json_atomic(Path(checkpoint_path), {
+            'offsets': self.offsets,
+            'owners': self.owners,
+            'decided': list(self.decided.items()),
+            'bots': self.bots,
+            'moves': {label: dict(counter) for label, counter in self.moves.items()},
+            'matchups': self.matchups,
+            'rows': self.rows,
+            'duplicate_rows': self.duplicate_rows,
+            'skipped_rows': self.skipped_rows,
+        })
+
+    @classmethod
+    def load(cls, checkpoint_path: str) -> "BattleAnalytics":
+        analytics = cls()
+        if not Path(checkpoint_path).exists():
+            return analytics
+        with open(checkpoint_path) as f:
+            state = json.load(f)
+        analytics.offsets = state['offsets']
+        analytics.decided = OrderedDict(state.get('decided', ()))
+        analytics.owners = {key: owner for key, owner in state['owners'].items() if key not in analytics.decided}
+        analytics.bots = state['bots']
+        analytics.moves = {label: Counter(counts) for label, counts in state['moves'].items()}
+        analytics.matchups = state['matchups']
+        analytics.rows = state['rows']
+        analytics.duplicate_rows = state['duplicate_rows']
+        analytics.skipped_rows = state.get('skipped_rows', 0)
+        return analytics
+
+
+def analyze(sources: Dict[str, str], checkpoint_path: Optional[str] = None) -> BattleAnalytics:
+    analytics = BattleAnalytics.load(checkpoint_path) if checkpoint_path else BattleAnalytics()
+    for path, version in sources.items():
+        if not Path(path).exists():
+            print(f"Skipping missing battle log {path}")
+            continue
+        analytics.consume(path, version)
+    if checkpoint_path:
+        analytics.save(checkpoint_path)
+    return analytics
+
+
+def default_sources(data_dir: str = "battle_data") -> Dict[str, str]:
+    paths = sorted((path for suffix in READERS for path in Path(data_dir).glob(f"*{suffix}")),
+                   key=lambda path: (path.stat().st_mtime, path.name))
+    return {str(path): path.stem for path in paths}
+
+
+if __name__ == "__main__":
+    import sys
+
+    args = sys.argv[1:]
+    options = {}
+    for flag in ('--checkpoint', '--json'):
+        if flag in args:
+            index = args.index(flag)
+            options[flag] = args[index + 1]
+            del args[index:index + 2]
+
+    sources = {}
+    for arg in args:
+        version, _, path = arg.rpartition('=')
+        sources[path] = version or Path(path).stem
+    analytics = analyze(sources or default_sources(), options.get('--checkpoint'))
+    summary = analytics.summary()
+
+    print(f"{summary['rows']} rows ({summary['duplicate_rows']} duplicates skipped)\n")
+    print(f"{'bot@version':<48} {'battles':>7} {'wins':>5} {'losses':>6} {'ties':>4} {'win %':>6} {'dmg/turn':>8}  top moves")
+    for label, stats in summary['bots'].items():
+        win_rate = f"{stats['win_rate']:.1f}" if stats['win_rate'] is not None else "-"
+        moves = ', '.join(f"{move} ({count})" for move, count in stats['top_moves'].items())
+        print(f"{label:<48} {stats['battles']:>7} {stats['wins']:>5} {stats['losses']:>6} {stats['ties']:>4} {win_rate:>6} "
+              f"{stats['damage_per_turn']:>8.2f}  {moves}")
+    print(f"\n{'matchup':<40} {'decisions':>9} {'dmg/turn':>8} {'KOs':>4}")
+    for key, matchup in summary['matchups'].items():
+        print(f"{key.replace('|', ' vs '):<40} {matchup['decisions']:>9} {matchup['damage_per_turn']:>8.2f} {matchup['knockouts']:>4}")
+
+    if '--json' in options:
+        write_json_atomic(Path(options['--json']), summary)
+        print(f"\nSummary written to {options['--json']}")
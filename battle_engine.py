@@ -0,0 +1,572 @@
+import json
+import math
+import random
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from poke_env.battle import PokemonType
+from poke_env.data import GenData
+from poke_env.data.normalize import to_id_str
+
+from battle_stats import STAT_NAMES, boost_multiplier, stat_value
+from type_tables import TYPE_INDEX, NO_TYPE, tables_for_gen
+
+STATUS_IMMUNITIES = {
+    'brn': {'Fire'},
+    'par': {'Electric'},
+    'psn': {'Poison', 'Steel'},
+    'tox': {'Poison', 'Steel'},
+    'frz': {'Ice'},
+    'slp': set(),
+}
+MAX_TURNS = 300
+TEAM_SIZE = 6
+
+
+def _type_index(type_name: str) -> int:
+    member = PokemonType.__members__.get(type_name.upper())
+    return TYPE_INDEX[member] if member is not None else NO_TYPE
+
+
+def _supported_move(move: Dict[str, Any]) -> bool:
+    if move.get('isNonstandard') or move.get('isZ') or move.get('isMax'):
+        return False
+    if move['id'].startswith('hiddenpower') or move.get('ohko') or move.get('selfdestruct'):
+        return False
+    flags = move.get('flags', {})
+    if 'charge' in flags or 'recharge' in flags or 'damage' in move:
+        return False
+    if move['category'] == 'Status':
+        if move.get('target') == 'self':
+            return bool(move.get('boosts') or move.get('heal'))
+        return move.get('status') in STATUS_IMMUNITIES
+    return move.get('basePower', 0) > 0
+
+
+@lru_cache(maxsize=None)
+def movepools(gen: int) -> Dict[str, Tuple[List[str], List[str]]]:
+    data = GenData.from_gen(gen)
+    prefix = str(gen)
+    pools = {}
+    for species, entry in data.pokedex.items():
+        if entry.get('num', 0) <= 0 or entry.get('evos') or entry.get('forme') or entry.get('battleOnly'):
+            continue
+        learnset = data.learnset.get(species, {}).get('learnset', {})
+        damaging, status = [], []
+        for move_id, sources in learnset.items():
+            move = data.moves.get(move_id)
+            if move is None or not any(source.startswith(prefix) for source in sources):
+                continue
+            move = dict(move, id=move_id)
+            if not _supported_move(move):
+                continue
+            (status if move['category'] == 'Status' else damaging).append(move_id)
+        if len(damaging) >= 3:
+            pools[species] = (sorted(damaging), sorted(status))
+    return pools
+
+
+class SimPokemon:
+
+    __slots__ = (
+        'side', 'species', 'name', 'level', 'types', 'type_indices', 'stats', 'max_hp', 'hp', 'status',
+        'status_turns', 'boosts', 'moves', 'pp', 'ability', 'active',
+    )
+
+    def __init__(self, side: str, species: str, level: int, moves: List[str], data: GenData):
+        entry = data.pokedex[species]
+        self.side = side
+        self.species = species
+        self.name = entry['name']
+        self.level = level
+        self.types = tuple(entry['types'][:2])
+        self.type_indices = (_type_index(self.types[0]), _type_index(self.types[1]) if len(self.types) > 1 else NO_TYPE)
+        base = entry['baseStats']
+        self.stats = {stat: stat_value(base[stat], level) for stat in STAT_NAMES}
+        self.max_hp = self.hp = stat_value(base['hp'], level, hp=True)
+        self.status: Optional[str] = None
+        self.status_turns = 0
+        self.boosts = dict.fromkeys(STAT_NAMES, 0)
+        self.moves = moves
+        self.pp = {move_id: data.moves[move_id]['pp'] * 8 // 5 for move_id in moves}
+        self.ability = to_id_str(entry['abilities']['0'])
+        self.active = False
+
+    @property
+    def fainted(self) -> bool:
+        return self.hp <= 0
+
+    @property
+    def ident(self) -> str:
+        return f"{self.side}: {self.name}"
+
+    @property
+    def active_ident(self) -> str:
+        return f"{self.side}a: {self.name}"
+
+    @property
+    def details(self) -> str:
+        return f"{self.name}, L{self.level}"
+
+    def condition(self, exact: bool = True) -> str:
+        if self.fainted:
+            return "0 fnt"
+        hp = f"{self.hp}/{self.max_hp}" if exact else f"{math.ceil(100 * self.hp / self.max_hp)}/100"
+        return f"{hp} {self.status}" if self.status else hp
+
+    @property
+    def usable_moves(self) -> List[str]:
+        return [move_id for move_id in self.moves if self.pp[move_id] > 0]
+
+    def effective_stat(self, stat: str) -> float:
+        value = self.stats[stat] * boost_multiplier(self.boosts[stat])
+        if stat == 'spe' and self.status == 'par':
+            value *= 0.5
+        return value
+
+    def request_entry(self, include_moves: bool = True) -> Dict[str, Any]:
+        return {
+            'ident': self.ident,
+            'details': self.details,
+            'condition': self.condition(),
+            'active': self.active,
+            'stats': dict(self.stats),
+            'moves': list(self.moves) if include_moves else [],
+            'baseAbility': self.ability,
+            'item': '',
+            'pokeball': 'pokeball',
+            'ability': self.ability,
+        }
+
+
+def random_team(rng: random.Random, side: str, gen: int, size: int = TEAM_SIZE) -> List[SimPokemon]:
+    data = GenData.from_gen(gen)
+    pools = movepools(gen)
+    team = []
+    for species in rng.sample(sorted(pools), size):
+        damaging, status = pools[species]
+        entry = data.pokedex[species]
+        stab = [m for m in damaging if data.moves[m]['type'] in entry['types']]
+        moves = rng.sample(stab, min(2, len(stab)))
+        if status and rng.random() < 0.5:
+            moves.append(rng.choice(status))
+        rest = [m for m in damaging if m not in moves]
+        moves += rng.sample(rest, min(4 - len(moves), len(rest)))
+        bst = sum(entry['baseStats'].values())
+        level = max(70, min(100, 100 - (bst - 400) // 8))
+        team.append(SimPokemon(side, species, level, moves, data))
+    return team
+
+
+class SimSide:
+
+    __slots__ = ('id', 'username', 'team', 'active', 'choice', 'needs_switch')
+
+    def __init__(self, side_id: str, username: str, team: List[SimPokemon]):
+        self.id = side_id
+        self.username = username
+        self.team = team
+        self.active = team[0]
+        self.active.active = True
+        self.choice: Optional[Tuple[str, Any]] = None
+        self.needs_switch = False
+
+    @property
+    def alive(self) -> List[SimPokemon]:
+        return [mon for mon in self.team if not mon.fainted]
+
+    def switch_options(self) -> List[SimPokemon]:
+        return [mon for mon in self.team if not mon.fainted and not mon.active]
+
+
+class SimBattle:
+
+    def __init__(self, battle_tag: str, battle_format: str, usernames: Tuple[str, str], seed: int):
+        self.battle_tag = battle_tag
+        self.battle_format = battle_format
+        self.gen = int(battle_format[3])
+        self.data = GenData.from_gen(self.gen)
+        self.lookup = tables_for_gen(self.gen).pair_lookup
+        self.rng = random.Random(seed)
+        self.sides = {
+            side_id: SimSide(side_id, username, random_team(self.rng, side_id, self.gen))
+            for side_id, username in zip(('p1', 'p2'), usernames)
+        }
+        self.turn = 0
+        self.rqid = 0
+        self.ended = False
+        self.winner: Optional[str] = None
+        self._log: List[Any] = []
+
+    def opponent(self, side: SimSide) -> SimSide:
+        return self.sides['p2' if side.id == 'p1' else 'p1']
+
+    def start(self):
+        p1, p2 = self.sides['p1'], self.sides['p2']
+        self._log += [
+            "|init|battle",
+            f"|title|{p1.username} vs. {p2.username}",
+            "|gametype|singles",
+            f"|player|p1|{p1.username}|1|",
+            f"|player|p2|{p2.username}|2|",
+            f"|teamsize|p1|{len(p1.team)}",
+            f"|teamsize|p2|{len(p2.team)}",
+            f"|gen|{self.gen}",
+            f"|tier|[Gen {self.gen}] Random Battle",
+            "|",
+            "|start",
+        ]
+        for side in (p1, p2):
+            self._log_hp("switch", side.active, f"|{side.active.details}")
+        self._next_turn()
+
+    def _log_hp(self, event: str, mon: SimPokemon, middle: str = "", suffix: str = ""):
+        self._log.append((f"|{event}|{mon.active_ident}{middle}|", mon, mon.condition(True), mon.condition(False), suffix))
+
+    def render(self, side_id: str) -> List[str]:
+        return [
+            entry if isinstance(entry, str) else f"{entry[0]}{entry[2] if entry[1].side == side_id else entry[3]}{entry[4]}"
+            for entry in self._log
+        ]
+
+    def flush_log(self) -> Dict[str, List[str]]:
+        rendered = {side_id: self.render(side_id) for side_id in self.sides}
+        self._log = []
+        return rendered
+
+    def pending_sides(self) -> List[SimSide]:
+        if self.ended:
+            return []
+        if any(side.needs_switch for side in self.sides.values()):
+            return [side for side in self.sides.values() if side.needs_switch]
+        return list(self.sides.values())
+
+    def request(self, side_id: str, include_moves: bool = True) -> Dict[str, Any]:
+        side = self.sides[side_id]
+        self.rqid += 1
+        payload: Dict[str, Any] = {
+            'side': {
+                'name': side.username,
+                'id': side.id,
+                'pokemon': [mon.request_entry(include_moves) for mon in side.team],
+            },
+            'rqid': self.rqid,
+        }
+        if side not in self.pending_sides():
+            payload['wait'] = True
+        elif side.needs_switch:
+            payload['forceSwitch'] = [True]
+        else:
+            active = side.active
+            if active.usable_moves:
+                moves = [
+                    {
+                        'move': self.data.moves[move_id]['name'],
+                        'id': move_id,
+                        'pp': active.pp[move_id],
+                        'maxpp': self.data.moves[move_id]['pp'] * 8 // 5,
+                        'target': self.data.moves[move_id]['target'],
+                        'disabled': active.pp[move_id] <= 0,
+                    }
+                    for move_id in active.moves
+                ]
+            else:
+                moves = [{'move': 'Struggle', 'id': 'struggle', 'pp': 1, 'maxpp': 1, 'target': 'randomNormal', 'disabled': False}]
+            payload['active'] = [{'moves': moves}]
+        return payload
+
+    def request_json(self, side_id: str) -> str:
+        return json.dumps(self.request(side_id), separators=(',', ':'))
+
+    def choose(self, side_id: str, choice: str) -> Optional[str]:
+        side = self.sides[side_id]
+        if side not in self.pending_sides():
+            return "[Invalid choice] Can't do anything: It's not your turn"
+        parts = choice.split()
+        action = parts[0] if parts else 'default'
+        argument = ' '.join(parts[1:])
+
+        if action == 'default':
+            if side.needs_switch:
+                side.choice = ('switch', side.switch_options()[0])
+            else:
+                usable = side.active.usable_moves
+                side.choice = ('move', usable[0] if usable else 'struggle')
+            return None
+        if action == 'switch':
+            target = self._find_switch(side, argument)
+            if target is None:
+                return f"[Invalid choice] Can't switch: {argument} is not a valid switch target"
+            side.choice = ('switch', target)
+            return None
+        if action == 'move' and not side.needs_switch:
+            move_id = self._find_move(side.active, parts[1] if len(parts) > 1 else '')
+            if move_id is None:
+                return f"[Invalid choice] Can't move: {side.active.name} doesn't have a move matching {argument}"
+            side.choice = ('move', move_id)
+            return None
+        return f"[Invalid choice] Can't {action} right now"
+
+    def _find_switch(self, side: SimSide, argument: str) -> Optional[SimPokemon]:
+        options = side.switch_options()
+        if argument.isdigit():
+            index = int(argument) - 1
+            if 0 <= index < len(side.team) and side.team[index] in options:
+                return side.team[index]
+            return None
+        key = to_id_str(argument)
+        for mon in options:
+            if to_id_str(mon.name) == key or mon.species == key:
+                return mon
+        return None
+
+    @staticmethod
+    def _find_move(mon: SimPokemon, argument: str) -> Optional[str]:
+        usable = mon.usable_moves
+        if not usable:
+            return 'struggle' if argument in ('1', 'struggle') else None
+        if argument.isdigit():
+            index = int(argument) - 1
+            key = mon.moves[index] if 0 <= index < len(mon.moves) else None
+        else:
+            key = to_id_str(argument)
+        return key if key in usable else None
+
+    def ready(self) -> bool:
+        return not self.ended and all(side.choice is not None for side in self.pending_sides())
+
+    def forfeit(self, side_id: str):
+        if not self.ended:
+            self._end(self.opponent(self.sides[side_id]).id)
+
+    def resolve(self):
+        pending = self.pending_sides()
+        if any(side.needs_switch for side in pending):
+            for side in pending:
+                self._switch(side, side.choice[1])
+                side.needs_switch = False
+                side.choice = None
+            self._log.append("|")
+            self._next_turn()
+            return
+
+        actions = []
+        for side in pending:
+            kind, value = side.choice
+            side.choice = None
+            if kind == 'switch':
+                actions.append((1, 7, side.active.effective_stat('spe'), self.rng.random(), side, kind, value))
+            else:
+                priority = self.data.moves[value].get('priority', 0)
+                actions.append((0, priority, side.active.effective_stat('spe'), self.rng.random(), side, kind, value))
+        actions.sort(key=lambda action: action[:4], reverse=True)
+
+        self._log.append("|")
+        for *_, side, kind, value in actions:
+            if self.ended:
+                break
+            if kind == 'switch':
+                self._switch(side, value)
+            elif not side.active.fainted:
+                self._use_move(side, value)
+
+        if not self.ended:
+            self._residual()
+        if self.ended:
+            return
+
+        for side in self.sides.values():
+            side.needs_switch = side.active.fainted
+        if not any(side.needs_switch for side in self.sides.values()):
+            self._log.append("|upkeep")
+            self._next_turn()
+
+    def _next_turn(self):
+        self.turn += 1
+        if self.turn > MAX_TURNS:
+            self._end(None)
+            return
+        self._log.append(f"|turn|{self.turn}")
+
+    def _end(self, winner: Optional[str]):
+        self.ended = True
+        self.winner = winner
+        self._log.append(f"|win|{self.sides[winner].username}" if winner else "|tie")
+
+    def _switch(self, side: SimSide, mon: SimPokemon):
+        side.active.active = False
+        side.active.boosts = dict.fromkeys(STAT_NAMES, 0)
+        if side.active.status == 'tox':
+            side.active.status_turns = 0
+        side.active = mon
+        mon.active = True
+        self._log_hp("switch", mon, f"|{mon.details}")
+
+    def _use_move(self, side: SimSide, move_id: str):
+        user = side.active
+        target = self.opponent(side).active
+        move = self.data.moves[move_id]
+
+        if not self._can_move(user):
+            return
+        self._log.append(f"|move|{user.active_ident}|{move['name']}|{target.active_ident}")
+        if move_id in user.pp:
+            user.pp[move_id] -= 1
+
+        if move['category'] == 'Status':
+            self._apply_status_move(user, target, move)
+            return
+
+        accuracy = move.get('accuracy', True)
+        if accuracy is not True and self.rng.random() * 100 >= accuracy:
+            self._log.append(f"|-miss|{user.active_ident}|{target.active_ident}")
+            return
+
+        struggle = move_id == 'struggle'
+        effectiveness = 1.0 if struggle else self.lookup[_type_index(move['type'])][target.type_indices[0]][target.type_indices[1]]
+        if effectiveness == 0:
+            self._log.append(f"|-immune|{target.active_ident}")
+            return
+
+        damage = self._damage(user, target, move, effectiveness, stab=not struggle)
+        if effectiveness > 1:
+            self._log.append(f"|-supereffective|{target.active_ident}")
+        elif effectiveness < 1:
+            self._log.append(f"|-resisted|{target.active_ident}")
+        dealt = min(damage, target.hp)
+        target.hp -= dealt
+        self._log_hp("-damage", target)
+
+        if 'drain' in move and dealt:
+            numerator, denominator = move['drain']
+            self._heal(user, max(1, dealt * numerator // denominator), "|[from] drain")
+        if 'recoil' in move and dealt:
+            numerator, denominator = move['recoil']
+            self._damage_fraction(user, dealt * numerator // denominator, "|[from] Recoil")
+        if struggle:
+            self._damage_fraction(user, user.max_hp // 4, "|[from] Recoil")
+
+        if target.fainted:
+            self._faint(target)
+        elif not user.fainted:
+            secondary = move.get('secondary') or {}
+            if secondary and self.rng.random() * 100 < secondary.get('chance', 100):
+                if secondary.get('status'):
+                    self._inflict(target, secondary['status'])
+                if secondary.get('boosts'):
+                    self._boost(target, secondary['boosts'])
+        self_effect = move.get('self') or {}
+        if self_effect.get('boosts') and not user.fainted and not target.fainted:
+            self._boost(user, self_effect['boosts'])
+        if user.fainted:
+            self._faint(user)
+        self._check_end()
+
+    def _can_move(self, user: SimPokemon) -> bool:
+        if user.status == 'slp':
+            if user.status_turns > 0:
+                user.status_turns -= 1
+                self._log.append(f"|cant|{user.active_ident}|slp")
+                return False
+            user.status = None
+            self._log.append(f"|-curestatus|{user.active_ident}|slp|[msg]")
+        elif user.status == 'frz':
+            if self.rng.random() >= 0.2:
+                self._log.append(f"|cant|{user.active_ident}|frz")
+                return False
+            user.status = None
+            self._log.append(f"|-curestatus|{user.active_ident}|frz|[msg]")
+        elif user.status == 'par' and self.rng.random() < 0.25:
+            self._log.append(f"|cant|{user.active_ident}|par")
+            return False
+        return True
+
+    def _damage(self, user: SimPokemon, target: SimPokemon, move: Dict[str, Any], effectiveness: float,
+                stab: bool = True) -> int:
+        physical = move['category'] == 'Physical'
+        attack = user.effective_stat('atk' if physical else 'spa')
+        defense = target.effective_stat('def' if physical else 'spd')
+        base = ((2 * user.level // 5 + 2) * move['basePower'] * attack / defense) // 50 + 2
+
+        modifier = self.rng.uniform(0.85, 1.0) * effectiveness
+        if stab and move['type'] in user.types:
+            modifier *= 1.5
+        if physical and user.status == 'brn':
+            modifier *= 0.5
+        if self.rng.random() < 1 / 24:
+            modifier *= 1.5
+            self._log.append(f"|-crit|{target.active_ident}")
+        return max(1, int(base * modifier))
+
+    def _apply_status_move(self, user: SimPokemon, target: SimPokemon, move: Dict[str, Any]):
+        if move.get('target') == 'self':
+            if move.get('boosts'):
+                self._boost(user, move['boosts'])
+            if move.get('heal'):
+                numerator, denominator = move['heal']
+                if user.hp == user.max_hp:
+                    self._log.append(f"|-fail|{user.active_ident}")
+                else:
+                    self._heal(user, user.max_hp * numerator // denominator)
+            return
+        accuracy = move.get('accuracy', True)
+        if accuracy is not True and self.rng.random() * 100 >= accuracy:
+            self._log.append(f"|-miss|{user.active_ident}|{target.active_ident}")
+            return
+        if not self._inflict(target, move['status']):
+            self._log.append(f"|-fail|{target.active_ident}")
+
+    def _inflict(self, target: SimPokemon, status: str) -> bool:
+        if target.status or target.fainted or STATUS_IMMUNITIES.get(status, set()) & set(target.types):
+            return False
+        target.status = status
+        target.status_turns = self.rng.randint(1, 3) if status == 'slp' else 0
+        self._log.append(f"|-status|{target.active_ident}|{status}")
+        return True
+
+    def _boost(self, mon: SimPokemon, boosts: Dict[str, int]):
+        for stat, amount in boosts.items():
+            if stat not in mon.boosts:
+                continue
+            before = mon.boosts[stat]
+            mon.boosts[stat] = max(-6, min(6, before + amount))
+            change = mon.boosts[stat] - before
+            if change > 0:
+                self._log.append(f"|-boost|{mon.active_ident}|{stat}|{change}")
+            elif change < 0:
+                self._log.append(f"|-unboost|{mon.active_ident}|{stat}|{-change}")
+
+    def _heal(self, mon: SimPokemon, amount: int, suffix: str = ""):
+        mon.hp = min(mon.max_hp, mon.hp + amount)
+        self._log_hp("-heal", mon, suffix=suffix)
+
+    def _damage_fraction(self, mon: SimPokemon, amount: int, suffix: str):
+        mon.hp = max(0, mon.hp - max(1, amount))
+        self._log_hp("-damage", mon, suffix=suffix)
+
+    def _faint(self, mon: SimPokemon):
+        self._log.append(f"|faint|{mon.active_ident}")
+
+    def _residual(self):
+        for side in self.sides.values():
+            mon = side.active
+            if mon.fainted or mon.status not in ('brn', 'psn', 'tox'):
+                continue
+            if mon.status == 'tox':
+                mon.status_turns += 1
+                amount = mon.max_hp * mon.status_turns // 16
+            else:
+                amount = mon.max_hp // (16 if mon.status == 'brn' else 8)
+            self._damage_fraction(mon, amount, f"|[from] {mon.status}")
+            if mon.fainted:
+                self._faint(mon)
+        self._check_end()
+
+    def _check_end(self):
+        if self.ended:
+            return
+        p1_alive = bool(self.sides['p1'].alive)
+        p2_alive = bool(self.sides['p2'].alive)
+        if p1_alive and p2_alive:
+            return
+        self._end('p1' if p1_alive else 'p2' if p2_alive else None)
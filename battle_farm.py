@@ -0,0 +1,311 @@
+import asyncio
+import multiprocessing
+import os
+import secrets
+import shutil
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from poke_env import AccountConfiguration, ServerConfiguration
+from poke_env.player import Player, RandomPlayer
+
+from custom_strategy_bot import (
+    CustomStrategyPlayer,
+    check_super_effective,
+    check_stab_bonus,
+    check_avoid_ineffective,
+    check_switch_on_bad_matchup,
+    check_setup_on_resist,
+    check_offensive_pressure,
+    check_high_base_power,
+    check_high_accuracy,
+    check_status_moves,
+)
+from logging_player import (
+    BattleDataLogger,
+    CSVBattleLogger,
+    BufferedCSVBattleLogger,
+    SQLiteBattleLogger,
+    LoggingRandomPlayer,
+    LoggingMaxDamagePlayer,
+)
+from damage_calc import MaxDamagePlayer
+from search_player import SearchPlayer
+from switch_rollouts import RolloutSwitchEvaluator
+from tournament import LOCAL_SERVER, close_player, write_json_atomic
+
+
+def random_player(battle_logger: Optional[BattleDataLogger], **kwargs) -> Player:
+    if battle_logger is None:
+        return RandomPlayer(**kwargs)
+    return LoggingRandomPlayer(battle_logger=battle_logger, **kwargs)
+
+
+def max_damage_player(battle_logger: Optional[BattleDataLogger], **kwargs) -> Player:
+    if battle_logger is None:
+        return MaxDamagePlayer(**kwargs)
+    return LoggingMaxDamagePlayer(battle_logger=battle_logger, **kwargs)
+
+
+def add_custom_checks(bot: CustomStrategyPlayer) -> CustomStrategyPlayer:
+    bot.add_check("super_effective", check_super_effective, priority=4)
+    bot.add_check("stab", check_stab_bonus, priority=2)
+    bot.add_check("avoid_ineffective", check_avoid_ineffective, priority=3)
+    bot.add_check("switch_bad_matchup", check_switch_on_bad_matchup, priority=3)
+    bot.add_check("setup_on_resist", check_setup_on_resist, priority=2)
+    bot.add_check("offensive_pressure", check_offensive_pressure, priority=2)
+    bot.add_check("base_power", check_high_base_power, priority=1)
+    bot.add_check("accuracy", check_high_accuracy, priority=1)
+    bot.add_check("status", check_status_moves, priority=1)
+    return bot
+
+
+def custom_player(battle_logger: Optional[BattleDataLogger], **kwargs) -> Player:
+    return add_custom_checks(CustomStrategyPlayer(battle_logger=battle_logger, **kwargs))
+
+
+def rollout_player(battle_logger: Optional[BattleDataLogger], **kwargs) -> Player:
+    return add_custom_checks(CustomStrategyPlayer(battle_logger=battle_logger, switch_evaluator=RolloutSwitchEvaluator(),
+                                                  **kwargs))
+
+
+def search_player(battle_logger: Optional[BattleDataLogger], **kwargs) -> Player:
+    return add_custom_checks(SearchPlayer(battle_logger=battle_logger, **kwargs))
+
+
+FARM_BOTS: Dict[str, Callable[..., Player]] = {
+    'random': random_player,
+    'maxdamage': max_damage_player,
+    'custom': custom_player,
+    'rollout': rollout_player,
+    'search': search_player,
+}
+
+LOGGERS: Dict[str, Callable[[str], BattleDataLogger]] = {
+    'csv': BufferedCSVBattleLogger,
+    'sqlite': SQLiteBattleLogger,
+}
+
+SUFFIXES = {'csv': '.csv', 'sqlite': '.db'}
+
+
+def split_battles(n_battles: int, n_shards: int) -> List[int]:
+    base, extra = divmod(n_battles, n_shards)
+    return [base + (1 if shard < extra else 0) for shard in range(n_shards) if base or shard < extra]
+
+
+def shard_path(output_dir: Path, name: str, shard: int, log_format: str) -> Path:
+    return output_dir / f"{name}.shard{shard}{SUFFIXES[log_format]}"
+
+
+def merge_csv_shards(shards: List[Path], output_path: Path):
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, 'a', newline='', encoding='utf-8') as out:
+        wrote_header = out.tell() > 0
+        for shard in shards:
+            if not shard.exists():
+                continue
+            with open(shard, newline='', encoding='utf-8') as f:
+                header = f.readline()
+                if not wrote_header:
+                    out.write(header)
+                    wrote_header = True
+                shutil.copyfileobj(f, out)
+
+
+def merge_sqlite_shards(shards: List[Path], output_path: Path):
+    SQLiteBattleLogger(str(output_path)).close()
+    columns = ', '.join(CSVBattleLogger.fieldnames)
+    conn = sqlite3.connect(output_path)
+    try:
+        for shard in shards:
+            if not shard.exists():
+                continue
+            conn.execute("ATTACH DATABASE ? AS shard", (str(shard),))
+            with conn:
+                conn.execute(f"INSERT INTO battle_turns ({columns}) SELECT {columns} FROM shard.battle_turns ORDER BY id")
+            conn.execute("DETACH DATABASE shard")
+    finally:
+        conn.close()
+
+
+MERGERS = {'csv': merge_csv_shards, 'sqlite': merge_sqlite_shards}
+
+
+def _account(bot: str, run_id: str, shard: int, role: str) -> AccountConfiguration:
+    return AccountConfiguration(f"{bot[:6]}{run_id}s{shard}{role}"[:18], None)
+
+
+async def _play_shard(shard: int, n_battles: int, p1_bot: str, p2_bot: str, run_id: str, battle_format: str,
+                      server_configuration: ServerConfiguration, output_dir: Optional[str], log_format: str,
+                      max_concurrent_battles: int) -> Dict[str, Any]:
+    loggers = []
+    players = []
+    for role, bot in (('a', p1_bot), ('b', p2_bot)):
+        logger = None
+        if output_dir is not None:
+            logger = LOGGERS[log_format](str(shard_path(Path(output_dir), f"{bot}_{role}", shard, log_format)))
+            loggers.append(logger)
+        players.append(FARM_BOTS[bot](
+            logger,
+            battle_format=battle_format,
+            server_configuration=server_configuration,
+            account_configuration=_account(bot, run_id, shard, role),
+            max_concurrent_battles=max_concurrent_battles,
+        ))
+
+    p1, p2 = players
+    start = time.perf_counter()
+    try:
+        await p1.battle_against(p2, n_battles=n_battles)
+    finally:
+        for player in players:
+            await close_player(player)
+        for logger in loggers:
+            await logger.aclose()
+
+    return {
+        'shard': shard,
+        'pid': os.getpid(),
+        'p1_wins': p1.n_won_battles,
+        'p2_wins': p2.n_won_battles,
+        'battles': p1.n_finished_battles,
+        'elapsed_seconds': round(time.perf_counter() - start, 2),
+    }
+
+
+def run_shard(*args) -> Dict[str, Any]:
+    return asyncio.run(_play_shard(*args))
+
+
+class BattleFarm:
+    def __init__(
+        self,
+        p1_bot: str = "maxdamage",
+        p2_bot: str = "maxdamage",
+        n_battles: int = 100,
+        n_workers: Optional[int] = None,
+        battle_format: str = "gen8randombattle",
+        server_configuration: ServerConfiguration = LOCAL_SERVER,
+        output_dir: Optional[str] = "battle_data",
+        log_format: str = "csv",
+        max_concurrent_battles: int = 1,
+        results_path: Optional[str] = None,
+    ):
+        for bot in (p1_bot, p2_bot):
+            if bot not in FARM_BOTS:
+                raise ValueError(f"Unknown farm bot {bot!r}, expected one of {sorted(FARM_BOTS)}")
+        if log_format not in LOGGERS:
+            raise ValueError(f"Unknown log format {log_format!r}, expected one of {sorted(LOGGERS)}")
+
+        self.p1_bot = p1_bot
+        self.p2_bot = p2_bot
+        self.n_battles = n_battles
+        self.n_workers = n_workers or os.cpu_count() or 1
+        self.battle_format = battle_format
+        self.server_configuration = server_configuration
+        self.output_dir = Path(output_dir) if output_dir is not None else None
+        self.log_format = log_format
+        self.max_concurrent_battles = max_concurrent_battles
+        self.results_path = Path(results_path) if results_path else None
+        self.run_id = secrets.token_hex(2)
+
+    @property
+    def shard_dir(self) -> Optional[Path]:
+        return self.output_dir / f"farm_{self.run_id}" if self.output_dir is not None else None
+
+    def merged_path(self, bot: str, role: str) -> Path:
+        return self.output_dir / f"farm_{bot}_{role}{SUFFIXES[self.log_format]}"
+
+    def run(self) -> Dict[str, Any]:
+        shard_sizes = split_battles(self.n_battles, self.n_workers)
+        shard_dir = str(self.shard_dir) if self.shard_dir is not None else None
+        print(f"Farming {self.n_battles} {self.p1_bot} vs {self.p2_bot} battles "
+              f"across {len(shard_sizes)} worker processes")
+
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=len(shard_sizes), mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = [
+                pool.submit(
+                    run_shard, shard, n, self.p1_bot, self.p2_bot, self.run_id, self.battle_format,
+                    self.server_configuration, shard_dir, self.log_format, self.max_concurrent_battles,
+                )
+                for shard, n in enumerate(shard_sizes)
+            ]
+            shards = []
+            for future in futures:
+                try:
+                    shards.append(future.result())
+                except Exception as e:
+                    print(f"Farm shard failed: {e}")
+        wall_clock = time.perf_counter() - start
+
+        if self.shard_dir is not None:
+            self._merge_shards(len(shard_sizes))
+
+        battles = sum(shard['battles'] for shard in shards)
+        results = {
+            'p1': self.p1_bot,
+            'p2': self.p2_bot,
+            'p1_wins': sum(shard['p1_wins'] for shard in shards),
+            'p2_wins': sum(shard['p2_wins'] for shard in shards),
+            'battles': battles,
+            'workers': len(shard_sizes),
+            'wall_clock_seconds': round(wall_clock, 2),
+            'battles_per_second': round(battles / wall_clock, 3) if wall_clock > 0 else 0.0,
+            'shards': shards,
+        }
+        if self.results_path is not None:
+            write_json_atomic(self.results_path, results)
+
+        print(f"{self.p1_bot}: {results['p1_wins']} wins / {self.p2_bot}: {results['p2_wins']} wins "
+              f"({battles} battles in {wall_clock:.1f}s, {results['battles_per_second']:.2f} battles/s)")
+        return results
+
+    def _merge_shards(self, n_shards: int):
+        merge = MERGERS[self.log_format]
+        for bot, role in ((self.p1_bot, 'a'), (self.p2_bot, 'b')):
+            shards = [shard_path(self.shard_dir, f"{bot}_{role}", shard, self.log_format) for shard in range(n_shards)]
+            output_path = self.merged_path(bot, role)
+            merge(shards, output_path)
+            print(f"Merged {n_shards} shards into {output_path}")
+        shutil.rmtree(self.shard_dir, ignore_errors=True)
+
+
+def run_farm(p1_bot: str = "maxdamage", p2_bot: str = "maxdamage", n_battles: int = 100,
+             n_workers: Optional[int] = None, **kwargs) -> Dict[str, Any]:
+    return BattleFarm(p1_bot, p2_bot, n_battles=n_battles, n_workers=n_workers, **kwargs).run()
+
+
+if __name__ == "__main__":
+    import sys
+
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    p1_bot = args[0] if len(args) > 0 else "maxdamage"
+    p2_bot = args[1] if len(args) > 1 else p1_bot
+    n_battles = int(args[2]) if len(args) > 2 else 100
+    n_workers = int(args[3]) if len(args) > 3 else None
+
+    server_configuration = LOCAL_SERVER
+    mock_server = None
+    if "--mock" in sys.argv:
+        from mock_showdown import MockShowdownServer
+        mock_server = MockShowdownServer()
+        server_configuration = mock_server.start_in_thread()
+
+    try:
+        run_farm(
+            p1_bot,
+            p2_bot,
+            n_battles=n_battles,
+            n_workers=n_workers,
+            server_configuration=server_configuration,
+            log_format="sqlite" if "--sqlite" in sys.argv else "csv",
+            output_dir=None if "--no-log" in sys.argv else "battle_data",
+        )
+    finally:
+        if mock_server is not None:
+            mock_server.stop_thread()
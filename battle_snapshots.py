@@ -0,0 +1,220 @@
+import asyncio
+import inspect
+import io
+import logging
+import pickle
+import struct
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from poke_env.battle import AbstractBattle
+from poke_env.data import GenData
+
+MAGIC = b"PKSNAP1\n"
+_FRAME = struct.Struct("<I")
+_logger = logging.getLogger("battle_snapshots")
+
+
+class _SnapshotPickler(pickle.Pickler):
+
+    def __init__(self, file, battle: AbstractBattle):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self._replay_data = battle._replay_data
+        self._learnsets = {
+            id(mon._learnset): (mon.species, mon.gen)
+            for mon in (*battle.team.values(), *battle.opponent_team.values())
+        }
+
+    def persistent_id(self, obj):
+        if obj is self._replay_data:
+            return ('replay',)
+        if isinstance(obj, logging.Logger):
+            return ('logger',)
+        if isinstance(obj, frozenset):
+            learnset = self._learnsets.get(id(obj))
+            if learnset is not None:
+                return ('learnset',) + learnset
+        return None
+
+
+SAFE_GLOBALS = {
+    ('builtins', 'set'), ('builtins', 'frozenset'), ('builtins', 'object'),
+    ('collections', 'OrderedDict'), ('collections', 'defaultdict'), ('collections', 'Counter'),
+    ('copyreg', '_reconstructor'), ('datetime', 'datetime'),
+}
+
+
+class _SnapshotUnpickler(pickle.Unpickler):
+
+    def find_class(self, module, name):
+        if module.startswith('poke_env.') or (module, name) in SAFE_GLOBALS:
+            return super().find_class(module, name)
+        raise pickle.UnpicklingError(f"Refusing to load {module}.{name} from a battle snapshot")
+
+    def persistent_load(self, pid):
+        if pid[0] == 'replay':
+            return []
+        if pid[0] == 'logger':
+            return _logger
+        if pid[0] == 'learnset':
+            return GenData.obtain_learnset(pid[1], pid[2])
+        raise pickle.UnpicklingError(f"Unknown persistent id {pid!r}")
+
+
+class _RecordUnpickler(pickle.Unpickler):
+
+    def find_class(self, module, name):
+        raise pickle.UnpicklingError(f"Refusing to load {module}.{name} from a snapshot chunk")
+
+
+def encode_battle(battle: AbstractBattle) -> bytes:
+    buffer = io.BytesIO()
+    _SnapshotPickler(buffer, battle).dump(battle)
+    return buffer.getvalue()
+
+
+def decode_battle(data: bytes) -> AbstractBattle:
+    return _SnapshotUnpickler(io.BytesIO(data)).load()
+
+
+class Snapshot:
+
+    __slots__ = ('player', 'battle_tag', 'turn', 'order', 'data')
+
+    def __init__(self, player: str, battle_tag: str, turn: int, order: Optional[str], data: bytes):
+        self.player = player
+        self.battle_tag = battle_tag
+        self.turn = turn
+        self.order = order
+        self.data = data
+
+    @property
+    def battle(self) -> AbstractBattle:
+        return decode_battle(self.data)
+
+
+class SnapshotWriter:
+
+    def __init__(self, output_path: str, chunk_size: int = 256, compression_level: int = 6):
+        self.output_path = Path(output_path)
+        self.output_path.parent.mkdir(parents=True, exist_ok=True)
+        self.chunk_size = chunk_size
+        self.compression_level = compression_level
+        self.records = 0
+        self._pending: List[Tuple[str, str, int, Optional[str], bytes]] = []
+        new_file = not self.output_path.exists() or self.output_path.stat().st_size == 0
+        self._file = open(self.output_path, 'ab')
+        if new_file:
+            self._file.write(MAGIC)
+
+    def record(self, battle: AbstractBattle, player: str, order=None):
+        message = order.message if order is not None else None
+        self._pending.append((player, battle.battle_tag, battle.turn, message, encode_battle(battle)))
+        if len(self._pending) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if not self._pending or self._file is None:
+            return
+        chunk = zlib.compress(pickle.dumps(self._pending, protocol=pickle.HIGHEST_PROTOCOL), self.compression_level)
+        self._file.write(_FRAME.pack(len(chunk)))
+        self._file.write(chunk)
+        self._file.flush()
+        self.records += len(self._pending)
+        self._pending = []
+
+    def close(self):
+        if self._file is None:
+            return
+        self.flush()
+        self._file.close()
+        self._file = None
+
+
+def iter_snapshots(path: str, limit: int = 0) -> Iterator[Snapshot]:
+    count = 0
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a battle snapshot store")
+        while True:
+            header = f.read(_FRAME.size)
+            if len(header) < _FRAME.size:
+                return
+            (length,) = _FRAME.unpack(header)
+            chunk = f.read(length)
+            if len(chunk) < length:
+                print(f"Truncated snapshot chunk at end of {path}, stopping")
+                return
+            for record in _RecordUnpickler(io.BytesIO(zlib.decompress(chunk))).load():
+                yield Snapshot(*record)
+                count += 1
+                if limit and count >= limit:
+                    return
+
+
+def _order_message(order) -> Optional[str]:
+    return order.message if order is not None else None
+
+
+def _resolve(order, loop: asyncio.AbstractEventLoop):
+    return loop.run_until_complete(order) if inspect.isawaitable(order) else order
+
+
+def replay_latency(snapshots: Iterable[Snapshot], choose_move: Callable, rounds: int = 1) -> List[int]:
+    samples = []
+    clock = time.perf_counter_ns
+    loop = asyncio.new_event_loop()
+    try:
+        for snapshot in snapshots:
+            battle = snapshot.battle
+            for _ in range(rounds):
+                start = clock()
+                _resolve(choose_move(battle), loop)
+                samples.append(clock() - start)
+    finally:
+        loop.close()
+    return samples
+
+
+def diff_decisions(snapshots: Iterable[Snapshot], choose_a: Callable,
+                   choose_b: Optional[Callable] = None) -> List[Dict[str, Any]]:
+    diffs = []
+    loop = asyncio.new_event_loop()
+    try:
+        for snapshot in snapshots:
+            battle = snapshot.battle
+            a = _order_message(_resolve(choose_a(battle), loop))
+            b = _order_message(_resolve(choose_b(battle), loop)) if choose_b is not None else snapshot.order
+            if a != b:
+                diffs.append({'battle_tag': snapshot.battle_tag, 'turn': snapshot.turn, 'player': snapshot.player, 'a': a, 'b': b})
+    finally:
+        loop.close()
+    return diffs
+
+
+if __name__ == "__main__":
+    import sys
+
+    import numpy as np
+    from battle_farm import FARM_BOTS
+
+    if len(sys.argv) < 3:
+        print("usage: python battle_snapshots.py <snapshots.bin> <bot> [<other bot>] [limit]")
+        sys.exit(1)
+
+    path, bot = sys.argv[1], sys.argv[2]
+    other = sys.argv[3] if len(sys.argv) > 3 and not sys.argv[3].isdigit() else None
+    limit = int(sys.argv[-1]) if sys.argv[-1].isdigit() else 0
+
+    player = FARM_BOTS[bot](None, start_listening=False)
+    start = time.perf_counter()
+    samples_us = np.asarray(replay_latency(iter_snapshots(path, limit), player.choose_move), dtype=float) / 1000
+    print(f"Replayed {len(samples_us)} snapshots in {time.perf_counter() - start:.2f}s")
+    p50, p95, p99 = np.percentile(samples_us, [50, 95, 99])
+    print(f"{bot} choose_move: p50 {p50:.1f} us, p95 {p95:.1f} us, p99 {p99:.1f} us")
+
+    opponent = FARM_BOTS[other](None, start_listening=False).choose_move if other else None
+    diffs = diff_decisions(iter_snapshots(path, limit), player.choose_move, opponent)
+    print(f"{len(diffs)}/{len(samples_us)} decisions differ from {other or 'the recorded orders'}")
@@ -0,0 +1,10 @@
+STAT_NAMES = ('atk', 'def', 'spa', 'spd', 'spe')
+
+
+def stat_value(base: int, level: int, hp: bool = False) -> int:
+    core = (2 * base + 31 + 21) * level // 100
+    return core + level + 10 if hp else core + 5
+
+
+def boost_multiplier(stage: int) -> float:
+    return (2 + stage) / 2 if stage >= 0 else 2 / (2 - stage)
@@ -0,0 +1,61 @@
+import csv
+import logging
+from pathlib import Path
+from typing import List, Dict, Any
+
+from poke_env.battle import Battle, Move
+
+DEFAULT_LOGS = [Path("battle_data/ladder_Bot_Naila.csv"), Path("battle_data/custom_strategy_bot.csv")]
+
+_logger = logging.getLogger("battle_states")
+
+
+def _gen_from_tag(battle_tag: str) -> int:
+    fmt = battle_tag.split('-')[1] if battle_tag.count('-') >= 2 else 'gen8'
+    return int(fmt[3]) if fmt.startswith('gen') and fmt[3].isdigit() else 8
+
+
+def _hp_status(hp: str, max_hp: str) -> str:
+    if not hp or not max_hp:
+        return '100/100'
+    hp_value = int(float(hp))
+    return f"{hp_value}/{int(float(max_hp))}" if hp_value > 0 else '0 fnt'
+
+
+def battle_from_row(row: Dict[str, Any]) -> Battle:
+    battle = Battle(row['battle_tag'], row['player_username'], _logger, gen=_gen_from_tag(row['battle_tag']))
+    battle._player_role = 'p1'
+    battle._turn = int(row['turn'] or 0)
+
+    if row['active_pokemon']:
+        active = battle.get_pokemon(f"p1: {row['active_pokemon']}")
+        active.switch_in()
+        active.set_hp_status(_hp_status(row['active_hp'], row['active_max_hp']))
+        for move_id in filter(None, row['available_moves'].split('|')):
+            move = Move(move_id, gen=battle.gen)
+            active._moves[move_id] = move
+            battle._available_moves.append(move)
+
+    if row['opponent_pokemon']:
+        opponent = battle.get_pokemon(f"p2: {row['opponent_pokemon']}")
+        opponent.switch_in()
+        opponent.set_hp_status(_hp_status(row['opponent_hp'], row['opponent_max_hp']))
+
+    for species in filter(None, row['available_switches'].split('|')):
+        battle._available_switches.append(battle.get_pokemon(f"p1: {species}"))
+
+    return battle
+
+
+def load_battle_states(paths: List[Path] = DEFAULT_LOGS, limit: int = 0) -> List[Battle]:
+    battles = []
+    for path in paths:
+        with open(path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                try:
+                    battles.append(battle_from_row(row))
+                except Exception as e:
+                    print(f"Skipping unreadable state {row['battle_tag']} turn {row['turn']}: {e}")
+                if limit and len(battles) >= limit:
+                    return battles
+    return battles
@@ -0,0 +1,42 @@
+import csv
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+from parquet_logger import convert_csv_to_parquet, read_turn_columns
+
+BATTLE_DATA = Path("battle_data")
+TRAINING_COLUMNS = ['active_pokemon', 'opponent_pokemon', 'active_hp_fraction', 'opponent_hp_fraction', 'selected_move']
+
+
+def load_csv_columns(path: Path, columns: List[str]):
+    with open(path, newline='', encoding='utf-8') as f:
+        rows = list(csv.DictReader(f))
+    return {name: [row[name] for row in rows] for name in columns}
+
+
+def best_of(fn, repeats: int = 5) -> float:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def run(columns: List[str] = TRAINING_COLUMNS):
+    print(f"{'file':<45} {'csv KB':>8} {'pq KB':>8} {'csv ms':>8} {'pq ms':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for csv_path in sorted(BATTLE_DATA.glob("*.csv")):
+            parquet_path = convert_csv_to_parquet(str(csv_path), str(Path(tmp) / f"{csv_path.stem}.parquet"))
+            csv_time = best_of(lambda: load_csv_columns(csv_path, columns))
+            parquet_time = best_of(lambda: read_turn_columns(str(parquet_path), columns))
+            print(
+                f"{csv_path.name:<45} {csv_path.stat().st_size / 1024:>8.1f} {parquet_path.stat().st_size / 1024:>8.1f}"
+                f" {csv_time * 1000:>8.2f} {parquet_time * 1000:>8.2f}"
+            )
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,55 @@
+import csv
+import tempfile
+import time
+from itertools import cycle, islice
+from pathlib import Path
+from typing import Callable, Dict, List, Any
+
+from logging_player import BattleDataLogger, CSVBattleLogger, BufferedCSVBattleLogger, SQLiteBattleLogger
+
+SAMPLE_LOG = Path("battle_data/ladder_Bot_Naila.csv")
+
+
+def load_sample_rows(path: Path = SAMPLE_LOG) -> List[Dict[str, Any]]:
+    with open(path, newline='', encoding='utf-8') as f:
+        return list(csv.DictReader(f))
+
+
+def measure_rows_per_second(make_logger: Callable[[str], BattleDataLogger], rows: List[Dict[str, Any]], n_rows: int) -> float:
+    with tempfile.TemporaryDirectory() as tmp:
+        logger = make_logger(str(Path(tmp) / "bench_turns"))
+        start = time.perf_counter()
+        for row in islice(cycle(rows), n_rows):
+            logger.log_turn_data(row)
+        logger.close()
+        elapsed = time.perf_counter() - start
+    return n_rows / elapsed
+
+
+def run(n_rows: int = 20000):
+    rows = load_sample_rows()
+    backends = {
+        "csv (per-row open)": CSVBattleLogger,
+        "csv (buffered)": BufferedCSVBattleLogger,
+        "sqlite (batched)": SQLiteBattleLogger,
+    }
+
+    results = {}
+    for name, make_logger in backends.items():
+        results[name] = measure_rows_per_second(make_logger, rows, n_rows)
+
+    baseline = results["csv (per-row open)"]
+    print(f"Logger throughput over {n_rows} rows")
+    for name, rate in results.items():
+        print(f"  {name:<24} {rate:>12,.0f} rows/s  ({rate / baseline:.1f}x)")
+    return results
+
+
+if __name__ == "__main__":
+    import sys
+
+    N_ROWS = 20000
+    if len(sys.argv) > 1:
+        N_ROWS = int(sys.argv[1])
+
+    run(N_ROWS)
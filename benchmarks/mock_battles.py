@@ -0,0 +1,55 @@
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+from battle_farm import FARM_BOTS
+from logging_player import BufferedCSVBattleLogger
+from mock_showdown import MockShowdownServer
+from tournament import close_player
+
+MATCHUPS = [
+    ("random", "random", False),
+    ("maxdamage", "maxdamage", True),
+    ("custom", "maxdamage", False),
+    ("custom", "maxdamage", True),
+]
+
+
+async def play(server: MockShowdownServer, p1_bot: str, p2_bot: str, logged: bool, n_battles: int,
+               max_concurrent_battles: int, output_dir: Path):
+    players = []
+    for role, bot in (('a', p1_bot), ('b', p2_bot)):
+        logger = BufferedCSVBattleLogger(str(output_dir / f"{bot}_{role}.csv")) if logged else None
+        players.append(FARM_BOTS[bot](
+            logger,
+            battle_format="gen8randombattle",
+            server_configuration=server.server_configuration,
+            max_concurrent_battles=max_concurrent_battles,
+        ))
+    p1, p2 = players
+
+    start = time.perf_counter()
+    await p1.battle_against(p2, n_battles=n_battles)
+    elapsed = time.perf_counter() - start
+    turns = sum(battle.turn for battle in p1.battles.values())
+    for player in players:
+        await close_player(player)
+    return p1.n_finished_battles, turns, elapsed
+
+
+async def run(n_battles: int = 50, max_concurrent_battles: int = 10, seed: int = 0):
+    print(f"Player-side throughput against the in-process mock server "
+          f"({n_battles} battles, {max_concurrent_battles} concurrent)")
+    with tempfile.TemporaryDirectory() as tmp:
+        async with MockShowdownServer(seed=seed) as server:
+            for p1_bot, p2_bot, logged in MATCHUPS:
+                battles, turns, elapsed = await play(
+                    server, p1_bot, p2_bot, logged, n_battles, max_concurrent_battles, Path(tmp)
+                )
+                name = f"{p1_bot} vs {p2_bot}" + (" (logged)" if logged else "")
+                print(f"  {name:<30} {battles / elapsed:>7.2f} battles/s  {turns / elapsed:>8.1f} turns/s")
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
@@ -0,0 +1,36 @@
+import time
+
+import numpy as np
+
+from benchmarks.battle_states import load_battle_states
+from benchmarks.players import offline_custom_player
+from move_scoring import score_moves
+
+
+def run(rounds: int = 20):
+    bot = offline_custom_player()
+    states = [battle for battle in load_battle_states() if battle.available_moves]
+
+    def python_path(battle):
+        return bot._choose_move_by_checks(battle, battle.available_moves, battle.opponent_active_pokemon)
+
+    def vectorized_path(battle):
+        moves = battle.available_moves
+        return moves[int(np.argmax(score_moves(battle, moves, battle.opponent_active_pokemon, bot.move_checks)))]
+
+    mismatches = [battle for battle in states if python_path(battle) is not vectorized_path(battle)]
+
+    print(f"Move scoring over {len(states)} recorded states x {rounds} rounds")
+    for name, choose in (("python checks", python_path), ("vectorized", vectorized_path)):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for battle in states:
+                choose(battle)
+        elapsed = time.perf_counter() - start
+        print(f"  {name:<16} {rounds * len(states) / elapsed:>10,.0f} decisions/s")
+    print(f"  identical choices: {len(states) - len(mismatches)}/{len(states)}")
+    return mismatches
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,37 @@
+from custom_strategy_bot import (
+    CustomStrategyPlayer,
+    check_super_effective,
+    check_stab_bonus,
+    check_high_base_power,
+    check_high_accuracy,
+    check_status_moves,
+    check_avoid_ineffective,
+    check_setup_on_resist,
+    check_switch_on_bad_matchup,
+    check_offensive_pressure,
+)
+
+
+def prefer_priority_moves(battle, move, target):
+    if target and move.priority > 0:
+        if target.current_hp_fraction < 0.3:
+            return 75
+    return 0
+
+
+def add_ladder_checks(bot: CustomStrategyPlayer) -> CustomStrategyPlayer:
+    bot.add_check("super_effective", check_super_effective, priority=4)
+    bot.add_check("avoid_ineffective", check_avoid_ineffective, priority=3)
+    bot.add_check("switch_bad_matchup", check_switch_on_bad_matchup, priority=3)
+    bot.add_check("stab", check_stab_bonus, priority=2)
+    bot.add_check("offensive_pressure", check_offensive_pressure, priority=2)
+    bot.add_check("base_power", check_high_base_power, priority=1)
+    bot.add_check("accuracy", check_high_accuracy, priority=1)
+    bot.add_check("status", check_status_moves, priority=1)
+    bot.add_check("setup_on_resist", check_setup_on_resist, priority=2)
+    bot.add_check("priority_finisher", prefer_priority_moves, priority=3)
+    return bot
+
+
+def offline_custom_player(**kwargs) -> CustomStrategyPlayer:
+    return add_ladder_checks(CustomStrategyPlayer(start_listening=False, **kwargs))
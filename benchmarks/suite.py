@@ -0,0 +1,181 @@
+import asyncio
+import inspect
+import json
+import platform
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+from poke_env.player import RandomPlayer
+
+from benchmarks.battle_states import load_battle_states
+from benchmarks.logger_throughput import load_sample_rows, measure_rows_per_second
+from benchmarks.mock_battles import play
+from benchmarks.players import offline_custom_player
+from headless_battles import play_battles
+from battle_farm import FARM_BOTS
+from damage_calc import MaxDamagePlayer
+from logging_player import (
+    CSVBattleLogger,
+    BufferedCSVBattleLogger,
+    SQLiteBattleLogger,
+    QueuedBattleLogger,
+    LoggingMaxDamagePlayer,
+)
+from mock_showdown import MockShowdownServer
+from tournament import write_json_atomic
+
+RESULTS_PATH = Path("benchmarks/results/latest.json")
+BASELINE_PATH = Path("benchmarks/baseline.json")
+DEFAULT_TOLERANCE = 0.2
+
+LOWER_IS_BETTER = ('_us',)
+
+
+def percentiles(samples_ns: List[int]) -> Dict[str, float]:
+    samples_us = np.asarray(samples_ns, dtype=float) / 1000
+    p50, p95, p99 = np.percentile(samples_us, [50, 95, 99])
+    return {'p50_us': round(p50, 2), 'p95_us': round(p95, 2), 'p99_us': round(p99, 2), 'mean_us': round(samples_us.mean(), 2)}
+
+
+def time_decisions(choose_move: Callable, states, rounds: int) -> List[int]:
+    samples = []
+    clock = time.perf_counter_ns
+    loop = asyncio.new_event_loop()
+    try:
+        for _ in range(rounds):
+            for battle in states:
+                start = clock()
+                order = choose_move(battle)
+                if inspect.isawaitable(order):
+                    loop.run_until_complete(order)
+                samples.append(clock() - start)
+    finally:
+        loop.close()
+    return samples
+
+
+def decision_latency(rounds: int, tmp: Path) -> Dict[str, float]:
+    states = [battle for battle in load_battle_states() if battle.available_moves or battle.available_switches]
+    players = {
+        'random': RandomPlayer(start_listening=False),
+        'maxdamage': MaxDamagePlayer(start_listening=False),
+        'logging_maxdamage': LoggingMaxDamagePlayer(
+            battle_logger=BufferedCSVBattleLogger(str(tmp / "latency_turns.csv")), start_listening=False
+        ),
+        'custom': offline_custom_player(),
+    }
+
+    metrics = {}
+    for name, player in players.items():
+        for key, value in percentiles(time_decisions(player.choose_move, states, rounds)).items():
+            metrics[f"choose_move.{name}.{key}"] = value
+    players['logging_maxdamage'].battle_logger.close()
+    metrics['choose_move.states'] = len(states)
+    return metrics
+
+
+def logger_throughput(n_rows: int) -> Dict[str, float]:
+    rows = load_sample_rows()
+    backends = {
+        'csv': CSVBattleLogger,
+        'buffered_csv': BufferedCSVBattleLogger,
+        'sqlite': SQLiteBattleLogger,
+        'queued_buffered_csv': lambda path: QueuedBattleLogger(BufferedCSVBattleLogger(path)),
+    }
+    try:
+        from parquet_logger import ParquetBattleLogger
+        backends['parquet'] = ParquetBattleLogger
+    except ImportError:
+        pass
+    return {
+        f"logger.{name}.rows_per_s": round(measure_rows_per_second(make_logger, rows, n_rows))
+        for name, make_logger in backends.items()
+    }
+
+
+async def battle_throughput(n_battles: int, tmp: Path) -> Dict[str, float]:
+    player_kwargs = dict(battle_format="gen8randombattle", start_listening=False)
+    headless = await play_battles(
+        FARM_BOTS['custom'](None, **player_kwargs), FARM_BOTS['maxdamage'](None, **player_kwargs), range(n_battles)
+    )
+
+    async with MockShowdownServer(seed=0) as server:
+        battles, turns, elapsed = await play(server, "custom", "maxdamage", True, n_battles, 10, tmp)
+
+    return {
+        'battles.headless.per_minute': round(headless['battles_per_second'] * 60, 1),
+        'battles.mock_server.per_minute': round(battles / elapsed * 60, 1),
+        'battles.mock_server.turns_per_s': round(turns / elapsed, 1),
+    }
+
+
+def lower_is_better(metric: str) -> bool:
+    return metric.endswith(LOWER_IS_BETTER)
+
+
+def find_regressions(metrics: Dict[str, float], baseline: Dict[str, float],
+                     tolerance: float = DEFAULT_TOLERANCE) -> Dict[str, Dict[str, Any]]:
+    regressions = {}
+    for metric, value in metrics.items():
+        reference = baseline.get(metric)
+        if not reference or metric == 'choose_move.states':
+            continue
+        change = (value - reference) / reference
+        if (change > tolerance) if lower_is_better(metric) else (change < -tolerance):
+            regressions[metric] = {'baseline': reference, 'current': value, 'change': round(change, 3)}
+    return regressions
+
+
+def run(rounds: int = 5, n_rows: int = 20000, n_battles: int = 30, tolerance: float = DEFAULT_TOLERANCE,
+        save_baseline: bool = False) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        metrics = {}
+        metrics.update(decision_latency(rounds, tmp))
+        metrics.update(logger_throughput(n_rows))
+        metrics.update(asyncio.run(battle_throughput(n_battles, tmp)))
+
+    baseline = {}
+    if BASELINE_PATH.exists():
+        with open(BASELINE_PATH) as f:
+            baseline = json.load(f)['metrics']
+    regressions = find_regressions(metrics, baseline, tolerance)
+
+    results = {
+        'timestamp': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'config': {'rounds': rounds, 'n_rows': n_rows, 'n_battles': n_battles, 'tolerance': tolerance},
+        'metrics': metrics,
+        'baseline': str(BASELINE_PATH) if baseline else None,
+        'regressions': regressions,
+    }
+    write_json_atomic(RESULTS_PATH, results)
+    if save_baseline:
+        write_json_atomic(BASELINE_PATH, results)
+
+    for metric, value in metrics.items():
+        flag = "  REGRESSION" if metric in regressions else ""
+        print(f"  {metric:<42} {value:>14,.2f}{flag}")
+    if save_baseline:
+        print(f"\nBaseline saved to {BASELINE_PATH}")
+    elif not baseline:
+        print(f"\nERROR: no baseline at {BASELINE_PATH}, so regressions were not checked; "
+              f"run with --save-baseline on this machine to store one")
+    print(f"\nResults written to {RESULTS_PATH} ({len(regressions)} regressions)")
+    return results
+
+
+if __name__ == "__main__":
+    import sys
+
+    save_baseline = "--save-baseline" in sys.argv
+    results = run(save_baseline=save_baseline)
+    if results['regressions']:
+        sys.exit(1)
+    if results['baseline'] is None and not save_baseline:
+        sys.exit(2)
@@ -0,0 +1,100 @@
+import time
+from datetime import datetime
+from typing import Dict, Any
+
+from poke_env.player.battle_order import SingleBattleOrder
+
+from benchmarks.battle_states import load_battle_states
+from turn_features import TurnFeatureExtractor
+
+
+def legacy_extract(battle, username: str, selected_move) -> Dict[str, Any]:
+    active = battle.active_pokemon
+    opponent = battle.opponent_active_pokemon
+
+    selected_move_name = None
+    selected_move_type = None
+    selected_move_category = None
+    selected_move_base_power = None
+    selected_move_accuracy = None
+
+    if hasattr(selected_move, 'order'):
+        move = selected_move.order
+        if hasattr(move, 'id'):
+            selected_move_name = move.id
+            selected_move_type = str(move.type) if hasattr(move, 'type') else None
+            selected_move_category = str(move.category) if hasattr(move, 'category') else None
+            selected_move_base_power = move.base_power if hasattr(move, 'base_power') else None
+            selected_move_accuracy = move.accuracy if hasattr(move, 'accuracy') else None
+
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'battle_tag': battle.battle_tag,
+        'turn': battle.turn,
+        'player_username': username,
+        'active_pokemon': active.species if active else None,
+        'active_hp': active.current_hp if active else None,
+        'active_max_hp': active.max_hp if active else None,
+        'active_hp_fraction': active.current_hp_fraction if active else None,
+        'active_status': str(active.status) if active and active.status else None,
+        'active_atk': active.base_stats.get('atk') if active else None,
+        'active_def': active.base_stats.get('def') if active else None,
+        'active_spa': active.base_stats.get('spa') if active else None,
+        'active_spd': active.base_stats.get('spd') if active else None,
+        'active_spe': active.base_stats.get('spe') if active else None,
+        'opponent_pokemon': opponent.species if opponent else None,
+        'opponent_hp': opponent.current_hp if opponent else None,
+        'opponent_max_hp': opponent.max_hp if opponent else None,
+        'opponent_hp_fraction': opponent.current_hp_fraction if opponent else None,
+        'opponent_status': str(opponent.status) if opponent and opponent.status else None,
+        'opponent_atk': opponent.base_stats.get('atk') if opponent else None,
+        'opponent_def': opponent.base_stats.get('def') if opponent else None,
+        'opponent_spa': opponent.base_stats.get('spa') if opponent else None,
+        'opponent_spd': opponent.base_stats.get('spd') if opponent else None,
+        'opponent_spe': opponent.base_stats.get('spe') if opponent else None,
+        'selected_move': selected_move_name,
+        'selected_move_type': selected_move_type,
+        'selected_move_category': selected_move_category,
+        'selected_move_base_power': selected_move_base_power,
+        'selected_move_accuracy': selected_move_accuracy,
+        'available_moves': '|'.join([m.id for m in battle.available_moves]) if battle.available_moves else '',
+        'available_switches': '|'.join([p.species for p in battle.available_switches]) if battle.available_switches else '',
+        'damage_dealt': 0,
+        'fainted': 1 if opponent and opponent.fainted else 0,
+        'won_battle': (1 if battle.won else 0 if battle.lost else -1) if battle.finished else None
+    }
+
+
+def time_per_turn(extract, states, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for battle, order in states:
+            extract(battle, "bench", order)
+    return (time.perf_counter() - start) / (rounds * len(states))
+
+
+def run(rounds: int = 20):
+    battles = load_battle_states()
+    states = [
+        (battle, SingleBattleOrder(battle.available_moves[0]) if battle.available_moves else None)
+        for battle in battles
+    ]
+
+    full = TurnFeatureExtractor()
+    training = TurnFeatureExtractor(['active_pokemon', 'opponent_pokemon', 'active_hp_fraction', 'opponent_hp_fraction', 'selected_move'])
+    candidates = {
+        "legacy dict builder": legacy_extract,
+        "extractor (all fields)": full.extract,
+        "extractor (5 fields)": training.extract,
+    }
+
+    baseline = None
+    print(f"Per-turn extraction cost over {len(states)} recorded states x {rounds} rounds")
+    for name, extract in candidates.items():
+        per_turn = time_per_turn(extract, states, rounds)
+        baseline = baseline or per_turn
+        print(f"  {name:<26} {per_turn * 1e6:>8.2f} us/turn  ({baseline / per_turn:.2f}x)")
+
+
+if __name__ == "__main__":
+    run()
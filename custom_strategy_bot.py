@@ -1,30 +1,88 @@
-from typing import List, Callable, Optional
+import asyncio
+from typing import TYPE_CHECKING, Awaitable, List, Callable, Optional
+import numpy as np
 from poke_env.player import Player
 from poke_env.battle import AbstractBattle
-from logging_player import BattleDataLogger, CSVBattleLogger
+from logging_player import BattleDataLogger, CSVBattleLogger, order_after_log
+from battle_snapshots import SnapshotWriter
+from turn_features import TurnFeatureExtractor
+from turn_context import TurnEvaluationContext, compute_facts, depends_on
+from set_inference import likely_threat, load_index
+from move_scoring import (
+    vectorized,
+    score_moves,
+    super_effective_column,
+    stab_column,
+    base_power_column,
+    accuracy_column,
+    status_column,
+    avoid_ineffective_column,
+    setup_on_resist_column,
+    switch_on_bad_matchup_column,
+    offensive_pressure_column,
+)
+
+if TYPE_CHECKING:
+    from switch_rollouts import RolloutSwitchEvaluator
 
 class MoveCheck:
-    def __init__(self, name: str, check_function: Callable, priority: int = 1):
+    def __init__(self, name: str, check_function: Callable, priority: int = 1, depends_on: Optional[List[str]] = None):
         self.name = name
         self.check_function = check_function
         self.priority = priority
+        self.depends_on = tuple(depends_on) if depends_on is not None else getattr(check_function, 'depends_on', ())
 
-    def evaluate(self, battle: AbstractBattle, move, target) -> float:
+    def raw_score(self, battle: AbstractBattle, move, target, context: Optional[TurnEvaluationContext] = None) -> float:
         try:
-            return self.check_function(battle, move, target) * self.priority
+            if not self.depends_on:
+                return self.check_function(battle, move, target)
+            if context is None:
+                facts = compute_facts(battle, move, target, self.depends_on)
+            else:
+                facts = context.facts(battle, move, target, self.depends_on, self.name)
+            return self.check_function(battle, move, target, facts)
         except Exception as e:
             print(f"Warning: Check '{self.name}' failed: {e}")
             return 0.0
 
+    def evaluate(self, battle: AbstractBattle, move, target, context: Optional[TurnEvaluationContext] = None) -> float:
+        return self.raw_score(battle, move, target, context) * self.priority
+
 class CustomStrategyPlayer(Player):
-    def __init__(self, battle_logger: Optional[BattleDataLogger] = None, battle_format: str = "gen8randombattle", **kwargs):
+    def __init__(self, battle_logger: Optional[BattleDataLogger] = None, battle_format: str = "gen8randombattle",
+                 turn_fields: Optional[List[str]] = None, vectorized_scoring: bool = True,
+                 snapshot_store: Optional[SnapshotWriter] = None,
+                 switch_evaluator: Optional["RolloutSwitchEvaluator"] = None, **kwargs):
         super().__init__(battle_format=battle_format, **kwargs)
         self.battle_logger = battle_logger
+        self.snapshot_store = snapshot_store
+        self.switch_evaluator = switch_evaluator
+        self.turn_extractor = TurnFeatureExtractor(turn_fields)
         self.move_checks: List[MoveCheck] = []
+        self.turn_context = TurnEvaluationContext()
+        self.vectorized_scoring = vectorized_scoring
         self.debug = False
+        load_index(battle_format)
+
+    def _battle_finished_callback(self, battle: AbstractBattle):
+        if self.battle_logger:
+            self._log_battle_result(battle)
+        self.turn_extractor.forget(battle.battle_tag)
+        self.turn_context.forget(battle.battle_tag)
+        if self.battle_logger:
+            self.battle_logger.flush()
+        if self.snapshot_store:
+            self.snapshot_store.flush()
 
-    def add_check(self, name: str, check_function: Callable, priority: int = 1):
-        self.move_checks.append(MoveCheck(name, check_function, priority))
+    async def close(self):
+        if self.battle_logger:
+            await self.battle_logger.aclose()
+        if self.snapshot_store:
+            self.snapshot_store.close()
+        await self.ps_client.stop_listening()
+
+    def add_check(self, name: str, check_function: Callable, priority: int = 1, depends_on: Optional[List[str]] = None):
+        self.move_checks.append(MoveCheck(name, check_function, priority, depends_on))
 
     def choose_move(self, battle: AbstractBattle):
         if not self.move_checks:
@@ -41,6 +99,9 @@ class CustomStrategyPlayer(Player):
         available_switches = battle.available_switches
 
         if available_switches and opponent_active:
+            if self.switch_evaluator is not None:
+                return self._choose_move_after_rollouts(battle)
+
             best_switch_score = 0
             best_switch = None
 
@@ -53,16 +114,50 @@ class CustomStrategyPlayer(Player):
             if best_switch_score > 150:
                 if self.debug:
                     print(f"\n*** SWITCHING to {best_switch.species} (score: {best_switch_score:.1f}) ***")
-                order = self.create_order(best_switch)
-                if self.battle_logger:
-                    self._log_battle_turn(battle, order)
-                return order
+                return self._logged_order(battle, self.create_order(best_switch))
+
+        return self._choose_attack(battle)
 
+    async def _choose_move_after_rollouts(self, battle: AbstractBattle):
+        best_switch = await self.switch_evaluator.choose_switch(battle)
+        if best_switch is not None:
+            if self.debug:
+                print(f"\n*** SWITCHING to {best_switch.species} (rollouts: {self.switch_evaluator.last_evaluation}) ***")
+            order = self._logged_order(battle, self.create_order(best_switch))
+        else:
+            order = self._choose_attack(battle)
+        if isinstance(order, Awaitable):
+            order = await order
+        return order
+
+    def _choose_attack(self, battle: AbstractBattle):
+        active = battle.active_pokemon
+        opponent_active = battle.opponent_active_pokemon
         available_moves = battle.available_moves
 
         if not available_moves:
             return self.choose_default_move(battle)
 
+        self.turn_context.collect_stats = self.debug
+        self.turn_context.begin(battle)
+        best_move = None
+        if self.vectorized_scoring and not self.debug:
+            try:
+                best_move = available_moves[int(np.argmax(score_moves(battle, available_moves, opponent_active, self.move_checks, context=self.turn_context)))]
+            except Exception as e:
+                print(f"Warning: Vectorized scoring failed, falling back to per-check scoring: {e}")
+        if best_move is None:
+            best_move = self._choose_move_by_checks(battle, available_moves, opponent_active)
+
+        order = self.create_order(best_move, dynamax=battle.can_dynamax and active and opponent_active and opponent_active.current_hp_fraction > 0.6 and active.current_hp_fraction > 0.4)
+        return self._logged_order(battle, order)
+
+    def _logged_order(self, battle: AbstractBattle, order):
+        if self.battle_logger or self.snapshot_store:
+            return order_after_log(order, self._log_battle_turn(battle, order))
+        return order
+
+    def _choose_move_by_checks(self, battle: AbstractBattle, available_moves, opponent_active):
         move_scores = {}
 
         for move in available_moves:
@@ -72,7 +167,7 @@ class CustomStrategyPlayer(Player):
                 print(f"\nEvaluating {move.id}:")
 
             for check in self.move_checks:
-                score = check.evaluate(battle, move, opponent_active)
+                score = check.evaluate(battle, move, opponent_active, self.turn_context)
                 total_score += score
 
                 if self.debug and score > 0:
@@ -87,13 +182,12 @@ class CustomStrategyPlayer(Player):
 
         if self.debug:
             print(f"\nChosen: {best_move.id} (score: {move_scores[best_move]:.1f})")
+            hit_rates = self.turn_context.hit_rates()
+            for check in self.move_checks:
+                if check.name in hit_rates:
+                    print(f"  cache hit rate {check.name}: {hit_rates[check.name]:.0%}")
 
-        order = self.create_order(best_move, dynamax=battle.can_dynamax and active and opponent_active and opponent_active.current_hp_fraction > 0.6 and active.current_hp_fraction > 0.4)
-
-        if self.battle_logger:
-            self._log_battle_turn(battle, order)
-
-        return order
+        return best_move
 
     def _evaluate_switch(self, battle: AbstractBattle, switch_pokemon, opponent_active) -> float:
         score = 0.0
@@ -134,70 +228,27 @@ class CustomStrategyPlayer(Player):
 
         defense_score += our_pokemon.current_hp_fraction
 
-        return defense_score
+        return defense_score / max(likely_threat(opponent_pokemon, our_pokemon), 0.25)
 
     def _log_battle_turn(self, battle: AbstractBattle, selected_move):
         try:
-            from datetime import datetime
-
-            active = battle.active_pokemon
-            opponent = battle.opponent_active_pokemon
-
-            selected_move_name = None
-            selected_move_type = None
-            selected_move_category = None
-            selected_move_base_power = None
-            selected_move_accuracy = None
-
-            if hasattr(selected_move, 'order'):
-                move = selected_move.order
-                if hasattr(move, 'id'):
-                    selected_move_name = move.id
-                    selected_move_type = str(move.type) if hasattr(move, 'type') else None
-                    selected_move_category = str(move.category) if hasattr(move, 'category') else None
-                    selected_move_base_power = move.base_power if hasattr(move, 'base_power') else None
-                    selected_move_accuracy = move.accuracy if hasattr(move, 'accuracy') else None
-
-            turn_data = {
-                'timestamp': datetime.now().isoformat(),
-                'battle_tag': battle.battle_tag,
-                'turn': battle.turn,
-                'player_username': self.username,
-                'active_pokemon': active.species if active else None,
-                'active_hp': active.current_hp if active else None,
-                'active_max_hp': active.max_hp if active else None,
-                'active_hp_fraction': active.current_hp_fraction if active else None,
-                'active_status': str(active.status) if active and active.status else None,
-                'active_atk': active.base_stats.get('atk') if active else None,
-                'active_def': active.base_stats.get('def') if active else None,
-                'active_spa': active.base_stats.get('spa') if active else None,
-                'active_spd': active.base_stats.get('spd') if active else None,
-                'active_spe': active.base_stats.get('spe') if active else None,
-                'opponent_pokemon': opponent.species if opponent else None,
-                'opponent_hp': opponent.current_hp if opponent else None,
-                'opponent_max_hp': opponent.max_hp if opponent else None,
-                'opponent_hp_fraction': opponent.current_hp_fraction if opponent else None,
-                'opponent_status': str(opponent.status) if opponent and opponent.status else None,
-                'opponent_atk': opponent.base_stats.get('atk') if opponent else None,
-                'opponent_def': opponent.base_stats.get('def') if opponent else None,
-                'opponent_spa': opponent.base_stats.get('spa') if opponent else None,
-                'opponent_spd': opponent.base_stats.get('spd') if opponent else None,
-                'opponent_spe': opponent.base_stats.get('spe') if opponent else None,
-                'selected_move': selected_move_name,
-                'selected_move_type': selected_move_type,
-                'selected_move_category': selected_move_category,
-                'selected_move_base_power': selected_move_base_power,
-                'selected_move_accuracy': selected_move_accuracy,
-                'available_moves': '|'.join([m.id for m in battle.available_moves]) if battle.available_moves else '',
-                'available_switches': '|'.join([p.species for p in battle.available_switches]) if battle.available_switches else '',
-                'damage_dealt': 0,
-                'fainted': 1 if opponent and opponent.fainted else 0,
-                'won_battle': 1 if battle.finished and battle.won else (0 if battle.finished else None)
-            }
-
-            self.battle_logger.log_turn_data(turn_data)
+            if self.snapshot_store:
+                self.snapshot_store.record(battle, self.username, selected_move)
+            if not self.battle_logger:
+                return None
+            turn_data = self.turn_extractor.extract(battle, self.username, selected_move)
+            return self.battle_logger.log_turn_data(turn_data)
         except Exception as e:
             print(f"Error logging turn data: {e}")
+            return None
+
+    def _log_battle_result(self, battle: AbstractBattle):
+        try:
+            pending = self.battle_logger.log_turn_data(self.turn_extractor.extract(battle, self.username, None))
+            if pending is not None:
+                asyncio.ensure_future(pending)
+        except Exception as e:
+            print(f"Error logging battle result: {e}")
 
     def choose_default_move(self, battle: AbstractBattle):
         if battle.available_moves:
@@ -206,45 +257,55 @@ class CustomStrategyPlayer(Player):
         else:
             return self.choose_random_move(battle)
 
-def check_super_effective(battle: AbstractBattle, move, target) -> float:
+@vectorized(super_effective_column)
+@depends_on('effectiveness')
+def check_super_effective(battle: AbstractBattle, move, target, facts) -> float:
     if target and move.type and move.base_power > 0:
-        effectiveness = target.damage_multiplier(move)
+        effectiveness = facts['effectiveness']
         if effectiveness > 1:
             return 100 * effectiveness
     return 0
 
-def check_stab_bonus(battle: AbstractBattle, move, target) -> float:
-    active_pokemon = battle.active_pokemon
-    if active_pokemon and move.type:
-        if move.type in [t.name for t in active_pokemon.types]:
-            return 50
+@vectorized(stab_column)
+@depends_on('stab')
+def check_stab_bonus(battle: AbstractBattle, move, target, facts) -> float:
+    if facts['stab']:
+        return 50
     return 0
 
-def check_high_base_power(battle: AbstractBattle, move, target) -> float:
-    return move.base_power if move.base_power else 0
+@vectorized(base_power_column)
+@depends_on('damage')
+def check_high_base_power(battle: AbstractBattle, move, target, facts) -> float:
+    return min(100.0, facts['damage'].expected_percent)
 
+@vectorized(accuracy_column)
 def check_high_accuracy(battle: AbstractBattle, move, target) -> float:
     return move.accuracy if move.accuracy else 100
 
+@vectorized(status_column)
 def check_status_moves(battle: AbstractBattle, move, target) -> float:
     if target and move.category.name == "STATUS" and not target.status:
         return 30
     return 0
 
-def check_avoid_ineffective(battle: AbstractBattle, move, target) -> float:
+@vectorized(avoid_ineffective_column)
+@depends_on('effectiveness')
+def check_avoid_ineffective(battle: AbstractBattle, move, target, facts) -> float:
     if target and move.type and move.base_power > 0:
-        effectiveness = target.damage_multiplier(move)
+        effectiveness = facts['effectiveness']
         if effectiveness < 1:
             return -50 * (1 - effectiveness)
     return 0
 
-def check_setup_on_resist(battle: AbstractBattle, move, target) -> float:
+@vectorized(setup_on_resist_column)
+@depends_on('boost_total')
+def check_setup_on_resist(battle: AbstractBattle, move, target, facts) -> float:
     active = battle.active_pokemon
 
-    if not move.boosts or not active or not target:
+    if not active or not target:
         return 0
 
-    total_boost = sum(move.boosts.values())
+    total_boost = facts['boost_total']
     if total_boost <= 0:
         return 0
 
@@ -256,30 +317,36 @@ def check_setup_on_resist(battle: AbstractBattle, move, target) -> float:
 
     return 0
 
-def check_switch_on_bad_matchup(battle: AbstractBattle, move, target) -> float:
+@vectorized(switch_on_bad_matchup_column)
+@depends_on('effectiveness', 'threat')
+def check_switch_on_bad_matchup(battle: AbstractBattle, move, target, facts) -> float:
     active = battle.active_pokemon
 
     if not target or not active or not move.type or move.base_power == 0:
         return 0
 
-    effectiveness = target.damage_multiplier(move)
+    effectiveness = facts['effectiveness']
 
     if effectiveness < 0.5:
         return -100
 
+    if effectiveness < 1 and facts['threat'] > 1:
+        return -50
+
     return 0
 
-def check_offensive_pressure(battle: AbstractBattle, move, target) -> float:
-    if not target or not move.base_power or move.base_power == 0:
+@vectorized(offensive_pressure_column)
+@depends_on('damage')
+def check_offensive_pressure(battle: AbstractBattle, move, target, facts) -> float:
+    if not target:
         return 0
 
     if target.current_hp_fraction > 0.5:
-        return move.base_power * 0.5
+        return min(100.0, facts['damage'].expected_percent) * 0.5
 
     return 0
 
 if __name__ == "__main__":
-    import asyncio
     from poke_env import ServerConfiguration, AccountConfiguration
 
     LOCAL_SERVER = ServerConfiguration(
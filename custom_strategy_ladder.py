@@ -1,4 +1,5 @@
 import asyncio
+from typing import Optional
 from poke_env import ShowdownServerConfiguration, AccountConfiguration
 from custom_strategy_bot import (
     CustomStrategyPlayer,
@@ -13,9 +14,10 @@ from custom_strategy_bot import (
     check_switch_on_bad_matchup,
     check_offensive_pressure,
 )
+from ladder_telemetry import LadderTelemetry
 
 
-async def run_ladder_bot(username: str, password: str, n_battles: int = 10):
+async def run_ladder_bot(username: str, password: str, n_battles: int = 10, metrics_port: Optional[int] = None):
     logger = CSVBattleLogger(f"battle_data/ladder_{username}.csv")
 
     bot = CustomStrategyPlayer(
@@ -64,9 +66,17 @@ async def run_ladder_bot(username: str, password: str, n_battles: int = 10):
     for i, check in enumerate(bot.move_checks, 1):
         print(f"  {i}. {check.name} (priority: {check.priority})")
     print("="*60)
+    telemetry = LadderTelemetry(f"custom_strategy_{username}", metrics_port=metrics_port)
+    telemetry.attach(bot)
+    metrics_url = telemetry.start_metrics_server()
+    if metrics_url:
+        print(f"Metrics: {metrics_url}")
     print("\nSearching for ladder opponents...\n")
 
-    await bot.ladder(n_battles)
+    try:
+        await bot.ladder(n_battles)
+    finally:
+        telemetry.stop_metrics_server()
 
     print("\n" + "="*60)
     print("LADDER RESULTS")
@@ -78,6 +88,8 @@ async def run_ladder_bot(username: str, password: str, n_battles: int = 10):
     if bot.n_finished_battles > 0:
         win_rate = (bot.n_won_battles / bot.n_finished_battles) * 100
         print(f"Win rate: {win_rate:.1f}%")
+    print(f"Elo estimate: {telemetry.stats['elo']:.0f}")
+    print(f"Results saved to: {telemetry.results_path}")
 
     print(f"\nBattle data saved to: battle_data/ladder_{username}.csv")
     print("="*60)
@@ -89,6 +101,7 @@ if __name__ == "__main__":
     USERNAME = "Bot_Naila"
     PASSWORD = "Naila"
     N_BATTLES = 10
+    METRICS_PORT = None
 
     if len(sys.argv) > 1:
         USERNAME = sys.argv[1]
@@ -96,15 +109,17 @@ if __name__ == "__main__":
         PASSWORD = sys.argv[2]
     if len(sys.argv) > 3:
         N_BATTLES = int(sys.argv[3])
+    if len(sys.argv) > 4:
+        METRICS_PORT = int(sys.argv[4])
 
     print("\n" + "="*60)
     print("CUSTOM STRATEGY BOT - OFFICIAL SHOWDOWN LADDER")
     print("="*60)
     print("\nUsage:")
-    print(f"  python custom_strategy_ladder.py [username] [password] [n_battles]")
+    print(f"  python custom_strategy_ladder.py [username] [password] [n_battles] [metrics_port]")
     print(f"\nCurrent settings:")
     print(f"  Username: {USERNAME}")
     print(f"  Battles: {N_BATTLES}")
     print("="*60 + "\n")
 
-    asyncio.run(run_ladder_bot(USERNAME, PASSWORD, N_BATTLES))
+    asyncio.run(run_ladder_bot(USERNAME, PASSWORD, N_BATTLES, METRICS_PORT))
@@ -0,0 +1,241 @@
+import bisect
+import math
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from poke_env.battle import AbstractBattle, Move, MoveCategory, Pokemon, PokemonType, SideCondition, Status
+from poke_env.player import MaxBasePowerPlayer, Player
+
+from battle_stats import STAT_NAMES, boost_multiplier, stat_value
+from type_tables import TYPE_INDEX, tables_for_gen
+
+ROLLS = tuple(range(85, 101))
+
+ATTACK_ABILITIES = {'hugepower': 2.0, 'purepower': 2.0, 'hustle': 1.5, 'gorillatactics': 1.5}
+IMMUNITY_ABILITIES = {
+    'levitate': PokemonType.GROUND, 'eartheater': PokemonType.GROUND,
+    'flashfire': PokemonType.FIRE, 'wellbakedbody': PokemonType.FIRE,
+    'waterabsorb': PokemonType.WATER, 'stormdrain': PokemonType.WATER, 'dryskin': PokemonType.WATER,
+    'voltabsorb': PokemonType.ELECTRIC, 'lightningrod': PokemonType.ELECTRIC, 'motordrive': PokemonType.ELECTRIC,
+    'sapsipper': PokemonType.GRASS,
+}
+RESIST_ABILITIES = {
+    'thickfat': {PokemonType.FIRE, PokemonType.ICE},
+    'heatproof': {PokemonType.FIRE},
+    'waterbubble': {PokemonType.FIRE},
+    'purifyingsalt': {PokemonType.GHOST},
+}
+SUPER_EFFECTIVE_FILTERS = {'filter', 'solidrock', 'prismarmor'}
+WEATHER_BOOSTS = {
+    'SUNNYDAY': {PokemonType.FIRE: 1.5, PokemonType.WATER: 0.5},
+    'DESOLATELAND': {PokemonType.FIRE: 1.5, PokemonType.WATER: 0.0},
+    'RAINDANCE': {PokemonType.WATER: 1.5, PokemonType.FIRE: 0.5},
+    'PRIMORDIALSEA': {PokemonType.WATER: 1.5, PokemonType.FIRE: 0.0},
+}
+TERRAIN_BOOSTS = {
+    'ELECTRIC_TERRAIN': PokemonType.ELECTRIC,
+    'GRASSY_TERRAIN': PokemonType.GRASS,
+    'PSYCHIC_TERRAIN': PokemonType.PSYCHIC,
+}
+SCREENS = {
+    MoveCategory.PHYSICAL: (SideCondition.REFLECT, SideCondition.AURORA_VEIL),
+    MoveCategory.SPECIAL: (SideCondition.LIGHT_SCREEN, SideCondition.AURORA_VEIL),
+}
+
+
+class DamageRange(NamedTuple):
+    min_damage: int
+    max_damage: int
+    min_percent: float
+    max_percent: float
+    ko_chance: float
+
+    @property
+    def expected_percent(self) -> float:
+        return (self.min_percent + self.max_percent) / 2
+
+
+NO_DAMAGE = DamageRange(0, 0, 0.0, 0.0, 0.0)
+
+
+@lru_cache(maxsize=4096)
+def _random_battle_stats(base_stats: Tuple[int, ...], level: int) -> Dict[str, float]:
+    return {stat: stat_value(base, level) for stat, base in zip(STAT_NAMES, base_stats)}
+
+
+def pokemon_stats(pokemon: Pokemon) -> Dict[str, float]:
+    stats = pokemon.stats
+    if all(stats.get(stat) for stat in STAT_NAMES):
+        return stats
+    base_stats = pokemon.base_stats
+    return _random_battle_stats(tuple(base_stats[stat] for stat in STAT_NAMES), pokemon.level)
+
+
+def pokemon_max_hp(pokemon: Pokemon) -> int:
+    if pokemon.stats.get('atk'):
+        return pokemon.max_hp
+    return stat_value(pokemon.base_stats['hp'], pokemon.level, hp=True)
+
+
+def _pokemon_key(pokemon: Pokemon) -> tuple:
+    stats = pokemon_stats(pokemon)
+    return (
+        pokemon.species, pokemon.level, tuple(stats[stat] for stat in STAT_NAMES), pokemon_max_hp(pokemon),
+        pokemon.type_1, pokemon.type_2, pokemon.ability, pokemon.item, pokemon.status == Status.BRN,
+        pokemon.gen,
+    )
+
+
+def _compute_move_key(move: Move) -> tuple:
+    return (
+        move.id, move.base_power, move.type, move.category, move.defensive_category, move.n_hit, move.expected_hits,
+        move.damage, move.entry.get('overrideOffensiveStat'), move.use_target_offensive,
+    )
+
+
+_MOVE_KEYS: Dict[Tuple[str, int], tuple] = {}
+
+
+def _move_key(move: Move) -> tuple:
+    if type(move) is not Move:
+        return _compute_move_key(move)
+    cache_key = (move.id, move.gen)
+    key = _MOVE_KEYS.get(cache_key)
+    if key is None:
+        key = _MOVE_KEYS[cache_key] = _compute_move_key(move)
+    return key
+
+
+def field_key(battle: AbstractBattle, defender_is_opponent: bool = True) -> tuple:
+    side_conditions = battle.opponent_side_conditions if defender_is_opponent else battle.side_conditions
+    return (
+        tuple(sorted(weather.name for weather in battle.weather)),
+        tuple(sorted(field.name for field in battle.fields)),
+        tuple(sorted(condition.name for condition in side_conditions if condition.name in ('REFLECT', 'LIGHT_SCREEN', 'AURORA_VEIL'))),
+    )
+
+
+@lru_cache(maxsize=1 << 16)
+def _damage_rolls(attacker: tuple, defender: tuple, move: tuple, boosts: Tuple[int, int], field: tuple) -> Tuple[int, ...]:
+    move_id, base_power, move_type, category, defensive_category, _, _, fixed_damage, offensive_stat, use_target = move
+    _, level, attacker_stats, _, attacker_type_1, attacker_type_2, ability, item, burned, gen = attacker
+    _, _, defender_stats, _, defender_type_1, defender_type_2, defender_ability, defender_item, _, _ = defender
+    attacker_stats = dict(zip(STAT_NAMES, attacker_stats))
+    defender_stats = dict(zip(STAT_NAMES, defender_stats))
+
+    effectiveness = tables_for_gen(gen).pair_lookup[TYPE_INDEX[move_type]][TYPE_INDEX[defender_type_1]][TYPE_INDEX[defender_type_2]]
+    if not effectiveness or IMMUNITY_ABILITIES.get(defender_ability) == move_type:
+        return (0,) * len(ROLLS)
+    if fixed_damage == 'level':
+        return (level,) * len(ROLLS)
+    if fixed_damage:
+        return (fixed_damage,) * len(ROLLS)
+
+    physical = category == MoveCategory.PHYSICAL
+    attack_stat = offensive_stat or ('atk' if physical else 'spa')
+    defense_stat = 'def' if defensive_category == MoveCategory.PHYSICAL else 'spd'
+    attack = (defender_stats if use_target else attacker_stats)[attack_stat] * boost_multiplier(boosts[0])
+    defense = defender_stats[defense_stat] * boost_multiplier(boosts[1])
+    if physical:
+        attack *= ATTACK_ABILITIES.get(ability, 1.0)
+    if item == 'choiceband' and physical or item == 'choicespecs' and not physical:
+        attack *= 1.5
+    if defender_item == 'assaultvest' and defense_stat == 'spd' or defender_item == 'eviolite':
+        defense *= 1.5
+    if ability == 'technician' and base_power <= 60:
+        base_power *= 1.5
+
+    weathers, fields, screens = field
+    modifier = 1.0
+    for weather in weathers:
+        modifier *= WEATHER_BOOSTS.get(weather, {}).get(move_type, 1.0)
+    for terrain in fields:
+        if TERRAIN_BOOSTS.get(terrain) == move_type:
+            modifier *= 1.3 if gen >= 8 else 1.5
+    if move_type in (attacker_type_1, attacker_type_2):
+        modifier *= 2.0 if ability == 'adaptability' else 1.5
+    modifier *= effectiveness
+    if move_type in RESIST_ABILITIES.get(defender_ability, ()):
+        modifier *= 0.5
+    if effectiveness > 1 and defender_ability in SUPER_EFFECTIVE_FILTERS:
+        modifier *= 0.75
+    if effectiveness < 1 and ability == 'tintedlens':
+        modifier *= 2.0
+    if burned and physical and ability != 'guts' and move_id != 'facade':
+        modifier *= 0.5
+    if any(screen.name in screens for screen in SCREENS.get(defensive_category, ())):
+        modifier *= 0.5
+    if item == 'lifeorb':
+        modifier *= 1.3
+    elif item == 'expertbelt' and effectiveness > 1:
+        modifier *= 1.2
+    if not modifier:
+        return (0,) * len(ROLLS)
+
+    base = math.floor(math.floor(math.floor(2 * level / 5 + 2) * base_power * attack / max(defense, 1)) / 50) + 2
+    return tuple(max(1, math.floor(math.floor(base * roll / 100) * modifier)) for roll in ROLLS)
+
+
+def _estimate(attacker: tuple, defender: tuple, move: tuple, attacker_boosts: Dict[str, int],
+              defender_boosts: Dict[str, int], field: tuple, current_hp: int) -> DamageRange:
+    _, base_power, move_type, category, defensive_category, (min_hits, max_hits), hits, fixed_damage, offensive_stat, use_target = move
+    if category == MoveCategory.STATUS or move_type is None or not (base_power or fixed_damage):
+        return NO_DAMAGE
+    offensive_stat = offensive_stat or ('atk' if category == MoveCategory.PHYSICAL else 'spa')
+    defensive_stat = 'def' if defensive_category == MoveCategory.PHYSICAL else 'spd'
+    boosts = (
+        (defender_boosts if use_target else attacker_boosts).get(offensive_stat, 0),
+        defender_boosts.get(defensive_stat, 0),
+    )
+    rolls = _damage_rolls(attacker, defender, move, boosts, field)
+
+    max_hp = defender[3]
+    min_damage, max_damage = rolls[0] * min_hits, rolls[-1] * max_hits
+    return DamageRange(
+        min_damage,
+        max_damage,
+        100 * min_damage / max_hp,
+        100 * max_damage / max_hp,
+        (len(rolls) - bisect.bisect_left(rolls, current_hp / hits)) / len(rolls) if hits else 0.0,
+    )
+
+
+def damage_against(attacker: Pokemon, defender: Pokemon, moves: List[Move], field: tuple = ((), (), ()),
+                   attacker_boosts: Optional[Dict[str, int]] = None,
+                   defender_boosts: Optional[Dict[str, int]] = None) -> List[DamageRange]:
+    if not attacker or not defender:
+        return [NO_DAMAGE] * len(moves)
+    attacker_boosts = attacker.boosts if attacker_boosts is None else attacker_boosts
+    defender_boosts = defender.boosts if defender_boosts is None else defender_boosts
+    attacker_key = _pokemon_key(attacker)
+    defender_key = _pokemon_key(defender)
+    current_hp = max(1, round(defender.current_hp_fraction * defender_key[3]))
+    return [_estimate(attacker_key, defender_key, _move_key(move), attacker_boosts, defender_boosts, field, current_hp)
+            for move in moves]
+
+
+def estimate_damage(attacker: Pokemon, defender: Pokemon, move: Move, field: tuple = ((), (), ()),
+                    attacker_boosts: Optional[Dict[str, int]] = None,
+                    defender_boosts: Optional[Dict[str, int]] = None) -> DamageRange:
+    return damage_against(attacker, defender, [move], field, attacker_boosts, defender_boosts)[0]
+
+
+def damage_ranges(battle: AbstractBattle, moves: List[Move], target: Optional[Pokemon]) -> List[DamageRange]:
+    field = field_key(battle, defender_is_opponent=target is battle.opponent_active_pokemon)
+    return damage_against(battle.active_pokemon, target, moves, field)
+
+
+def damage_percentages(battle: AbstractBattle, moves: List[Move], target: Optional[Pokemon]) -> np.ndarray:
+    return np.array([min(100.0, damage.expected_percent) for damage in damage_ranges(battle, moves, target)], dtype=float)
+
+
+class MaxDamagePlayer(MaxBasePowerPlayer):
+
+    def choose_move(self, battle: AbstractBattle):
+        if self.format_is_doubles or not battle.available_moves:
+            return super().choose_move(battle)
+        damages = damage_percentages(battle, battle.available_moves, battle.opponent_active_pokemon)
+        if not damages.any():
+            return super().choose_move(battle)
+        return Player.create_order(battle.available_moves[int(np.argmax(damages))])
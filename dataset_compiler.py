@@ -0,0 +1,404 @@
+import csv
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import numpy.lib.format as npy_format
+
+from parquet_logger import enum_name
+from tournament import write_json_atomic
+
+MAX_MOVES = 4
+MAX_SWITCHES = 5
+STATUSES = ('BRN', 'FRZ', 'PAR', 'PSN', 'SLP', 'TOX', 'FNT')
+SIDES = ('active', 'opponent')
+SIDE_NUMBERS = ('hp', 'max_hp', 'hp_fraction', 'atk', 'def', 'spa', 'spd', 'spe')
+
+FEATURE_COLUMNS = (
+    ['turn', 'n_moves', 'n_switches']
+    + [f'{side}_{name}' for side in SIDES for name in SIDE_NUMBERS]
+    + [f'{side}_{status.lower()}' for side in SIDES for status in STATUSES]
+)
+TOKEN_COLUMNS = (
+    ['active_pokemon', 'opponent_pokemon']
+    + [f'move_{i}' for i in range(MAX_MOVES)]
+    + [f'switch_{i}' for i in range(MAX_SWITCHES)]
+)
+SPECIES_TOKENS = [0, 1] + list(range(2 + MAX_MOVES, 2 + MAX_MOVES + MAX_SWITCHES))
+MOVE_TOKENS = list(range(2, 2 + MAX_MOVES))
+LABEL_COLUMNS = ['action', 'move', 'fainted', 'battle']
+
+ARRAYS = {
+    'features': (np.float32, len(FEATURE_COLUMNS)),
+    'tokens': (np.int32, len(TOKEN_COLUMNS)),
+    'labels': (np.int32, len(LABEL_COLUMNS)),
+    'damage': (np.float32, None),
+    'outcomes': (np.int8, None),
+}
+VOCABULARIES = ('species', 'moves', 'battles')
+REQUIRED_COLUMNS = ('battle_tag', 'player_username')
+CHUNK_BYTES = 32 << 20
+STATE_FILE = 'dataset.json'
+FINGERPRINT_BYTES = 4096
+
+
+class NpyAppender:
+
+    def __init__(self, path: Path, dtype, width: Optional[int] = None):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.width = width
+        if not path.exists():
+            with open(path, 'wb') as f:
+                self._write_header(f, 0)
+        with open(path, 'rb') as f:
+            npy_format.read_magic(f)
+            shape, _, dtype = npy_format.read_array_header_1_0(f)
+            self.offset = f.tell()
+        if dtype != self.dtype or shape[1:] != self._row_shape:
+            raise ValueError(f"{path} holds {dtype} {shape}, expected {self.dtype} (n, {width})")
+        self.rows = shape[0]
+
+    @property
+    def _row_shape(self) -> tuple:
+        return () if self.width is None else (self.width,)
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def _write_header(self, f, rows: int):
+        header = {'descr': npy_format.dtype_to_descr(self.dtype), 'fortran_order': False, 'shape': (rows,) + self._row_shape}
+        npy_format.write_array_header_1_0(f, header)
+
+    def append(self, rows: np.ndarray):
+        rows = np.ascontiguousarray(rows, dtype=self.dtype).reshape((-1,) + self._row_shape)
+        if not len(rows):
+            return
+        row_bytes = self.dtype.itemsize * (self.width or 1)
+        with open(self.path, 'r+b') as f:
+            f.seek(self.offset + self.rows * row_bytes)
+            f.write(rows.tobytes())
+            f.truncate()
+            f.flush()
+            self.rows += len(rows)
+            f.seek(0)
+            self._write_header(f, self.rows)
+
+    def truncate(self, rows: int):
+        if rows >= self.rows:
+            return
+        with open(self.path, 'r+b') as f:
+            self.rows = rows
+            self._write_header(f, rows)
+            f.truncate(self.offset + rows * self.dtype.itemsize * (self.width or 1))
+
+    def memmap(self, mode: str = 'r') -> np.ndarray:
+        return np.load(self.path, mmap_mode=mode)
+
+
+def _number(value) -> float:
+    return float(value) if value else 0.0
+
+
+def _split(value: Optional[str], limit: int) -> List[str]:
+    return value.split('|')[:limit] if value else []
+
+
+def _token(vocabulary: Dict[str, int], name: Optional[str]) -> int:
+    if not name:
+        return 0
+    index = vocabulary.get(name)
+    if index is None:
+        index = vocabulary[name] = len(vocabulary) + 1
+    return index
+
+
+def compile_chunk(path: str, header: List[str], start: int, end: int) -> Dict[str, Any]:
+    with open(path, 'rb') as f:
+        f.seek(start)
+        text = f.read(end - start).decode('utf-8')
+
+    species: Dict[str, int] = {}
+    moves: Dict[str, int] = {}
+    battles: Dict[str, int] = {}
+    features, tokens, labels, damage, outcomes = [], [], [], [], []
+    for values in csv.reader(io.StringIO(text, newline='')):
+        row = dict(zip(header, values))
+        tag = row.get('battle_tag')
+        player = row.get('player_username')
+        if not tag or not player or tag == 'battle_tag':
+            continue
+        battle_key = f"{tag}|{player}"
+        battle = battles.get(battle_key)
+        if battle is None:
+            battle = battles[battle_key] = len(battles)
+        won = row.get('won_battle')
+        if won:
+            outcomes.append((battle, int(float(won))))
+            continue
+
+        available_moves = _split(row.get('available_moves'), MAX_MOVES)
+        available_switches = _split(row.get('available_switches'), MAX_SWITCHES)
+        # Switches and default orders both log no move and no switch target, so they get no action label
+        selected = row.get('selected_move')
+        action = available_moves.index(selected) if selected in available_moves else -1
+
+        statuses = [enum_name(row.get(f'{side}_status')) for side in SIDES]
+        features.append(
+            [_number(row.get('turn')), len(available_moves), len(available_switches)]
+            + [_number(row.get(f'{side}_{name}')) for side in SIDES for name in SIDE_NUMBERS]
+            + [float(status == name) for status in statuses for name in STATUSES]
+        )
+        move_tokens = [_token(moves, move_id) for move_id in available_moves]
+        switch_tokens = [_token(species, name) for name in available_switches]
+        tokens.append(
+            [_token(species, row.get('active_pokemon')), _token(species, row.get('opponent_pokemon'))]
+            + move_tokens + [0] * (MAX_MOVES - len(move_tokens))
+            + switch_tokens + [0] * (MAX_SWITCHES - len(switch_tokens))
+        )
+        labels.append([action, _token(moves, selected), int(_number(row.get('fainted'))), battle])
+        damage.append(_number(row.get('damage_dealt')))
+
+    return {
+        'features': np.array(features, dtype=np.float32).reshape(-1, len(FEATURE_COLUMNS)),
+        'tokens': np.array(tokens, dtype=np.int32).reshape(-1, len(TOKEN_COLUMNS)),
+        'labels': np.array(labels, dtype=np.int32).reshape(-1, len(LABEL_COLUMNS)),
+        'damage': np.array(damage, dtype=np.float32),
+        'outcomes': np.array(outcomes, dtype=np.int64).reshape(-1, 2),
+        'species': list(species),
+        'moves': list(moves),
+        'battles': list(battles),
+    }
+
+
+def _compile_job(job: Tuple[str, List[str], int, int]) -> Dict[str, Any]:
+    return compile_chunk(*job)
+
+
+class Vocabulary:
+
+    def __init__(self, path: Path, padded: bool = True):
+        self.path = path
+        self.first = 1 if padded else 0
+        self.names: List[str] = [''] * self.first
+        if path.exists():
+            with open(path, encoding='utf-8') as f:
+                self.names += f.read().splitlines()
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self._saved = len(self.names)
+        self._rewrite = False
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def add_all(self, names: List[str]) -> np.ndarray:
+        ids = []
+        for name in names:
+            index = self.index.get(name)
+            if index is None:
+                index = self.index[name] = len(self.names)
+                self.names.append(name)
+            ids.append(index)
+        return np.array(ids, dtype=np.int64)
+
+    def truncate(self, size: int):
+        size = max(size, self.first)
+        if size < len(self.names):
+            for name in self.names[size:]:
+                del self.index[name]
+            del self.names[size:]
+            self._saved = size
+            self._rewrite = True
+
+    def save(self):
+        if self._rewrite:
+            with open(self.path, 'w', encoding='utf-8') as f:
+                f.writelines(f"{name}\n" for name in self.names[self.first:])
+            self._rewrite = False
+        elif self._saved < len(self.names):
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.writelines(f"{name}\n" for name in self.names[self._saved:])
+        self._saved = len(self.names)
+
+
+class DatasetCompiler:
+
+    def __init__(self, output_dir: str = "battle_data/dataset", chunk_bytes: int = CHUNK_BYTES,
+                 workers: Optional[int] = None):
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.chunk_bytes = chunk_bytes
+        self.workers = workers or os.cpu_count() or 1
+
+        state_path = self.output_dir / STATE_FILE
+        state: Dict[str, Any] = {}
+        if state_path.exists():
+            with open(state_path) as f:
+                state = json.load(f)
+        self.offsets: Dict[str, int] = state.get('offsets', {})
+        self.fingerprints: Dict[str, Dict[str, Any]] = state.get('fingerprints', {})
+        self.rows = state.get('rows', 0)
+
+        self.arrays = {name: NpyAppender(self.output_dir / f"{name}.npy", dtype, width)
+                       for name, (dtype, width) in ARRAYS.items()}
+        self.vocabularies = {name: Vocabulary(self.output_dir / f"{name}.txt", padded=name != 'battles')
+                             for name in VOCABULARIES}
+        sizes = state.get('vocabulary_sizes', {})
+        for name, vocabulary in self.vocabularies.items():
+            vocabulary.truncate(sizes.get(name, 0))
+        for name, array in self.arrays.items():
+            array.truncate(len(self.vocabularies['battles']) if name == 'outcomes' else self.rows)
+        self.save()
+
+    def chunks(self, path: str) -> List[Tuple[str, List[str], int, int]]:
+        with open(path, 'rb') as f:
+            header = next(csv.reader([f.readline().decode('utf-8')]))
+            missing = [column for column in REQUIRED_COLUMNS if column not in header]
+            if missing:
+                print(f"Skipping {path}: missing {', '.join(missing)} columns, so turns can't be tied to a battle")
+                return []
+            stat = os.fstat(f.fileno())
+            size = stat.st_size
+            if not self._same_file(path, f, stat):
+                print(f"{path} shrank or was rewritten since it was compiled, rescanning it from the start")
+                self.offsets.pop(path, None)
+            f.seek(0)
+            head_bytes = min(size, FINGERPRINT_BYTES)
+            self.fingerprints[path] = {'inode': stat.st_ino, 'head_bytes': head_bytes,
+                                       'head': hashlib.sha1(f.read(head_bytes)).hexdigest()}
+            f.seek(0)
+            f.readline()
+            start = max(self.offsets.get(path, 0), f.tell())
+            jobs = []
+            while start < size:
+                f.seek(min(start + self.chunk_bytes, size))
+                if f.tell() < size:
+                    f.readline()
+                end = f.tell()
+                if end >= size:
+                    f.seek(start)
+                    end = start + f.read(size - start).rfind(b'\n') + 1
+                    if end <= start:
+                        break
+                jobs.append((path, header, start, end))
+                start = end
+        return jobs
+
+    def _same_file(self, path: str, f, stat: os.stat_result) -> bool:
+        offset = self.offsets.get(path, 0)
+        fingerprint = self.fingerprints.get(path)
+        if not offset or fingerprint is None:
+            return stat.st_size >= offset
+        if stat.st_size < offset or stat.st_ino != fingerprint['inode']:
+            return False
+        f.seek(0)
+        return hashlib.sha1(f.read(fingerprint['head_bytes'])).hexdigest() == fingerprint['head']
+
+    def compile(self, paths: List[str]) -> Dict[str, Any]:
+        start_time = time.perf_counter()
+        start_rows = self.rows
+        jobs = [job for path in paths for job in self.chunks(str(path))]
+        if self.workers <= 1 or len(jobs) <= 1:
+            for job in jobs:
+                self._append(job, _compile_job(job))
+        else:
+            with ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+                pending = deque()
+                for job in jobs:
+                    pending.append((job, pool.submit(_compile_job, job)))
+                    if len(pending) >= 2 * self.workers:
+                        done_job, future = pending.popleft()
+                        self._append(done_job, future.result())
+                while pending:
+                    done_job, future = pending.popleft()
+                    self._append(done_job, future.result())
+
+        elapsed = time.perf_counter() - start_time
+        return {
+            'chunks': len(jobs),
+            'rows_added': self.rows - start_rows,
+            'rows': self.rows,
+            'species': len(self.vocabularies['species']),
+            'moves': len(self.vocabularies['moves']),
+            'battles': len(self.vocabularies['battles']),
+            'elapsed_seconds': round(elapsed, 3),
+            'rows_per_second': round((self.rows - start_rows) / elapsed, 1) if elapsed else 0.0,
+        }
+
+    def _append(self, job: Tuple[str, List[str], int, int], chunk: Dict[str, Any]):
+        species = np.concatenate(([0], self.vocabularies['species'].add_all(chunk['species'])))
+        moves = np.concatenate(([0], self.vocabularies['moves'].add_all(chunk['moves'])))
+        battles = self.vocabularies['battles'].add_all(chunk['battles'])
+
+        tokens = chunk['tokens']
+        tokens[:, SPECIES_TOKENS] = species[tokens[:, SPECIES_TOKENS]]
+        tokens[:, MOVE_TOKENS] = moves[tokens[:, MOVE_TOKENS]]
+        labels = chunk['labels']
+        labels[:, 1] = moves[labels[:, 1]]
+        labels[:, 3] = battles[labels[:, 3]]
+
+        for name in ('features', 'tokens', 'labels', 'damage'):
+            self.arrays[name].append(chunk[name])
+        self.rows += len(labels)
+
+        outcomes = self.arrays['outcomes']
+        missing = len(self.vocabularies['battles']) - len(outcomes)
+        if missing > 0:
+            outcomes.append(np.full(missing, -1, dtype=np.int8))
+        if len(chunk['outcomes']):
+            values = outcomes.memmap('r+')
+            values[battles[chunk['outcomes'][:, 0]]] = chunk['outcomes'][:, 1]
+            values.flush()
+            del values
+
+        path, _, _, end = job
+        self.offsets[path] = end
+        self.save()
+
+    def save(self):
+        for vocabulary in self.vocabularies.values():
+            vocabulary.save()
+        write_json_atomic(self.output_dir / STATE_FILE, {
+            'feature_columns': FEATURE_COLUMNS,
+            'token_columns': TOKEN_COLUMNS,
+            'label_columns': LABEL_COLUMNS,
+            'rows': self.rows,
+            'vocabulary_sizes': {name: len(vocabulary) for name, vocabulary in self.vocabularies.items()},
+            'offsets': self.offsets,
+            'fingerprints': self.fingerprints,
+        })
+
+
+def load_dataset(output_dir: str = "battle_data/dataset") -> Dict[str, Any]:
+    path = Path(output_dir)
+    with open(path / STATE_FILE) as f:
+        state = json.load(f)
+    dataset: Dict[str, Any] = {name: np.load(path / f"{name}.npy", mmap_mode='r') for name in ARRAYS}
+    for name in ('species', 'moves'):
+        with open(path / f"{name}.txt", encoding='utf-8') as f:
+            dataset[name] = [''] + f.read().splitlines()
+    dataset.update({key: state[key] for key in ('feature_columns', 'token_columns', 'label_columns')})
+    return dataset
+
+
+def default_logs(data_dir: str = "battle_data") -> List[str]:
+    return [str(path) for path in sorted(Path(data_dir).glob("*.csv"), key=lambda path: (path.stat().st_mtime, path.name))]
+
+
+if __name__ == "__main__":
+    import sys
+
+    output = sys.argv[1] if len(sys.argv) > 1 else "battle_data/dataset"
+    logs = sys.argv[2:] or default_logs()
+    summary = DatasetCompiler(output).compile(logs)
+    print(f"Compiled {summary['rows_added']} new turns from {summary['chunks']} chunks into {output} "
+          f"({summary['rows']} total, {summary['rows_per_second']} turns/s)")
+    print(f"Vocabularies: {summary['species']} species, {summary['moves']} moves, {summary['battles']} battles")
@@ -0,0 +1,143 @@
+import asyncio
+import multiprocessing
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Awaitable, Dict, Iterable, List, Optional
+
+from poke_env.battle import Battle
+from poke_env.player import Player
+
+from battle_engine import SimBattle
+from battle_farm import FARM_BOTS, split_battles
+
+
+def order_to_choice(order) -> str:
+    message = order.message if order is not None else ""
+    return message[8:] if message.startswith("/choose ") else "default"
+
+
+class HeadlessBattle:
+
+    def __init__(self, p1: Player, p2: Player, seed: int, battle_format: str = "gen8randombattle"):
+        self.players = {'p1': p1, 'p2': p2}
+        self.seed = seed
+        self.battle_tag = f"battle-{battle_format}-{seed}"
+        self.sim = SimBattle(self.battle_tag, battle_format, (p1.username, p2.username), seed)
+        self.views = {
+            side_id: Battle(
+                battle_tag=self.battle_tag,
+                username=player.username,
+                logger=player.logger,
+                gen=self.sim.gen,
+            )
+            for side_id, player in self.players.items()
+        }
+        self._introduced = set()
+
+    def _feed(self, logs: Dict[str, List[str]]):
+        for side_id, lines in logs.items():
+            view = self.views[side_id]
+            for line in lines:
+                split_message = line.split("|")
+                event = split_message[1]
+                if event == "win":
+                    view.won_by(split_message[2])
+                elif event == "tie":
+                    view.tied()
+                else:
+                    view.parse_message(split_message)
+
+    async def _decide(self, side_id: str):
+        view = self.views[side_id]
+        view.parse_request(self.sim.request(side_id, include_moves=side_id not in self._introduced))
+        self._introduced.add(side_id)
+        order = self.players[side_id].choose_move(view)
+        if isinstance(order, Awaitable):
+            order = await order
+        if self.sim.choose(side_id, order_to_choice(order)) is not None:
+            self.sim.choose(side_id, "default")
+
+    async def play(self) -> Optional[str]:
+        random.seed(self.seed)
+        self.sim.start()
+        while True:
+            self._feed(self.sim.flush_log())
+            if self.sim.ended:
+                break
+            for side in self.sim.pending_sides():
+                await self._decide(side.id)
+            self.sim.resolve()
+
+        for side_id, player in self.players.items():
+            view = self.views[side_id]
+            player._battles[self.battle_tag] = view
+            player._battle_finished_callback(view)
+        return self.sim.winner
+
+
+async def play_battles(p1: Player, p2: Player, seeds: Iterable[int],
+                       battle_format: str = "gen8randombattle") -> Dict[str, Any]:
+    winners = {'p1': 0, 'p2': 0, None: 0}
+    battles = 0
+    turns = 0
+    start = time.perf_counter()
+    for seed in seeds:
+        battle = HeadlessBattle(p1, p2, seed, battle_format)
+        winners[await battle.play()] += 1
+        battles += 1
+        turns += battle.sim.turn
+    elapsed = time.perf_counter() - start
+    return {
+        'p1_wins': winners['p1'],
+        'p2_wins': winners['p2'],
+        'ties': winners[None],
+        'battles': battles,
+        'turns': turns,
+        'elapsed_seconds': round(elapsed, 3),
+        'battles_per_second': round(battles / elapsed, 2) if elapsed > 0 else 0.0,
+    }
+
+
+def _run_seed_range(p1_bot: str, p2_bot: str, first_seed: int, n_battles: int, battle_format: str) -> Dict[str, Any]:
+    player_kwargs = dict(battle_format=battle_format, start_listening=False)
+    p1 = FARM_BOTS[p1_bot](None, **player_kwargs)
+    p2 = FARM_BOTS[p2_bot](None, **player_kwargs)
+    return asyncio.run(play_battles(p1, p2, range(first_seed, first_seed + n_battles), battle_format))
+
+
+def run_batch(p1_bot: str, p2_bot: str, n_battles: int = 1000, seed: int = 0,
+              battle_format: str = "gen8randombattle", n_workers: int = 1) -> Dict[str, Any]:
+    if n_workers <= 1:
+        return _run_seed_range(p1_bot, p2_bot, seed, n_battles, battle_format)
+
+    shard_sizes = split_battles(n_battles, n_workers)
+    first_seeds = [seed + sum(shard_sizes[:shard]) for shard in range(len(shard_sizes))]
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=len(shard_sizes), mp_context=multiprocessing.get_context("spawn")) as pool:
+        shards = list(pool.map(
+            _run_seed_range,
+            [p1_bot] * len(shard_sizes), [p2_bot] * len(shard_sizes), first_seeds, shard_sizes,
+            [battle_format] * len(shard_sizes),
+        ))
+    elapsed = time.perf_counter() - start
+
+    results = {key: sum(shard[key] for shard in shards) for key in ('p1_wins', 'p2_wins', 'ties', 'battles', 'turns')}
+    results['elapsed_seconds'] = round(elapsed, 3)
+    results['battles_per_second'] = round(results['battles'] / elapsed, 2) if elapsed > 0 else 0.0
+    return results
+
+
+if __name__ == "__main__":
+    import sys
+
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    p1_bot = args[0] if len(args) > 0 else "custom"
+    p2_bot = args[1] if len(args) > 1 else "maxdamage"
+    n_battles = int(args[2]) if len(args) > 2 else 1000
+    n_workers = int(args[3]) if len(args) > 3 else 1
+
+    results = run_batch(p1_bot, p2_bot, n_battles, n_workers=n_workers)
+    print(f"{p1_bot}: {results['p1_wins']} wins / {p2_bot}: {results['p2_wins']} wins / {results['ties']} ties "
+          f"({results['battles']} battles in {results['elapsed_seconds']:.1f}s, "
+          f"{results['battles_per_second']:.1f} battles/s)")
@@ -0,0 +1,191 @@
+import bisect
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Awaitable, Dict, List, Optional
+
+from poke_env.battle import AbstractBattle
+from poke_env.player import Player
+
+from tournament import write_json_atomic
+
+LATENCY_BUCKETS_MS = [0.25, 0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500]
+TURN_BUCKETS = [10, 15, 20, 25, 30, 40, 50, 75, 100]
+INITIAL_ELO = 1000.0
+ELO_K = 32
+
+
+def _empty_histogram(buckets: List[float]) -> Dict[str, Any]:
+    return {'buckets': list(buckets), 'counts': [0] * (len(buckets) + 1), 'sum': 0.0, 'count': 0}
+
+
+def _observe(histogram: Dict[str, Any], value: float):
+    histogram['counts'][bisect.bisect_left(histogram['buckets'], value)] += 1
+    histogram['sum'] += value
+    histogram['count'] += 1
+
+
+class LadderTelemetry:
+
+    def __init__(self, label: str, results_path: str = "ladder_results.json", metrics_port: Optional[int] = None,
+                 metrics_host: str = "127.0.0.1"):
+        self.label = label
+        self.results_path = Path(results_path)
+        self.metrics_port = metrics_port
+        self.metrics_host = metrics_host
+        self.results: Dict[str, Any] = {}
+        if self.results_path.exists():
+            with open(self.results_path) as f:
+                self.results = json.load(f)
+        self.stats = self._load_stats(self.results.get(label, {}))
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @staticmethod
+    def _load_stats(entry: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'wins': entry.get('wins', 0),
+            'losses': entry.get('losses', 0),
+            'ties': entry.get('ties', 0),
+            'elo': entry.get('elo', INITIAL_ELO),
+            'ladder_rating': entry.get('ladder_rating'),
+            'turns': entry.get('turns', 0),
+            'decisions': entry.get('decisions', 0),
+            'decision_latency_ms': entry.get('decision_latency_ms') or _empty_histogram(LATENCY_BUCKETS_MS),
+            'turns_per_battle_histogram': entry.get('turns_per_battle_histogram') or _empty_histogram(TURN_BUCKETS),
+        }
+
+    @property
+    def battles(self) -> int:
+        return self.stats['wins'] + self.stats['losses'] + self.stats['ties']
+
+    def attach(self, player: Player) -> Player:
+        choose_move = player.choose_move
+        finished_callback = player._battle_finished_callback
+
+        async def timed_await(order: Awaitable, start: float):
+            order = await order
+            self.record_decision(time.perf_counter() - start)
+            return order
+
+        def timed_choose_move(battle: AbstractBattle):
+            start = time.perf_counter()
+            order = choose_move(battle)
+            if isinstance(order, Awaitable):
+                return timed_await(order, start)
+            self.record_decision(time.perf_counter() - start)
+            return order
+
+        def telemetry_finished_callback(battle: AbstractBattle):
+            finished_callback(battle)
+            self.record_battle(battle)
+
+        player.choose_move = timed_choose_move
+        player._battle_finished_callback = telemetry_finished_callback
+        return player
+
+    def record_decision(self, seconds: float):
+        with self._lock:
+            self.stats['decisions'] += 1
+            _observe(self.stats['decision_latency_ms'], seconds * 1000)
+
+    def record_battle(self, battle: AbstractBattle):
+        with self._lock:
+            stats = self.stats
+            if battle.won:
+                stats['wins'] += 1
+                score = 1.0
+            elif battle.lost:
+                stats['losses'] += 1
+                score = 0.0
+            else:
+                stats['ties'] += 1
+                score = 0.5
+            opponent_elo = battle.opponent_rating or stats['elo']
+            expected = 1 / (1 + 10 ** ((opponent_elo - stats['elo']) / 400))
+            stats['elo'] = round(stats['elo'] + ELO_K * (score - expected), 1)
+            if battle.rating is not None:
+                stats['ladder_rating'] = battle.rating
+            stats['turns'] += battle.turn
+            _observe(stats['turns_per_battle_histogram'], battle.turn)
+            self.results[self.label] = self.summary()
+            write_json_atomic(self.results_path, self.results)
+
+    def summary(self) -> Dict[str, Any]:
+        stats = self.stats
+        battles = self.battles
+        return {
+            'wins': stats['wins'],
+            'losses': stats['losses'],
+            'ties': stats['ties'],
+            'win_rate': round(stats['wins'] / battles * 100, 1) if battles else 0.0,
+            'elo': stats['elo'],
+            'ladder_rating': stats['ladder_rating'],
+            'turns': stats['turns'],
+            'turns_per_battle': round(stats['turns'] / battles, 1) if battles else 0.0,
+            'decisions': stats['decisions'],
+            'decision_latency_ms': stats['decision_latency_ms'],
+            'turns_per_battle_histogram': stats['turns_per_battle_histogram'],
+            'updated': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        }
+
+    def render_metrics(self) -> str:
+        with self._lock:
+            stats = self.stats
+            label = f'bot="{self.label}"'
+            lines = [
+                f"ladder_battles_total{{{label},result=\"win\"}} {stats['wins']}",
+                f"ladder_battles_total{{{label},result=\"loss\"}} {stats['losses']}",
+                f"ladder_battles_total{{{label},result=\"tie\"}} {stats['ties']}",
+                f"ladder_elo{{{label}}} {stats['elo']}",
+                f"ladder_turns_total{{{label}}} {stats['turns']}",
+            ]
+            if stats['ladder_rating'] is not None:
+                lines.append(f"ladder_rating{{{label}}} {stats['ladder_rating']}")
+            for name, histogram in (('ladder_decision_latency_ms', stats['decision_latency_ms']),
+                                    ('ladder_turns_per_battle', stats['turns_per_battle_histogram'])):
+                cumulative = 0
+                for bound, count in zip(histogram['buckets'] + ['+Inf'], histogram['counts']):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{{{label},le=\"{bound}\"}} {cumulative}")
+                lines.append(f"{name}_sum{{{label}}} {round(histogram['sum'], 3)}")
+                lines.append(f"{name}_count{{{label}}} {histogram['count']}")
+        return '\n'.join(lines) + '\n'
+
+    def start_metrics_server(self) -> Optional[str]:
+        if self.metrics_port is None or self._server is not None:
+            return None
+        telemetry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                if self.path == '/metrics':
+                    body, content_type = telemetry.render_metrics().encode(), 'text/plain; version=0.0.4'
+                elif self.path == '/results':
+                    with telemetry._lock:
+                        body, content_type = json.dumps(telemetry.summary()).encode(), 'application/json'
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.metrics_host, self.metrics_port), MetricsHandler)
+        self.metrics_port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, name="ladder-metrics", daemon=True).start()
+        return f"http://{self.metrics_host}:{self.metrics_port}/metrics"
+
+    def stop_metrics_server(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -1,11 +1,18 @@
+import asyncio
+import atexit
 import csv
+import json
 import sqlite3
-from datetime import datetime
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, List, Dict, Any
-from poke_env.player import Player, RandomPlayer, MaxBasePowerPlayer
+from typing import Optional, List, Dict, Any, Awaitable, Union
+from poke_env.player import Player, RandomPlayer
 from poke_env.battle import AbstractBattle
 from poke_env.player.battle_order import BattleOrder
+from turn_features import TURN_FIELDS, TurnFeatureExtractor
+from battle_snapshots import SnapshotWriter
+from damage_calc import MaxDamagePlayer
 
 
 class BattleDataLogger:
@@ -17,22 +24,22 @@ class BattleDataLogger:
     def log_turn_data(self, turn_data: Dict[str, Any]):
         raise NotImplementedError
 
+    def flush(self):
+        pass
+
+    def close(self):
+        self.flush()
+
+    async def aclose(self):
+        self.close()
+
 
 class CSVBattleLogger(BattleDataLogger):
 
+    fieldnames = TURN_FIELDS
+
     def __init__(self, output_path: str):
         super().__init__(output_path)
-        self.fieldnames = [
-            'timestamp', 'battle_tag', 'turn', 'player_username',
-            'active_pokemon', 'active_hp', 'active_max_hp', 'active_hp_fraction',
-            'active_status', 'active_atk', 'active_def', 'active_spa', 'active_spd', 'active_spe',
-            'opponent_pokemon', 'opponent_hp', 'opponent_max_hp', 'opponent_hp_fraction',
-            'opponent_status', 'opponent_atk', 'opponent_def', 'opponent_spa', 'opponent_spd', 'opponent_spe',
-            'selected_move', 'selected_move_type', 'selected_move_category',
-            'selected_move_base_power', 'selected_move_accuracy',
-            'available_moves', 'available_switches',
-            'damage_dealt', 'fainted', 'won_battle'
-        ]
 
         if not self.output_path.exists():
             with open(self.output_path, 'w', newline='', encoding='utf-8') as f:
@@ -45,134 +52,406 @@ class CSVBattleLogger(BattleDataLogger):
             writer.writerow(turn_data)
 
 
+class BufferedCSVBattleLogger(CSVBattleLogger):
+
+    def __init__(self, output_path: str, batch_size: int = 256, flush_interval: float = 5.0):
+        super().__init__(output_path)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._buffer: List[Dict[str, Any]] = []
+        self._file = open(self.output_path, 'a', newline='', encoding='utf-8')
+        self._writer = csv.DictWriter(self._file, fieldnames=self.fieldnames)
+        self._last_flush = time.monotonic()
+        atexit.register(self.close)
+
+    def log_turn_data(self, turn_data: Dict[str, Any]):
+        self._buffer.append(turn_data)
+        if len(self._buffer) >= self.batch_size or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        if self._file.closed:
+            return
+        if self._buffer:
+            self._writer.writerows(self._buffer)
+            self._buffer.clear()
+        self._file.flush()
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+        atexit.unregister(self.close)
+
+
 class SQLiteBattleLogger(BattleDataLogger):
 
-    def __init__(self, output_path: str):
+    column_types = {
+        'turn': 'INTEGER',
+        'active_hp': 'INTEGER', 'active_max_hp': 'INTEGER', 'active_hp_fraction': 'REAL',
+        'active_atk': 'INTEGER', 'active_def': 'INTEGER', 'active_spa': 'INTEGER',
+        'active_spd': 'INTEGER', 'active_spe': 'INTEGER',
+        'opponent_hp': 'INTEGER', 'opponent_max_hp': 'INTEGER', 'opponent_hp_fraction': 'REAL',
+        'opponent_atk': 'INTEGER', 'opponent_def': 'INTEGER', 'opponent_spa': 'INTEGER',
+        'opponent_spd': 'INTEGER', 'opponent_spe': 'INTEGER',
+        'selected_move_base_power': 'INTEGER', 'selected_move_accuracy': 'REAL',
+        'damage_dealt': 'REAL', 'fainted': 'INTEGER', 'won_battle': 'INTEGER',
+    }
+    indexed_columns = ['battle_tag', 'player_username', 'turn']
+
+    def __init__(self, output_path: str, batch_size: int = 256):
         super().__init__(output_path)
+        self.fieldnames = CSVBattleLogger.fieldnames
+        self.batch_size = batch_size
+        self._pending: List[tuple] = []
+        self._insert_sql = (
+            f"INSERT INTO battle_turns ({', '.join(self.fieldnames)}) "
+            f"VALUES ({', '.join('?' for _ in self.fieldnames)})"
+        )
+        self.conn = sqlite3.connect(self.output_path, check_same_thread=False)
         self._init_database()
+        atexit.register(self.close)
 
     def _init_database(self):
-        conn = sqlite3.connect(self.output_path)
-        cursor = conn.cursor()
+        cursor = self.conn.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
 
+        columns = ', '.join(f"{name} {self.column_types.get(name, 'TEXT')}" for name in self.fieldnames)
+        cursor.execute(f'CREATE TABLE IF NOT EXISTS battle_turns (id INTEGER PRIMARY KEY AUTOINCREMENT, {columns})')
+        for column in self.indexed_columns:
+            cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_battle_turns_{column} ON battle_turns ({column})')
 
-        conn.commit()
-        conn.close()
+        self.conn.commit()
 
     def log_turn_data(self, turn_data: Dict[str, Any]):
-        conn = sqlite3.connect(self.output_path)
-        cursor = conn.cursor()
+        self._pending.append(tuple(turn_data.get(name) for name in self.fieldnames))
+        if len(self._pending) >= self.batch_size:
+            self.flush()
 
-        columns = ', '.join(turn_data.keys())
-        placeholders = ', '.join(['?' for _ in turn_data])
+    def flush(self):
+        if not self._pending or self.conn is None:
+            return
+        try:
+            with self.conn:
+                self.conn.executemany(self._insert_sql, self._pending)
+        except sqlite3.Error:
+            # The failed transaction was rolled back; retry row by row so one bad row doesn't sink the batch
+            self._insert_each(self._pending)
+        finally:
+            self._pending.clear()
+
+    def _insert_each(self, rows: List[tuple]):
+        for row in rows:
+            try:
+                with self.conn:
+                    self.conn.execute(self._insert_sql, row)
+            except sqlite3.Error as e:
+                print(f"Error logging turn data: {e}")
+
+    def close(self):
+        if self.conn is None:
+            return
+        self.flush()
+        self.conn.close()
+        self.conn = None
+        atexit.unregister(self.close)
+
+
+_STOP = object()
+
+
+class QueuedBattleLogger(BattleDataLogger):
+
+    POLICIES = ('block', 'drop_oldest', 'spill')
+
+    def __init__(self, target: BattleDataLogger, max_queue_size: int = 1024, policy: str = 'block',
+                 spill_path: Optional[str] = None, batch_size: int = 64):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown backpressure policy '{policy}', expected one of {self.POLICIES}")
+        super().__init__(spill_path or str(target.output_path.with_suffix('.spill.jsonl')))
+        self.target = target
+        self.policy = policy
+        self.batch_size = batch_size
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue_size)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='battle-logger')
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        self._spill_file = None
+        self._spill_reader = None
+        self._spill_start = 0
+        self._spill_written = 0
+        self._spill_read = 0
+        self._closed = False
+
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.spilled = 0
+        self.blocked = 0
+        self.max_queue_depth = 0
+        atexit.register(self.close)
+
+    @property
+    def queue_depth(self) -> int:
+        return self.queue.qsize()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'queue_depth': self.queue_depth,
+            'max_queue_depth': self.max_queue_depth,
+            'enqueued': self.enqueued,
+            'written': self.written,
+            'dropped': self.dropped,
+            'spilled': self.spilled,
+            'blocked': self.blocked,
+        }
 
-        cursor.execute(
-            f'INSERT INTO battle_turns ({columns}) VALUES ({placeholders})',
-            list(turn_data.values())
-        )
+    def log_turn_data(self, turn_data: Dict[str, Any]) -> Optional[Awaitable[None]]:
+        if self._closed:
+            return None
+        if not self._ensure_writer():
+            self._write_batch([turn_data])
+            return None
+
+        # Once rows spill, later rows follow them to disk until the writer has replayed the backlog
+        if self._spill_backlog() or self.policy == 'spill' and self.queue.full():
+            self._spill(turn_data)
+            return None
+        if not self.queue.full():
+            self._enqueue(turn_data)
+            return None
+
+        if self.policy == 'drop_oldest':
+            self.queue.get_nowait()
+            self.dropped += 1
+            self._enqueue(turn_data)
+        else:
+            self.blocked += 1
+            return self._put(turn_data)
+        return None
+
+    def flush(self):
+        if self._closed:
+            return
+        rows = self._drain()
+        if rows:
+            self._executor.submit(self._write_batch, rows)
+        self._executor.submit(self.target.flush)
+
+    def close(self):
+        if self._closed:
+            return
+        if self._on_writer_loop():
+            raise RuntimeError("QueuedBattleLogger.close() would block its own event loop; await aclose() instead")
+        self._closed = True
+        self._stop_writer_threadsafe()
+        rows = self._drain()
+        if rows:
+            self._executor.submit(self._write_batch, rows)
+        self._executor.shutdown(wait=True)
+        self._replay_spill()
+        self.target.close()
+        atexit.unregister(self.close)
+
+    async def aclose(self):
+        if self._on_writer_loop():
+            await self._stop_writer()
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+
+    def _on_writer_loop(self) -> bool:
+        if self._writer_task is None or self._writer_task.done():
+            return False
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
 
-        conn.commit()
-        conn.close()
+    def _ensure_writer(self) -> bool:
+        if self._writer_task is not None:
+            return True
+        try:
+            self._loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return False
+        self._writer_task = self._loop.create_task(self._drain_forever())
+        return True
+
+    def _enqueue(self, turn_data: Dict[str, Any]):
+        self.queue.put_nowait(turn_data)
+        self.enqueued += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue.qsize())
+
+    async def _put(self, turn_data: Dict[str, Any]):
+        await self.queue.put(turn_data)
+        self.enqueued += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue.qsize())
+
+    def _drain(self) -> List[Dict[str, Any]]:
+        rows = []
+        while not self.queue.empty():
+            row = self.queue.get_nowait()
+            if row is not _STOP:
+                rows.append(row)
+        return rows
+
+    async def _drain_forever(self):
+        while True:
+            if self._spill_backlog() and self.queue.empty():
+                await self._replay_spill_batch()
+                continue
+            rows = [await self.queue.get()]
+            while len(rows) < self.batch_size and not self.queue.empty():
+                rows.append(self.queue.get_nowait())
+            stop = _STOP in rows
+            rows = [row for row in rows if row is not _STOP]
+            await self._loop.run_in_executor(self._executor, self._write_batch, rows)
+            if stop:
+                while self._spill_backlog():
+                    await self._replay_spill_batch()
+                return
+
+    async def _replay_spill_batch(self):
+        await self._loop.run_in_executor(self._executor, self._replay_spill_lines)
+        if not self._spill_backlog():
+            self._discard_spill()
+
+    async def _stop_writer(self):
+        if self._writer_task.done():
+            return
+        await self.queue.put(_STOP)
+        await self._writer_task
+
+    def _stop_writer_threadsafe(self):
+        if self._writer_task is None or self._writer_task.done() or self._loop.is_closed():
+            return
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is not self._loop and self._loop.is_running():
+            asyncio.run_coroutine_threadsafe(self._stop_writer(), self._loop).result()
+
+    def _write_batch(self, rows: List[Dict[str, Any]]):
+        for turn_data in rows:
+            try:
+                self.target.log_turn_data(turn_data)
+                self.written += 1
+            except Exception as e:
+                print(f"Error logging turn data: {e}")
+
+    def _spill(self, turn_data: Dict[str, Any]):
+        if self._spill_file is None:
+            self._spill_file = open(self.output_path, 'a', encoding='utf-8')
+            self._spill_start = self._spill_file.tell()
+        self._spill_file.write(json.dumps(turn_data, default=str) + '\n')
+        self._spill_file.flush()
+        self._spill_written += 1
+        self.spilled += 1
+
+    def _spill_backlog(self) -> int:
+        return self._spill_written - self._spill_read
+
+    def _replay_spill_lines(self):
+        if self._spill_reader is None:
+            self._spill_reader = open(self.output_path, encoding='utf-8')
+            self._spill_reader.seek(self._spill_start)
+        rows = []
+        for _ in range(min(self.batch_size, self._spill_backlog())):
+            rows.append(json.loads(self._spill_reader.readline()))
+            self._spill_read += 1
+        self._write_batch(rows)
+
+    def _discard_spill(self):
+        for f in (self._spill_file, self._spill_reader):
+            if f is not None:
+                f.close()
+        self._spill_file = self._spill_reader = None
+        self._spill_written = self._spill_read = 0
+        if self._spill_start:
+            # Leave rows spilled by an earlier session that never replayed them
+            with open(self.output_path, 'r+b') as f:
+                f.truncate(self._spill_start)
+        else:
+            self.output_path.unlink(missing_ok=True)
+
+    def _replay_spill(self):
+        if self._spill_file is None:
+            return
+        while self._spill_backlog():
+            self._replay_spill_lines()
+        self._discard_spill()
+
+
+async def _await_then_return(pending: Awaitable[None], order: BattleOrder) -> BattleOrder:
+    await pending
+    return order
+
+
+def order_after_log(order: BattleOrder, pending: Optional[Awaitable[None]]) -> Union[BattleOrder, Awaitable[BattleOrder]]:
+    if pending is None:
+        return order
+    return _await_then_return(pending, order)
 
 
 class LoggingPlayer(Player):
 
-    def __init__(self, battle_logger: BattleDataLogger, *args, **kwargs):
+    def __init__(self, battle_logger: BattleDataLogger, *args, turn_fields: Optional[List[str]] = None,
+                 snapshot_store: Optional[SnapshotWriter] = None, **kwargs):
         super().__init__(*args, **kwargs)
         self.battle_logger = battle_logger
-        self.previous_hp_data: Dict[str, Dict] = {}
+        self.snapshot_store = snapshot_store
+        self.turn_extractor = TurnFeatureExtractor(turn_fields)
 
     def choose_move(self, battle: AbstractBattle) -> BattleOrder:
         raise NotImplementedError
 
-    def _extract_turn_data(self, battle: AbstractBattle, selected_move: BattleOrder) -> Dict[str, Any]:
-        active = battle.active_pokemon
-        opponent = battle.opponent_active_pokemon
-
-        battle_key = battle.battle_tag
-        damage_dealt = 0.0
-        if battle_key in self.previous_hp_data and opponent:
-            prev_hp = self.previous_hp_data[battle_key].get('opponent_hp', opponent.current_hp)
-            damage_dealt = prev_hp - opponent.current_hp
-
-        if battle_key not in self.previous_hp_data:
-            self.previous_hp_data[battle_key] = {}
-        if opponent:
-            self.previous_hp_data[battle_key]['opponent_hp'] = opponent.current_hp
-
-        selected_move_name = None
-        selected_move_type = None
-        selected_move_category = None
-        selected_move_base_power = None
-        selected_move_accuracy = None
-
-        if hasattr(selected_move, 'order'):
-            move = selected_move.order
-            if hasattr(move, 'id'):
-                selected_move_name = move.id
-                selected_move_type = str(move.type) if hasattr(move, 'type') else None
-                selected_move_category = str(move.category) if hasattr(move, 'category') else None
-                selected_move_base_power = move.base_power if hasattr(move, 'base_power') else None
-                selected_move_accuracy = move.accuracy if hasattr(move, 'accuracy') else None
-
-        turn_data = {
-            'timestamp': datetime.now().isoformat(),
-            'battle_tag': battle.battle_tag,
-            'turn': battle.turn,
-            'player_username': self.username,
-            'active_pokemon': active.species if active else None,
-            'active_hp': active.current_hp if active else None,
-            'active_max_hp': active.max_hp if active else None,
-            'active_hp_fraction': active.current_hp_fraction if active else None,
-            'active_status': str(active.status) if active and active.status else None,
-            'active_atk': active.base_stats.get('atk') if active else None,
-            'active_def': active.base_stats.get('def') if active else None,
-            'active_spa': active.base_stats.get('spa') if active else None,
-            'active_spd': active.base_stats.get('spd') if active else None,
-            'active_spe': active.base_stats.get('spe') if active else None,
-            'opponent_pokemon': opponent.species if opponent else None,
-            'opponent_hp': opponent.current_hp if opponent else None,
-            'opponent_max_hp': opponent.max_hp if opponent else None,
-            'opponent_hp_fraction': opponent.current_hp_fraction if opponent else None,
-            'opponent_status': str(opponent.status) if opponent and opponent.status else None,
-            'opponent_atk': opponent.base_stats.get('atk') if opponent else None,
-            'opponent_def': opponent.base_stats.get('def') if opponent else None,
-            'opponent_spa': opponent.base_stats.get('spa') if opponent else None,
-            'opponent_spd': opponent.base_stats.get('spd') if opponent else None,
-            'opponent_spe': opponent.base_stats.get('spe') if opponent else None,
-            'selected_move': selected_move_name,
-            'selected_move_type': selected_move_type,
-            'selected_move_category': selected_move_category,
-            'selected_move_base_power': selected_move_base_power,
-            'selected_move_accuracy': selected_move_accuracy,
-            'available_moves': '|'.join([m.id for m in battle.available_moves]) if battle.available_moves else '',
-            'available_switches': '|'.join([p.species for p in battle.available_switches]) if battle.available_switches else '',
-            'damage_dealt': damage_dealt,
-            'fainted': 1 if opponent and opponent.fainted else 0,
-            'won_battle': 1 if battle.finished and battle.won else (0 if battle.finished else None)
-        }
+    def _battle_finished_callback(self, battle: AbstractBattle):
+        self._log_battle_result(battle)
+        self.turn_extractor.forget(battle.battle_tag)
+        self.battle_logger.flush()
+        if self.snapshot_store:
+            self.snapshot_store.flush()
 
-        return turn_data
+    async def close(self):
+        await self.battle_logger.aclose()
+        if self.snapshot_store:
+            self.snapshot_store.close()
+        await self.ps_client.stop_listening()
 
-    def _log_battle_turn(self, battle: AbstractBattle, selected_move: BattleOrder):
+    def _extract_turn_data(self, battle: AbstractBattle, selected_move: BattleOrder) -> Dict[str, Any]:
+        return self.turn_extractor.extract(battle, self.username, selected_move)
+
+    def _log_battle_turn(self, battle: AbstractBattle, selected_move: BattleOrder) -> Optional[Awaitable[None]]:
         try:
+            if self.snapshot_store:
+                self.snapshot_store.record(battle, self.username, selected_move)
             turn_data = self._extract_turn_data(battle, selected_move)
-            self.battle_logger.log_turn_data(turn_data)
+            return self.battle_logger.log_turn_data(turn_data)
         except Exception as e:
             print(f"Error logging turn data: {e}")
+            return None
+
+    def _log_battle_result(self, battle: AbstractBattle):
+        try:
+            pending = self.battle_logger.log_turn_data(self._extract_turn_data(battle, None))
+            if pending is not None:
+                asyncio.ensure_future(pending)
+        except Exception as e:
+            print(f"Error logging battle result: {e}")
 
 
 class LoggingRandomPlayer(LoggingPlayer, RandomPlayer):
 
-    def choose_move(self, battle: AbstractBattle) -> BattleOrder:
+    def choose_move(self, battle: AbstractBattle) -> Union[BattleOrder, Awaitable[BattleOrder]]:
         move = self.choose_random_move(battle)
-        self._log_battle_turn(battle, move)
-        return move
+        return order_after_log(move, self._log_battle_turn(battle, move))
 
 
-class LoggingMaxDamagePlayer(LoggingPlayer, MaxBasePowerPlayer):
+class LoggingMaxDamagePlayer(LoggingPlayer, MaxDamagePlayer):
 
-    def choose_move(self, battle: AbstractBattle) -> BattleOrder:
-        move = MaxBasePowerPlayer.choose_move(self, battle)
-        self._log_battle_turn(battle, move)
-        return move
+    def choose_move(self, battle: AbstractBattle) -> Union[BattleOrder, Awaitable[BattleOrder]]:
+        move = MaxDamagePlayer.choose_move(self, battle)
+        return order_after_log(move, self._log_battle_turn(battle, move))
@@ -61,7 +61,13 @@ async def max_damage_battle_sqlite(n_battles: int = 100):
 if __name__ == "__main__":
     import sys
 
-    if len(sys.argv) > 1 and sys.argv[1] == "sqlite":
+    if len(sys.argv) > 1 and sys.argv[1] == "farm":
+        from battle_farm import run_farm
+        n_workers = int(sys.argv[2]) if len(sys.argv) > 2 else None
+        print("Using process-pool farm with CSV shards (add --sqlite for SQLite shards)")
+        run_farm("maxdamage", "maxdamage", n_battles=100, n_workers=n_workers,
+                 log_format="sqlite" if "--sqlite" in sys.argv else "csv")
+    elif len(sys.argv) > 1 and sys.argv[1] == "sqlite":
         print("Using SQLite logging format")
         asyncio.get_event_loop().run_until_complete(max_damage_battle_sqlite(n_battles=1))
     else:
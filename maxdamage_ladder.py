@@ -1,10 +1,11 @@
 import asyncio
 from poke_env import ShowdownServerConfiguration, AccountConfiguration
-from poke_env.player import MaxBasePowerPlayer
+
+from damage_calc import MaxDamagePlayer
 
 
 async def run_ladder_bot(username: str, password: str, n_battles: int = 10):
-    bot = MaxBasePowerPlayer(
+    bot = MaxDamagePlayer(
         battle_format="gen8randombattle",
         server_configuration=ShowdownServerConfiguration,
         account_configuration=AccountConfiguration(username, password),
@@ -17,7 +18,7 @@ async def run_ladder_bot(username: str, password: str, n_battles: int = 10):
     print(f"Username: {username}")
     print(f"Format: gen8randombattle")
     print(f"Battles to play: {n_battles}")
-    print(f"\nStrategy: Select moves with highest base power")
+    print(f"\nStrategy: Select moves with highest estimated damage")
     print("="*60)
     print("\nSearching for ladder opponents...\n")
 
@@ -0,0 +1,223 @@
+import asyncio
+import itertools
+import secrets
+import threading
+from collections import defaultdict, deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from poke_env import ServerConfiguration
+from poke_env.data.normalize import to_id_str
+from websockets.asyncio.server import ServerConnection, serve
+from websockets.exceptions import ConnectionClosed
+
+from battle_engine import SimBattle
+
+
+class MockUser:
+
+    __slots__ = ('name', 'id', 'connection', 'battles')
+
+    def __init__(self, name: str, connection: ServerConnection):
+        self.name = name
+        self.id = to_id_str(name)
+        self.connection = connection
+        self.battles: Dict[str, str] = {}
+
+
+class MockShowdownServer:
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, seed: int = 0):
+        self.host = host
+        self.port = port
+        self.seed = seed
+        self.users: Dict[str, MockUser] = {}
+        self.battles: Dict[str, SimBattle] = {}
+        self.players: Dict[str, Tuple[MockUser, MockUser]] = {}
+        self.challenges: Dict[Tuple[str, str], Deque[str]] = defaultdict(deque)
+        self.searching: Dict[str, Deque[MockUser]] = defaultdict(deque)
+        self.finished_battles = 0
+        self._battle_counter = itertools.count(1)
+        self._server = None
+        self._thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def server_configuration(self) -> ServerConfiguration:
+        return ServerConfiguration(
+            f"ws://{self.host}:{self.port}/showdown/websocket",
+            f"http://{self.host}:{self.port}/action.php?",
+        )
+
+    async def start(self) -> ServerConfiguration:
+        self._server = await serve(self._handle_connection, self.host, self.port, max_size=None, compression=None)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.server_configuration
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self) -> "MockShowdownServer":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.stop()
+
+    def start_in_thread(self) -> ServerConfiguration:
+        started = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(self.start())
+            started.set()
+            self._loop.run_forever()
+            self._loop.run_until_complete(self.stop())
+            self._loop.close()
+
+        self._thread = threading.Thread(target=run, name="mock-showdown", daemon=True)
+        self._thread.start()
+        started.wait()
+        return self.server_configuration
+
+    def stop_thread(self):
+        if self._thread is None:
+            return
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._thread = None
+
+    async def _handle_connection(self, connection: ServerConnection):
+        user: Optional[MockUser] = None
+        await connection.send(f"|challstr|4|{secrets.token_hex(32)}")
+        try:
+            async for message in connection:
+                room, _, text = str(message).partition("|")
+                if text.startswith("/trn "):
+                    user = await self._login(connection, text[5:].split(",")[0])
+                elif user is not None:
+                    await self._handle_command(user, room, text)
+        except ConnectionClosed:
+            pass
+        finally:
+            if user is not None and self.users.get(user.id) is user:
+                del self.users[user.id]
+                for queue in self.searching.values():
+                    if user in queue:
+                        queue.remove(user)
+
+    async def _login(self, connection: ServerConnection, name: str) -> Optional[MockUser]:
+        user = MockUser(name, connection)
+        if user.id in self.users:
+            await connection.send(f"|nametaken|{name}|Someone is already using the name \"{name}\".")
+            return None
+        self.users[user.id] = user
+        await connection.send(f"|updateuser| {name}|1|1|{{\"blockChallenges\":false}}")
+        return user
+
+    async def _handle_command(self, user: MockUser, room: str, text: str):
+        if room.startswith("battle-"):
+            if text.startswith("/choose "):
+                await self._choose(user, room, text[8:])
+            elif text == "/forfeit":
+                battle = self.battles.get(room)
+                if battle is not None and room in user.battles:
+                    battle.forfeit(user.battles[room])
+                    await self._broadcast(room)
+            return
+
+        command, _, argument = text.partition(" ")
+        if command == "/challenge":
+            target_name, _, battle_format = argument.partition(",")
+            target = self.users.get(to_id_str(target_name))
+            battle_format = battle_format.strip()
+            if target is None:
+                await user.connection.send(f"|popup|The user '{target_name}' was not found.")
+                return
+            self.challenges[(user.id, target.id)].append(battle_format)
+            await target.connection.send(
+                f"|pm| {user.name}| {target.name}|/challenge {battle_format}|{battle_format}||"
+            )
+        elif command == "/accept":
+            challenger = self.users.get(to_id_str(argument))
+            pending = self.challenges.get((to_id_str(argument), user.id))
+            if challenger is None or not pending:
+                await user.connection.send(f"|popup|{argument} is not challenging you.")
+                return
+            await self._start_battle(pending.popleft(), challenger, user)
+        elif command == "/search":
+            queue = self.searching[argument.strip()]
+            if user in queue:
+                return
+            if queue:
+                await self._start_battle(argument.strip(), queue.popleft(), user)
+            else:
+                queue.append(user)
+        elif command == "/leave" and argument in user.battles:
+            del user.battles[argument]
+            await user.connection.send(f">{argument}\n|deinit")
+            if not any(argument in player.battles for player in self.players.get(argument, ())):
+                self.battles.pop(argument, None)
+                self.players.pop(argument, None)
+
+    async def _start_battle(self, battle_format: str, p1: MockUser, p2: MockUser):
+        battle_number = next(self._battle_counter)
+        battle_tag = f"battle-{battle_format}-{battle_number}"
+        battle = SimBattle(battle_tag, battle_format, (p1.name, p2.name), seed=self.seed * 1_000_003 + battle_number)
+        self.battles[battle_tag] = battle
+        self.players[battle_tag] = (p1, p2)
+        p1.battles[battle_tag] = 'p1'
+        p2.battles[battle_tag] = 'p2'
+        battle.start()
+        await self._broadcast(battle_tag)
+
+    async def _choose(self, user: MockUser, battle_tag: str, choice: str):
+        battle = self.battles.get(battle_tag)
+        side_id = user.battles.get(battle_tag)
+        if battle is None or side_id is None:
+            return
+        error = battle.choose(side_id, choice)
+        if error is not None:
+            await user.connection.send(f">{battle_tag}\n|error|{error}")
+            return
+        if battle.ready():
+            battle.resolve()
+            await self._broadcast(battle_tag)
+
+    async def _broadcast(self, battle_tag: str):
+        battle = self.battles[battle_tag]
+        logs = battle.flush_log()
+        if battle.ended:
+            self.finished_battles += 1
+        sends: List = []
+        for user in self.players[battle_tag]:
+            side_id = user.battles.get(battle_tag)
+            if side_id is None:
+                continue
+            sends.append(self._send_update(user, battle, side_id, logs[side_id]))
+        await asyncio.gather(*sends)
+
+    @staticmethod
+    async def _send_update(user: MockUser, battle: SimBattle, side_id: str, lines: List[str]):
+        try:
+            if not battle.ended:
+                lines = lines + [f"|request|{battle.request_json(side_id)}"]
+            await user.connection.send(f">{battle.battle_tag}\n" + "\n".join(lines))
+        except ConnectionClosed:
+            pass
+
+
+async def serve_forever(host: str = "127.0.0.1", port: int = 8000, seed: int = 0):
+    async with MockShowdownServer(host, port, seed) as server:
+        print(f"Mock Showdown server listening on {server.server_configuration.websocket_url}")
+        await asyncio.Future()
+
+
+if __name__ == "__main__":
+    import sys
+
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8000
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    asyncio.run(serve_forever(port=port, seed=seed))
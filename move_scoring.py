@@ -0,0 +1,144 @@
+from typing import Callable, List, Optional
+
+import numpy as np
+from poke_env.battle import AbstractBattle, Move, MoveCategory
+
+from damage_calc import damage_percentages
+from set_inference import likely_threat
+from type_tables import TYPE_INDEX, tables_for_gen, pokemon_type_indices
+
+
+class MoveFeatures:
+
+    __slots__ = (
+        'effectiveness', 'has_type', 'base_power', 'accuracy', 'priority', 'boost_total', 'is_status', 'stab',
+        'has_target', 'has_active', 'target_hp_fraction', 'active_hp_fraction', 'target_has_status', 'damage',
+        'threat',
+    )
+
+    def __init__(self, battle: AbstractBattle, moves: List[Move], target):
+        active = battle.active_pokemon
+        active_types = (active.type_1, active.type_2) if active else ()
+        if target:
+            lookup = tables_for_gen(target.gen).pair_lookup
+            target_type_1, target_type_2 = pokemon_type_indices(target)
+
+        self.has_target = bool(target)
+        self.has_active = bool(active)
+        self.target_hp_fraction = target.current_hp_fraction if target else 0.0
+        self.active_hp_fraction = active.current_hp_fraction if active else 0.0
+        self.target_has_status = bool(target and target.status)
+        self.threat = likely_threat(target, active) if target and active else 1.0
+
+        effectiveness = []
+        has_type = []
+        base_power = []
+        accuracy = []
+        priority = []
+        boost_total = []
+        is_status = []
+        stab = []
+
+        for move in moves:
+            move_type = move.type
+            move_power = move.base_power or 0
+            boosts = move.boosts
+            has_type.append(bool(move_type))
+            base_power.append(move_power)
+            accuracy.append(move.accuracy or 100)
+            priority.append(move.priority)
+            boost_total.append(sum(boosts.values()) if boosts else 0)
+            is_status.append(move.category == MoveCategory.STATUS)
+            stab.append(move_type is not None and move_type in active_types)
+            effectiveness.append(lookup[TYPE_INDEX[move_type]][target_type_1][target_type_2] if target and move_type and move_power else 1.0)
+
+        self.effectiveness = np.array(effectiveness, dtype=float)
+        self.has_type = np.array(has_type, dtype=bool)
+        self.base_power = np.array(base_power, dtype=float)
+        self.accuracy = np.array(accuracy, dtype=float)
+        self.priority = np.array(priority, dtype=float)
+        self.boost_total = np.array(boost_total, dtype=float)
+        self.is_status = np.array(is_status, dtype=bool)
+        self.stab = np.array(stab, dtype=bool)
+        self.damage = damage_percentages(battle, moves, target)
+
+    @property
+    def damaging(self) -> np.ndarray:
+        return self.has_type & (self.base_power > 0) & self.has_target
+
+
+def vectorized(column: Callable[[MoveFeatures], np.ndarray]):
+    def decorator(check_function):
+        check_function.vectorized = column
+        return check_function
+    return decorator
+
+
+def super_effective_column(f: MoveFeatures) -> np.ndarray:
+    return np.where(f.damaging & (f.effectiveness > 1), 100 * f.effectiveness, 0.0)
+
+
+def stab_column(f: MoveFeatures) -> np.ndarray:
+    return np.where(f.stab & f.has_active, 50.0, 0.0)
+
+
+def base_power_column(f: MoveFeatures) -> np.ndarray:
+    return f.damage
+
+
+def accuracy_column(f: MoveFeatures) -> np.ndarray:
+    return f.accuracy
+
+
+def status_column(f: MoveFeatures) -> np.ndarray:
+    if not f.has_target or f.target_has_status:
+        return np.zeros_like(f.base_power)
+    return np.where(f.is_status, 30.0, 0.0)
+
+
+def avoid_ineffective_column(f: MoveFeatures) -> np.ndarray:
+    return np.where(f.damaging & (f.effectiveness < 1), -50 * (1 - f.effectiveness), 0.0)
+
+
+def setup_on_resist_column(f: MoveFeatures) -> np.ndarray:
+    if not f.has_active or not f.has_target:
+        return np.zeros_like(f.base_power)
+    if f.target_hp_fraction < 0.3:
+        bonus = 60.0
+    elif f.active_hp_fraction > 0.7:
+        bonus = 50.0
+    else:
+        bonus = 0.0
+    return np.where(f.boost_total > 0, bonus, 0.0)
+
+
+def switch_on_bad_matchup_column(f: MoveFeatures) -> np.ndarray:
+    if not f.has_active:
+        return np.zeros_like(f.base_power)
+    resisted = np.where(f.effectiveness < 1, -50.0, 0.0) if f.threat > 1 else 0.0
+    return np.where(f.damaging, np.where(f.effectiveness < 0.5, -100.0, resisted), 0.0)
+
+
+def offensive_pressure_column(f: MoveFeatures) -> np.ndarray:
+    if not f.has_target or f.target_hp_fraction <= 0.5:
+        return np.zeros_like(f.base_power)
+    return f.damage * 0.5
+
+
+def score_matrix(battle: AbstractBattle, moves: List[Move], target, checks, context=None) -> np.ndarray:
+    features = MoveFeatures(battle, moves, target)
+    matrix = np.empty((len(moves), len(checks)))
+    for j, check in enumerate(checks):
+        column = getattr(check.check_function, 'vectorized', None)
+        if column is not None:
+            matrix[:, j] = column(features)
+        else:
+            matrix[:, j] = [check.raw_score(battle, move, target, context) for move in moves]
+    return matrix
+
+
+def score_moves(battle: AbstractBattle, moves: List[Move], target, checks, weights: Optional[np.ndarray] = None,
+                context=None) -> np.ndarray:
+    if weights is None:
+        weights = np.array([check.priority for check in checks], dtype=float)
+    return score_matrix(battle, moves, target, checks, context) @ weights
@@ -0,0 +1,196 @@
+import atexit
+import csv
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, List, Dict, Any, Iterable
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from logging_player import BattleDataLogger, CSVBattleLogger
+
+ENUM_COLUMNS = ['active_status', 'opponent_status', 'selected_move_type', 'selected_move_category']
+LIST_COLUMNS = ['available_moves', 'available_switches']
+
+TURN_SCHEMA = pa.schema([
+    ('timestamp', pa.timestamp('us')),
+    ('battle_tag', pa.string()),
+    ('turn', pa.int16()),
+    ('player_username', pa.string()),
+    ('active_pokemon', pa.string()),
+    ('active_hp', pa.int16()),
+    ('active_max_hp', pa.int16()),
+    ('active_hp_fraction', pa.float32()),
+    ('active_status', pa.string()),
+    ('active_atk', pa.int16()),
+    ('active_def', pa.int16()),
+    ('active_spa', pa.int16()),
+    ('active_spd', pa.int16()),
+    ('active_spe', pa.int16()),
+    ('opponent_pokemon', pa.string()),
+    ('opponent_hp', pa.int16()),
+    ('opponent_max_hp', pa.int16()),
+    ('opponent_hp_fraction', pa.float32()),
+    ('opponent_status', pa.string()),
+    ('opponent_atk', pa.int16()),
+    ('opponent_def', pa.int16()),
+    ('opponent_spa', pa.int16()),
+    ('opponent_spd', pa.int16()),
+    ('opponent_spe', pa.int16()),
+    ('selected_move', pa.string()),
+    ('selected_move_type', pa.string()),
+    ('selected_move_category', pa.string()),
+    ('selected_move_base_power', pa.int16()),
+    ('selected_move_accuracy', pa.float32()),
+    ('available_moves', pa.list_(pa.string())),
+    ('available_switches', pa.list_(pa.string())),
+    ('damage_dealt', pa.float32()),
+    ('fainted', pa.int8()),
+    ('won_battle', pa.int8()),
+])
+
+STRING_COLUMNS = [field.name for field in TURN_SCHEMA if pa.types.is_string(field.type)]
+
+
+def enum_name(value) -> Optional[str]:
+    if value is None or value == '':
+        return None
+    if hasattr(value, 'name'):
+        return value.name
+    text = str(value)
+    if text.endswith(' object'):
+        return text.split(' ', 1)[0]
+    return text
+
+
+def _to_number(value, cast):
+    if value is None or value == '':
+        return None
+    return cast(float(value))
+
+
+def _to_timestamp(value):
+    if value is None or value == '':
+        return None
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value)
+
+
+def _to_list(value) -> List[str]:
+    if not value:
+        return []
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    return value.split('|')
+
+
+def _converter(field: pa.Field):
+    if field.name in ENUM_COLUMNS:
+        return enum_name
+    if field.name in LIST_COLUMNS:
+        return _to_list
+    if pa.types.is_timestamp(field.type):
+        return _to_timestamp
+    if pa.types.is_integer(field.type):
+        return lambda value: _to_number(value, int)
+    if pa.types.is_floating(field.type):
+        return lambda value: _to_number(value, float)
+    return lambda value: None if value is None or value == '' else str(value)
+
+
+CONVERTERS = {field.name: _converter(field) for field in TURN_SCHEMA}
+
+
+def _part_path(path: Path, part: int) -> Path:
+    return path.with_name(f"{path.stem}.part{part}{path.suffix}")
+
+
+def session_files(path: str) -> List[Path]:
+    path = Path(path)
+    files = [path] if path.exists() else []
+    part = 1
+    while _part_path(path, part).exists():
+        files.append(_part_path(path, part))
+        part += 1
+    return files
+
+
+class ParquetBattleLogger(BattleDataLogger):
+
+    def __init__(self, output_path: str, row_group_size: int = 8192, compression: str = 'zstd',
+                 overwrite: bool = False):
+        super().__init__(output_path)
+        if not overwrite and self.output_path.exists():
+            requested = self.output_path
+            self.output_path = _part_path(requested, len(session_files(str(requested))))
+            print(f"{requested} already exists, logging this session to {self.output_path}")
+        self.fieldnames = CSVBattleLogger.fieldnames
+        self.row_group_size = row_group_size
+        self._columns: Dict[str, List[Any]] = {name: [] for name in self.fieldnames}
+        self._n_pending = 0
+        self._writer: Optional[pq.ParquetWriter] = pq.ParquetWriter(
+            self.output_path, TURN_SCHEMA, compression=compression, use_dictionary=STRING_COLUMNS + LIST_COLUMNS
+        )
+        atexit.register(self.close)
+
+    def log_turn_data(self, turn_data: Dict[str, Any]):
+        for name in self.fieldnames:
+            self._columns[name].append(CONVERTERS[name](turn_data.get(name)))
+        self._n_pending += 1
+        if self._n_pending >= self.row_group_size:
+            self._write_row_group()
+
+    def log_rows(self, rows: Iterable[Dict[str, Any]]):
+        for turn_data in rows:
+            self.log_turn_data(turn_data)
+
+    def flush(self):
+        # A Parquet file is only readable once close() writes the footer, so flushing early buys no
+        # durability; callers flush after every battle, and writing then would emit ~30-row row groups.
+        pass
+
+    def _write_row_group(self):
+        if not self._n_pending or self._writer is None:
+            return
+        table = pa.Table.from_pydict(self._columns, schema=TURN_SCHEMA)
+        self._writer.write_table(table, row_group_size=self.row_group_size)
+        for values in self._columns.values():
+            values.clear()
+        self._n_pending = 0
+
+    def close(self):
+        if self._writer is None:
+            return
+        self._write_row_group()
+        self._writer.close()
+        self._writer = None
+        atexit.unregister(self.close)
+
+
+def read_turn_columns(path: str, columns: Optional[List[str]] = None) -> pa.Table:
+    dictionary_columns = [name for name in STRING_COLUMNS if columns is None or name in columns]
+    files = session_files(path)
+    if len(files) == 1:
+        return pq.read_table(files[0], columns=columns, read_dictionary=dictionary_columns)
+    return pa.concat_tables([pq.read_table(file, columns=columns, read_dictionary=dictionary_columns) for file in files])
+
+
+def convert_csv_to_parquet(csv_path: str, parquet_path: Optional[str] = None, row_group_size: int = 8192) -> Path:
+    parquet_path = Path(parquet_path) if parquet_path else Path(csv_path).with_suffix('.parquet')
+    logger = ParquetBattleLogger(str(parquet_path), row_group_size=row_group_size, overwrite=True)
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        logger.log_rows(csv.DictReader(f))
+    logger.close()
+    return parquet_path
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 2:
+        print("Usage: python parquet_logger.py <battle_log.csv> [output.parquet]")
+        sys.exit(1)
+
+    output = convert_csv_to_parquet(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None)
+    print(f"Wrote {output}")
@@ -1,9 +1,11 @@
 import asyncio
+from typing import Optional
 from poke_env import ShowdownServerConfiguration, AccountConfiguration
 from poke_env.player import RandomPlayer
+from ladder_telemetry import LadderTelemetry
 
 
-async def run_ladder_bot(username: str, password: str, n_battles: int = 10):
+async def run_ladder_bot(username: str, password: str, n_battles: int = 10, metrics_port: Optional[int] = None):
     bot = RandomPlayer(
         battle_format="gen8randombattle",
         server_configuration=ShowdownServerConfiguration,
@@ -19,9 +21,17 @@ async def run_ladder_bot(username: str, password: str, n_battles: int = 10):
     print(f"Battles to play: {n_battles}")
     print(f"\nStrategy: Random move selection")
     print("="*60)
+    telemetry = LadderTelemetry(f"random_{username}", metrics_port=metrics_port)
+    telemetry.attach(bot)
+    metrics_url = telemetry.start_metrics_server()
+    if metrics_url:
+        print(f"Metrics: {metrics_url}")
     print("\nSearching for ladder opponents...\n")
 
-    await bot.ladder(n_battles)
+    try:
+        await bot.ladder(n_battles)
+    finally:
+        telemetry.stop_metrics_server()
 
     print("\n" + "="*60)
     print("LADDER RESULTS")
@@ -33,6 +43,8 @@ async def run_ladder_bot(username: str, password: str, n_battles: int = 10):
     if bot.n_finished_battles > 0:
         win_rate = (bot.n_won_battles / bot.n_finished_battles) * 100
         print(f"Win rate: {win_rate:.1f}%")
+    print(f"Elo estimate: {telemetry.stats['elo']:.0f}")
+    print(f"Results saved to: {telemetry.results_path}")
 
     print("="*60)
 
@@ -43,6 +55,7 @@ if __name__ == "__main__":
     USERNAME = "Bot_Naila"
     PASSWORD = "Naila"
     N_BATTLES = 10
+    METRICS_PORT = None
 
     if len(sys.argv) > 1:
         USERNAME = sys.argv[1]
@@ -50,15 +63,17 @@ if __name__ == "__main__":
         PASSWORD = sys.argv[2]
     if len(sys.argv) > 3:
         N_BATTLES = int(sys.argv[3])
+    if len(sys.argv) > 4:
+        METRICS_PORT = int(sys.argv[4])
 
     print("\n" + "="*60)
     print("RANDOM BOT - OFFICIAL SHOWDOWN LADDER")
     print("="*60)
     print("\nUsage:")
-    print(f"  python random_ladder.py [username] [password] [n_battles]")
+    print(f"  python random_ladder.py [username] [password] [n_battles] [metrics_port]")
     print(f"\nCurrent settings:")
     print(f"  Username: {USERNAME}")
     print(f"  Battles: {N_BATTLES}")
     print("="*60 + "\n")
 
-    asyncio.run(run_ladder_bot(USERNAME, PASSWORD, N_BATTLES))
+    asyncio.run(run_ladder_bot(USERNAME, PASSWORD, N_BATTLES, METRICS_PORT))
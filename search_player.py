@@ -0,0 +1,296 @@
+import math
+import time
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from poke_env.battle import AbstractBattle, Move, MoveCategory, Pokemon, PokemonType, Status
+
+from battle_stats import boost_multiplier
+from custom_strategy_bot import CustomStrategyPlayer
+from damage_calc import DamageRange, damage_against, field_key, pokemon_stats
+from move_scoring import score_moves
+from set_inference import move_probabilities, species_sets
+
+OPPONENT_MOVES = 4
+FALLBACK_POWER = 80
+SWITCH = -1
+# Leaves are valued in HP material (sum of our HP percent minus theirs, / 100), so one point is a whole KO.
+# Check scores are summed priority-weighted damage percents: median spread between moves ~280, p90 ~1000.
+# At 0.0002 the median spread is worth ~0.06 HP, so checks only break ties between lines the search
+# can't separate. Over 150 gen8 seeds, 0.0002/0.001/0.002/0.005 went 96/75/56/47 wins vs maxdamage
+# and 101/81/62/56 vs custom: letting checks outweigh searched HP swings loses games.
+CHECK_WEIGHT = 0.0002
+
+
+class _SearchTimeout(Exception):
+    pass
+
+
+class _ActiveView:
+
+    def __init__(self, battle: AbstractBattle, active: Pokemon):
+        self._battle = battle
+        self.active_pokemon = active
+
+    def __getattr__(self, name):
+        return getattr(self._battle, name)
+
+
+class _FallbackMove:
+
+    category = defensive_category = MoveCategory.SPECIAL
+    accuracy = 1.0
+    priority = 0
+    expected_hits = 1
+    n_hit = (1, 1)
+    damage = 0
+    use_target_offensive = False
+    entry: Dict[str, str] = {}
+
+    def __init__(self, move_type: PokemonType, base_power: int = FALLBACK_POWER):
+        self.id = f"fallback{move_type.name.lower()}"
+        self.type = move_type
+        self.base_power = base_power
+
+
+@lru_cache(maxsize=4096)
+def _cached_move(move_id: str, gen: int) -> Move:
+    return Move(move_id, gen)
+
+
+def effective_speed(pokemon: Pokemon, stats: Dict[str, float]) -> float:
+    speed = stats['spe'] * boost_multiplier(pokemon.boosts.get('spe', 0))
+    return speed * 0.5 if pokemon.status == Status.PAR else speed
+
+
+def _percent(damage: DamageRange) -> int:
+    return min(100, round(damage.expected_percent))
+
+
+class SearchModel:
+
+    def __init__(self, battle: AbstractBattle, checks, opponent_moves: int = OPPONENT_MOVES, context=None):
+        active = battle.active_pokemon
+        opponent = battle.opponent_active_pokemon
+        self.roster: List[Pokemon] = [active] + list(battle.available_switches)
+        self.hp = tuple(math.ceil(100 * pokemon.current_hp_fraction) for pokemon in self.roster)
+        self.opponent_hp = math.ceil(100 * opponent.current_hp_fraction)
+
+        our_field = field_key(battle, defender_is_opponent=True)
+        their_field = field_key(battle, defender_is_opponent=False)
+        self.opponent_speed = effective_speed(opponent, pokemon_stats(opponent))
+
+        self.moves: List[list] = []
+        self.scores: List[List[float]] = []
+        self.speeds: List[float] = []
+        for index, pokemon in enumerate(self.roster):
+            stats = pokemon_stats(pokemon)
+            boosts = None if index == 0 else {}
+            self.speeds.append(effective_speed(pokemon, stats) if index == 0 else stats['spe'])
+            if index == 0:
+                moves = list(battle.available_moves)
+                scores = score_moves(battle, moves, opponent, checks, context=context) if moves else []
+            else:
+                moves = [move for move in pokemon.moves.values() if move.current_pp > 0]
+                scores = score_moves(_ActiveView(battle, pokemon), moves, opponent, checks) if moves else []
+            damages = damage_against(pokemon, opponent, moves, our_field, boosts)
+            self.moves.append([
+                (_percent(damage), move.accuracy, move.priority) for damage, move in zip(damages, moves)
+            ])
+            self.scores.append(list(scores))
+
+        candidates = self._opponent_candidates(battle, opponent, opponent_moves, their_field)
+        damages = [
+            damage_against(opponent, pokemon, candidates, their_field, defender_boosts=None if index == 0 else {})
+            for index, pokemon in enumerate(self.roster)
+        ]
+        self.opponent_moves = [
+            (tuple(_percent(row[slot]) for row in damages), move.accuracy, move.priority)
+            for slot, move in enumerate(candidates)
+        ]
+
+    def _opponent_candidates(self, battle: AbstractBattle, opponent: Pokemon, limit: int, field: tuple) -> list:
+        revealed = [move for move in opponent.moves.values() if move.base_power and move.category != MoveCategory.STATUS]
+        stab = [_FallbackMove(move_type) for move_type in opponent.types
+                if move_type and move_type not in {move.type for move in revealed}]
+        if len(opponent.moves) >= 4:
+            return revealed or stab
+        if len(revealed) >= limit or species_sets(opponent) is None:
+            return revealed + stab[:max(0, limit - len(revealed))]
+
+        known = {move.id for move in revealed}
+        probabilities = move_probabilities(opponent)
+        target = self.roster[0]
+        pool = [_cached_move(move_id, battle.gen) for move_id, probability in probabilities.items()
+                if move_id not in known and probability < 1]
+        pool = [move for move in pool if move.base_power and move.category != MoveCategory.STATUS]
+        damages = damage_against(opponent, target, pool, field, {}, {})
+        ranked = sorted(zip(damages, pool), key=lambda pair: (round(probabilities[pair[1].id], 3), pair[0].expected_percent),
+                        reverse=True)
+        candidates = revealed + [move for _, move in ranked][:limit - len(revealed)]
+        return candidates or stab
+
+
+class SearchPlayer(CustomStrategyPlayer):
+    def __init__(self, max_depth: int = 3, time_budget: float = 0.2, check_weight: float = CHECK_WEIGHT,
+                 opponent_greed: float = 0.5, opponent_moves: int = OPPONENT_MOVES, **kwargs):
+        super().__init__(**kwargs)
+        self.max_depth = max_depth
+        self.time_budget = time_budget
+        self.check_weight = check_weight
+        self.opponent_greed = opponent_greed
+        self.opponent_moves = opponent_moves
+        self.last_search: Dict[str, float] = {}
+        self._table: Dict[tuple, float] = {}
+        self._deadline = 0.0
+        self._nodes = 0
+        self._hits = 0
+
+    def choose_move(self, battle: AbstractBattle):
+        active = battle.active_pokemon
+        opponent = battle.opponent_active_pokemon
+        if not self.move_checks or not active or not opponent or not (battle.available_moves or battle.available_switches):
+            return super().choose_move(battle)
+
+        start = time.perf_counter()
+        self.turn_context.begin(battle)
+        model = SearchModel(battle, self.move_checks, self.opponent_moves, self.turn_context)
+        if not self._actions(model, 0, model.hp):
+            return super().choose_move(battle)
+        kind, index = self.search(model, start)
+        if kind == SWITCH:
+            order = self.create_order(model.roster[index])
+        else:
+            order = self.create_order(battle.available_moves[index], dynamax=bool(
+                battle.can_dynamax and opponent.current_hp_fraction > 0.6 and active.current_hp_fraction > 0.4))
+        return self._logged_order(battle, order)
+
+    def search(self, model: SearchModel, start: Optional[float] = None) -> Tuple[int, int]:
+        start = time.perf_counter() if start is None else start
+        self._deadline = start + self.time_budget
+        self._table = {}
+        self._nodes = 0
+        self._hits = 0
+        actions = self._actions(model, 0, model.hp)
+        best = max(actions, key=lambda action: self._action_score(model, 0, action))
+        depth = 0
+        for limit in range(1, self.max_depth + 1):
+            try:
+                values = [self._action_value(model, action, 0, model.hp, model.opponent_hp, limit) for action in actions]
+            except _SearchTimeout:
+                break
+            best = actions[max(range(len(actions)), key=values.__getitem__)]
+            depth = limit
+        self.last_search = {
+            'depth': depth,
+            'nodes': self._nodes,
+            'table_hits': self._hits,
+            'elapsed_ms': round((time.perf_counter() - start) * 1000, 3),
+        }
+        return best
+
+    def _actions(self, model: SearchModel, active: int, hp: Tuple[int, ...]) -> List[Tuple[int, int]]:
+        switches = [(SWITCH, index) for index in range(len(model.roster)) if index != active and hp[index] > 0]
+        if hp[active] <= 0:
+            return switches
+        return [(active, move) for move in range(len(model.moves[active]))] + switches
+
+    def _action_score(self, model: SearchModel, active: int, action: Tuple[int, int]) -> float:
+        kind, index = action
+        return 0.0 if kind == SWITCH else self.check_weight * model.scores[active][index]
+
+    def _evaluate(self, hp: Tuple[int, ...], opponent_hp: int) -> float:
+        return (sum(hp) - opponent_hp) / 100
+
+    def _tick(self):
+        self._nodes += 1
+        if not self._nodes & 7 and time.perf_counter() > self._deadline:
+            raise _SearchTimeout()
+
+    def _max_node(self, model: SearchModel, active: int, hp: Tuple[int, ...], opponent_hp: int, depth: int) -> float:
+        if depth <= 0 or opponent_hp <= 0:
+            return self._evaluate(hp, opponent_hp)
+        key = (depth, active, opponent_hp, hp)
+        value = self._table.get(key)
+        if value is not None:
+            self._hits += 1
+            return value
+        self._tick()
+
+        actions = self._actions(model, active, hp)
+        if not actions:
+            value = self._evaluate(hp, opponent_hp)
+        elif hp[active] <= 0:
+            value = max(self._max_node(model, index, hp, opponent_hp, depth) for _, index in actions)
+        else:
+            value = max(self._action_value(model, action, active, hp, opponent_hp, depth) for action in actions)
+        self._table[key] = value
+        return value
+
+    def _action_value(self, model: SearchModel, action: Tuple[int, int], active: int, hp: Tuple[int, ...],
+                      opponent_hp: int, depth: int) -> float:
+        score = self._action_score(model, active, action)
+        kind, index = action
+        if depth == 1:
+            if kind == SWITCH:
+                return score + self._evaluate(hp, opponent_hp)
+            damage, accuracy, _ = model.moves[active][index]
+            hit = self._evaluate(hp, max(0, opponent_hp - damage))
+            return score + accuracy * hit + (1 - accuracy) * self._evaluate(hp, opponent_hp)
+
+        if not model.opponent_moves:
+            return score + self._resolve(model, action, None, active, hp, opponent_hp, depth - 2)
+        values = [self._resolve(model, action, reply, active, hp, opponent_hp, depth - 2) for reply in model.opponent_moves]
+        greed = self.opponent_greed
+        return score + greed * min(values) + (1 - greed) * sum(values) / len(values)
+
+    def _resolve(self, model: SearchModel, action: Tuple[int, int], reply, active: int, hp: Tuple[int, ...],
+                 opponent_hp: int, depth: int) -> float:
+        kind, index = action
+        if kind == SWITCH:
+            active = index
+            ours = None
+        else:
+            ours = model.moves[active][index]
+        if reply is None:
+            theirs = None
+        else:
+            damage, accuracy, priority = reply
+            theirs = (damage[active], accuracy, priority)
+
+        if ours is None or theirs is None:
+            return self._outcomes(model, ours, theirs, True, active, hp, opponent_hp, depth)
+        ours_first = (ours[2], model.speeds[active])
+        theirs_first = (theirs[2], model.opponent_speed)
+        if ours_first != theirs_first:
+            return self._outcomes(model, ours, theirs, ours_first > theirs_first, active, hp, opponent_hp, depth)
+        return 0.5 * (self._outcomes(model, ours, theirs, True, active, hp, opponent_hp, depth)
+                      + self._outcomes(model, ours, theirs, False, active, hp, opponent_hp, depth))
+
+    def _outcomes(self, model: SearchModel, ours, theirs, ours_first: bool, active: int, hp: Tuple[int, ...],
+                  opponent_hp: int, depth: int) -> float:
+        our_hits = ((1.0, False),) if ours is None else self._chances(ours[1])
+        their_hits = ((1.0, False),) if theirs is None else self._chances(theirs[1])
+        value = 0.0
+        for our_probability, our_hit in our_hits:
+            for their_probability, their_hit in their_hits:
+                our_damage = ours[0] if our_hit else 0
+                their_damage = theirs[0] if their_hit else 0
+                new_opponent_hp, new_active_hp = opponent_hp, hp[active]
+                if ours_first:
+                    new_opponent_hp = max(0, opponent_hp - our_damage)
+                    if new_opponent_hp > 0:
+                        new_active_hp = max(0, new_active_hp - their_damage)
+                else:
+                    new_active_hp = max(0, new_active_hp - their_damage)
+                    if new_active_hp > 0:
+                        new_opponent_hp = max(0, opponent_hp - our_damage)
+                new_hp = hp[:active] + (new_active_hp,) + hp[active + 1:]
+                value += our_probability * their_probability * self._max_node(model, active, new_hp, new_opponent_hp, depth)
+        return value
+
+    @staticmethod
+    def _chances(accuracy: float) -> Tuple[Tuple[float, bool], ...]:
+        if accuracy >= 1:
+            return ((1.0, True),)
+        return (accuracy, True), (1 - accuracy, False)
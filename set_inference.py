@@ -0,0 +1,242 @@
+import gzip
+import json
+import sys
+import urllib.request
+from functools import lru_cache
+from math import comb
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from poke_env.battle import Pokemon, PokemonType
+from poke_env.data import GenData, to_id_str
+
+from type_tables import TYPE_INDEX, best_stab_multiplier, pokemon_type_indices, tables_for_gen
+
+DATA_DIR = Path(__file__).with_name('random_set_data')
+SET_SIZE = 4
+LIKELY = 0.5
+RANDBATS_URL = "https://pkmn.github.io/randbats/data/{}.json"
+
+
+class SpeciesSets:
+
+    __slots__ = ('species', 'moves', 'bits', 'roles', '_consistent', '_probabilities', '_likely')
+
+    def __init__(self, species: str, moves: List[str], roles: List[list]):
+        self.species = species
+        self.moves = tuple(moves)
+        self.bits = {move_id: 1 << index for index, move_id in enumerate(self.moves)}
+        self.roles = tuple(
+            (name, mask, weight, mask.bit_count(), tuple(i for i in range(len(self.moves)) if mask >> i & 1))
+            for name, mask, weight in roles
+        )
+        self._consistent: Dict[int, tuple] = {0: self.roles}
+        self._probabilities: Dict[int, Dict[str, float]] = {}
+        self._likely: Dict[Tuple[int, float], Tuple[str, ...]] = {}
+
+    def mask(self, move_ids) -> int:
+        bits = self.bits
+        mask = 0
+        for move_id in move_ids:
+            mask |= bits.get(move_id, 0)
+        return mask
+
+    def consistent_roles(self, revealed: int) -> tuple:
+        roles = self._consistent.get(revealed)
+        if roles is None:
+            parent = revealed & (revealed - 1)
+            bit = revealed ^ parent
+            roles = self._consistent[revealed] = tuple(
+                role for role in self.consistent_roles(parent) if role[1] & bit)
+        return roles
+
+    def move_probabilities(self, revealed: int) -> Dict[str, float]:
+        probabilities = self._probabilities.get(revealed)
+        if probabilities is None:
+            probabilities = self._probabilities[revealed] = self._infer(revealed)
+        return probabilities
+
+    def likely_moves(self, revealed: int, threshold: float = LIKELY) -> Tuple[str, ...]:
+        likely = self._likely.get((revealed, threshold))
+        if likely is None:
+            likely = self._likely[revealed, threshold] = tuple(
+                move_id for move_id, probability in self.move_probabilities(revealed).items() if probability >= threshold)
+        return likely
+
+    def _infer(self, revealed: int) -> Dict[str, float]:
+        roles = self.consistent_roles(revealed)
+        if not roles:
+            overlap = max((revealed & role[1]).bit_count() for role in self.roles)
+            roles = tuple(role for role in self.roles if (revealed & role[1]).bit_count() == overlap)
+
+        posterior = []
+        for _, mask, weight, size, indices in roles:
+            known = (revealed & mask).bit_count()
+            if size > SET_SIZE:
+                likelihood = comb(size - known, SET_SIZE - known) / comb(size, SET_SIZE) if known <= SET_SIZE else 0.0
+            else:
+                likelihood = 1.0
+            posterior.append((weight * likelihood, mask, size, known, indices))
+        total = sum(entry[0] for entry in posterior)
+
+        probabilities = {self.moves[i]: 1.0 for i in range(len(self.moves)) if revealed >> i & 1}
+        if not total:
+            return probabilities
+        for weight, mask, size, known, indices in posterior:
+            unknown = size - known
+            if not weight or not unknown:
+                continue
+            chance = weight / total * max(0, min(SET_SIZE, size) - known) / unknown
+            for i in indices:
+                if not revealed >> i & 1:
+                    move_id = self.moves[i]
+                    probabilities[move_id] = probabilities.get(move_id, 0.0) + chance
+        return dict(sorted(probabilities.items(), key=lambda item: item[1], reverse=True))
+
+
+class RandomSetIndex:
+
+    def __init__(self, battle_format: str, data: dict):
+        self.battle_format = battle_format
+        self.source = data.get('source', '')
+        self._raw: Dict[str, dict] = data['species']
+        self._species: Dict[str, Optional[SpeciesSets]] = {}
+
+    def __contains__(self, species: str) -> bool:
+        return species in self._raw
+
+    def __len__(self) -> int:
+        return len(self._raw)
+
+    def get(self, species: str) -> Optional[SpeciesSets]:
+        sets = self._species.get(species)
+        if sets is None and species not in self._species:
+            entry = self._raw.get(species)
+            sets = self._species[species] = entry and SpeciesSets(species, entry['moves'], entry['roles'])
+        return sets
+
+
+def index_path(battle_format: str) -> Path:
+    return DATA_DIR / f"{battle_format}.json.gz"
+
+
+@lru_cache(maxsize=None)
+def load_index(battle_format: str) -> Optional[RandomSetIndex]:
+    path = index_path(battle_format)
+    if not path.exists():
+        if battle_format.endswith('randombattle'):
+            print(f"Warning: no random-battle set index at {path}, falling back to revealed moves; "
+                  f"run 'python set_inference.py {battle_format}' to build it")
+        return None
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        data = json.load(f)
+    return RandomSetIndex(battle_format, data)
+
+
+def species_sets(pokemon: Pokemon) -> Optional[SpeciesSets]:
+    index = load_index(f"gen{pokemon.gen}randombattle")
+    return index.get(pokemon.species) if index is not None else None
+
+
+def move_probabilities(pokemon: Pokemon) -> Dict[str, float]:
+    sets = species_sets(pokemon)
+    if sets is None:
+        return {move_id: 1.0 for move_id in pokemon.moves}
+    probabilities = sets.move_probabilities(sets.mask(pokemon.moves))
+    unindexed = [move_id for move_id in pokemon.moves if move_id not in sets.bits]
+    return {**dict.fromkeys(unindexed, 1.0), **probabilities} if unindexed else probabilities
+
+
+def likely_moves(pokemon: Pokemon, threshold: float = LIKELY) -> Tuple[str, ...]:
+    sets = species_sets(pokemon)
+    if sets is None:
+        return tuple(pokemon.moves)
+    likely = sets.likely_moves(sets.mask(pokemon.moves), threshold)
+    unindexed = tuple(move_id for move_id in pokemon.moves if move_id not in sets.bits)
+    return unindexed + likely if unindexed else likely
+
+
+@lru_cache(maxsize=1 << 12)
+def _threat(move_ids: Tuple[str, ...], gen: int, defender_types: Tuple[int, int]) -> float:
+    moves = GenData.from_gen(gen).moves
+    lookup = tables_for_gen(gen).pair_lookup
+    type_1, type_2 = defender_types
+    threat = 0.0
+    for move_id in move_ids:
+        entry = moves.get(move_id)
+        if not entry or entry.get('category') == 'Status' or not entry.get('basePower'):
+            continue
+        threat = max(threat, lookup[TYPE_INDEX[PokemonType[entry['type'].upper()]]][type_1][type_2])
+    return threat
+
+
+_THREATS: Dict[tuple, float] = {}
+
+
+def likely_threat(attacker: Pokemon, defender: Pokemon, threshold: float = LIKELY) -> float:
+    key = (attacker.species, attacker.gen, tuple(attacker.moves), attacker.type_1, attacker.type_2,
+           defender.type_1, defender.type_2, threshold)
+    threat = _THREATS.get(key)
+    if threat is None:
+        if len(_THREATS) >= 1 << 16:
+            _THREATS.clear()
+        threat = best_stab_multiplier(attacker, defender)
+        moves = likely_moves(attacker, threshold)
+        if moves:
+            threat = max(threat, _threat(moves, defender.gen, pokemon_type_indices(defender)))
+        _THREATS[key] = threat
+    return threat
+
+
+def compile_randbats(data: dict) -> dict:
+    species = {}
+    for name, entry in data.items():
+        if 'sets' in entry:
+            roles = [(role.get('role', str(i)), [to_id_str(move) for move in role['movepool']], role.get('weight', 1.0))
+                     for i, role in enumerate(entry['sets'])]
+        elif 'roles' in entry:
+            roles = [(name, [to_id_str(move) for move in role.get('moves', [])], role.get('weight', 1.0))
+                     for name, role in entry['roles'].items()]
+        else:
+            roles = [('Random Battle', [to_id_str(move) for move in entry.get('moves', [])], 1.0)]
+        species[to_id_str(name)] = _compile_roles(roles)
+    return species
+
+
+def _compile_roles(roles: List[Tuple[str, List[str], float]]) -> dict:
+    moves = sorted({move_id for _, pool, _ in roles for move_id in pool})
+    bits = {move_id: 1 << index for index, move_id in enumerate(moves)}
+    total = sum(weight for _, pool, weight in roles if pool) or 1.0
+    return {
+        'moves': moves,
+        'roles': [[name, sum(bits[move_id] for move_id in set(pool)), weight / total] for name, pool, weight in roles if pool],
+    }
+
+
+def write_index(battle_format: str, species: dict, source: str) -> Path:
+    DATA_DIR.mkdir(exist_ok=True)
+    path = index_path(battle_format)
+    with gzip.GzipFile(path, 'wb', mtime=0) as f:
+        f.write(json.dumps({'format': battle_format, 'source': source, 'species': species},
+                           sort_keys=True, separators=(',', ':')).encode('utf-8'))
+    load_index.cache_clear()
+    return path
+
+
+if __name__ == "__main__":
+    if len(sys.argv) in (2, 3):
+        battle_format = sys.argv[1]
+        if len(sys.argv) == 3:
+            source = sys.argv[2]
+            with open(source, encoding='utf-8') as f:
+                data = json.load(f)
+        else:
+            source = RANDBATS_URL.format(battle_format)
+            with urllib.request.urlopen(source, timeout=30) as response:
+                data = json.load(response)
+        compiled = compile_randbats(data)
+        path = write_index(battle_format, compiled, source)
+        print(f"Compiled {len(compiled)} species from {source} into {path}")
+    else:
+        print("Usage: python set_inference.py <format> [randbats sets.json]")
+        print(f"  Without a file the sets are downloaded from {RANDBATS_URL.format('<format>')}")
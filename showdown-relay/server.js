@@ -1,87 +1,423 @@
 import express from "express";
 import fetch from "node-fetch";
-import WebSocket from "ws";
+import WebSocket, { WebSocketServer } from "ws";
+import { randomBytes, timingSafeEqual } from "node:crypto";
+import { pathToFileURL } from "node:url";
 
-const app = express();
-app.use(express.json());
+const SHOWDOWN_SERVER = process.env.SHOWDOWN_SERVER || "wss://sim3.psim.us/showdown/websocket";
+const LOGIN_SERVER = process.env.LOGIN_SERVER || "https://play.pokemonshowdown.com/action.php";
+const VERBOSE = Boolean(process.env.RELAY_VERBOSE);
 
-let ws = null;
-let loggedIn = false;
-let usernameCache = "";
-let challstrCache = "";
+const toId = (name) => String(name).toLowerCase().replace(/[^a-z0-9]+/g, "");
 
-// --- CONNECT ENDPOINT ---
-app.post("/connect", async (req, res) => {
-  const { username, password } = req.body;
-  usernameCache = username;
-  loggedIn = false;
+function sameSecret(a, b) {
+  const left = Buffer.from(String(a ?? ""));
+  const right = Buffer.from(String(b ?? ""));
+  return left.length === right.length && timingSafeEqual(left, right);
+}
 
-  const server = "wss://sim3.psim.us/showdown/websocket";
-  ws = new WebSocket(server);
+// --- SESSION ---
+// One authenticated Showdown connection per account. Outgoing messages are queued
+// until the login handshake completes, and dropped connections reconnect with backoff.
+// The token handed out by /connect is required by every other route for this session.
+export class Session {
+  constructor(username, password, options = {}) {
+    this.username = username;
+    this.password = password || "";
+    this.id = toId(username);
+    this.token = randomBytes(24).toString("hex");
+    this.server = options.server || SHOWDOWN_SERVER;
+    this.loginServer = options.loginServer || LOGIN_SERVER;
+    this.maxQueue = options.maxQueue ?? 1000;
+    this.baseDelay = options.baseDelay ?? 500;
+    this.maxDelay = options.maxDelay ?? 30000;
+    this.onMessage = options.onMessage || null;
 
-  ws.on("open", () => {
-    console.log("🌐 Connected to Showdown server...");
-    res.send("Connecting to Showdown...");
-  });
+    this.ws = null;
+    this.state = "idle";
+    this.queue = [];
+    this.attempts = 0;
+    this.reconnects = 0;
+    this.reconnectTimer = null;
+    this.closed = false;
+    this.sent = 0;
+    this.received = 0;
+    this.lastError = null;
+  }
+
+  get ready() {
+    return this.state === "ready";
+  }
 
-  ws.on("message", async (msg) => {
-    const message = msg.toString();
-    console.log("[Showdown]", message);
+  connect() {
+    if (this.closed || (this.ws && this.ws.readyState <= WebSocket.OPEN)) return;
+    this.state = "connecting";
+    const ws = new WebSocket(this.server, { perMessageDeflate: false });
+    this.ws = ws;
 
-    // Login challenge step
-    if (message.startsWith("|challstr|")) {
-      challstrCache = message.split("|")[2] + "|" + message.split("|")[3];
-      console.log("🔑 Got challstr, logging in...");
-
-      const loginRes = await fetch("https://play.pokemonshowdown.com/action.php", {
-        method: "POST",
-        headers: { "Content-Type": "application/x-www-form-urlencoded" },
-        body: new URLSearchParams({
-          act: "login",
-          name: username,
-          pass: password,
-          challstr: challstrCache,
-        }),
+    ws.on("open", () => {
+      this.state = "authenticating";
+      console.log(`🌐 ${this.username}: connected to Showdown server...`);
+    });
+
+    ws.on("message", (msg) => {
+      const message = msg.toString();
+      this.received += 1;
+      if (VERBOSE) console.log(`[Showdown ${this.username}]`, message);
+      this.handleMessage(message).catch((err) => {
+        this.lastError = err.message;
+        console.error(`❌ ${this.username}:`, err);
       });
+      if (this.onMessage) this.onMessage(this, message);
+    });
+
+    ws.on("close", () => {
+      if (this.ws !== ws) return;
+      this.state = this.closed ? "closed" : "reconnecting";
+      console.log(`⚠️ ${this.username}: disconnected from Showdown.`);
+      this.scheduleReconnect();
+    });
 
-      const text = await loginRes.text();
-      const jsonText = text.startsWith("]") ? text.slice(1) : text;
-      const data = JSON.parse(jsonText);
+    ws.on("error", (err) => {
+      this.lastError = err.message;
+      console.error(`❌ ${this.username}: WebSocket error:`, err.message);
+    });
+  }
 
-      if (data.assertion) {
-        ws.send(`|/trn ${username},0,${data.assertion}`);
-        loggedIn = true;
-        console.log(`✅ Logged in as ${username}`);
+  async handleMessage(message) {
+    // Login challenge step
+    if (message.startsWith("|challstr|")) {
+      const challstr = message.split("|").slice(2, 4).join("|");
+      console.log(`🔑 ${this.username}: got challstr, logging in...`);
+      const assertion = await this.getAssertion(challstr);
+      if (assertion) {
+        this.ws.send(`|/trn ${this.username},0,${assertion}`);
       } else {
-        console.error("❌ Login failed:", data);
+        this.lastError = "Login failed";
+        console.error(`❌ ${this.username}: login failed`);
+      }
+    } else if (message.startsWith("|updateuser|")) {
+      const name = message.split("|")[2].trim().replace(/@!$/, "");
+      if (toId(name) === this.id && !this.ready) {
+        this.state = "ready";
+        this.attempts = 0;
+        console.log(`✅ Logged in as ${this.username}`);
+        this.flush();
       }
     }
-  });
+  }
 
-  ws.on("close", () => {
-    loggedIn = false;
-    console.log("⚠️ Disconnected from Showdown.");
-  });
+  async getAssertion(challstr) {
+    const body = this.password
+      ? { act: "login", name: this.username, pass: this.password, challstr }
+      : { act: "getassertion", userid: this.id, challstr };
+    const loginRes = await fetch(this.loginServer, {
+      method: "POST",
+      headers: { "Content-Type": "application/x-www-form-urlencoded" },
+      body: new URLSearchParams(body),
+    });
+    const text = await loginRes.text();
+    if (!this.password) return text.startsWith(";") ? null : text;
+    const data = JSON.parse(text.startsWith("]") ? text.slice(1) : text);
+    return data.assertion || null;
+  }
+
+  send(message) {
+    if (this.closed) return false;
+    if (this.ready && this.queue.length === 0) {
+      this.ws.send(message);
+      this.sent += 1;
+      return true;
+    }
+    if (this.queue.length >= this.maxQueue) return false;
+    this.queue.push(message);
+    return true;
+  }
+
+  flush() {
+    while (this.ready && this.queue.length > 0) {
+      this.ws.send(this.queue.shift());
+      this.sent += 1;
+    }
+  }
+
+  scheduleReconnect() {
+    if (this.closed || this.reconnectTimer) return;
+    const delay = Math.min(this.maxDelay, this.baseDelay * 2 ** this.attempts) * (0.5 + Math.random() / 2);
+    this.attempts += 1;
+    this.reconnects += 1;
+    this.reconnectTimer = setTimeout(() => {
+      this.reconnectTimer = null;
+      this.connect();
+    }, delay);
+  }
+
+  close() {
+    this.closed = true;
+    this.state = "closed";
+    clearTimeout(this.reconnectTimer);
+    this.reconnectTimer = null;
+    if (this.ws) this.ws.close();
+  }
+
+  status() {
+    return {
+      username: this.username,
+      state: this.state,
+      queued: this.queue.length,
+      sent: this.sent,
+      received: this.received,
+      reconnects: this.reconnects,
+      lastError: this.lastError,
+    };
+  }
+}
+
+// --- EVENT SUBSCRIPTIONS ---
+// Incoming frames are pushed to subscribers of the session. Each subscriber
+// may filter by room and has a bounded buffer: while its socket is backed up frames
+// are queued, and past maxBuffer the oldest queued frames are dropped and counted.
+export class Subscriber {
+  constructor(session, rooms, transport, maxBuffer = 1000) {
+    this.session = session;
+    this.rooms = rooms;
+    this.transport = transport;
+    this.maxBuffer = maxBuffer;
+    this.queue = [];
+    this.delivered = 0;
+    this.dropped = 0;
+  }
+
+  wants(room) {
+    if (!this.rooms) return true;
+    return this.rooms.some((pattern) => (pattern.endsWith("*") ? room.startsWith(pattern.slice(0, -1)) : room === pattern));
+  }
+
+  push(event) {
+    if (this.queue.length === 0 && !this.transport.backedUp()) {
+      this.write(event);
+      return;
+    }
+    this.queue.push(event);
+    if (this.queue.length > this.maxBuffer) {
+      this.queue.shift();
+      this.dropped += 1;
+    }
+  }
+
+  drain() {
+    while (this.queue.length > 0 && !this.transport.backedUp()) {
+      this.write(this.queue.shift());
+    }
+  }
+
+  write(event) {
+    this.delivered += 1;
+    this.transport.write(JSON.stringify({ ...event, dropped: this.dropped }));
+  }
+}
 
-  ws.on("error", (err) => console.error("❌ WebSocket error:", err));
-});
+export class EventHub {
+  constructor() {
+    this.subscribers = new Map();
+  }
+
+  subscribe(session, rooms, transport, maxBuffer) {
+    const subscriber = new Subscriber(session, rooms, transport, maxBuffer);
+    if (!this.subscribers.has(session)) this.subscribers.set(session, new Set());
+    this.subscribers.get(session).add(subscriber);
+    return subscriber;
+  }
+
+  unsubscribe(subscriber) {
+    const subscribers = this.subscribers.get(subscriber.session);
+    if (!subscribers) return;
+    subscribers.delete(subscriber);
+    if (subscribers.size === 0) this.subscribers.delete(subscriber.session);
+  }
+
+  // Subscribers end with their session, so they never see frames of a later login
+  closeSession(session) {
+    const subscribers = this.subscribers.get(session);
+    if (!subscribers) return;
+    this.subscribers.delete(session);
+    for (const subscriber of subscribers) subscriber.transport.close();
+  }
+
+  publish(session, message) {
+    const subscribers = this.subscribers.get(session);
+    if (!subscribers) return;
+    const newline = message.indexOf("\n");
+    const room = message.startsWith(">") ? message.slice(1, newline === -1 ? undefined : newline) : "";
+    const event = { username: session.username, room, frame: message };
+    for (const subscriber of subscribers) {
+      if (subscriber.wants(room)) subscriber.push(event);
+    }
+  }
+}
+
+function parseSubscription(query) {
+  const rooms = query.rooms ? String(query.rooms).split(",").map((room) => room.trim()).filter(Boolean) : null;
+  return { username: query.username, token: query.token, rooms, maxBuffer: Number(query.buffer) || 1000 };
+}
+
+function requestToken(req) {
+  const header = req.get("authorization") || "";
+  return header.startsWith("Bearer ") ? header.slice(7) : req.body?.token;
+}
+
+// --- SESSION POOL ---
+export class SessionPool {
+  constructor(options = {}) {
+    this.options = options;
+    this.onClose = options.onClose || null;
+    this.sessions = new Map();
+  }
+
+  // Returns null when a live session for the account was opened with a different password
+  connect(username, password) {
+    const id = toId(username);
+    let session = this.sessions.get(id);
+    if (session && !session.closed && !sameSecret(session.password, password || "")) return null;
+    if (!session || session.closed) {
+      session = new Session(username, password, this.options);
+      this.sessions.set(id, session);
+    }
+    session.connect();
+    return session;
+  }
+
+  get(username) {
+    if (username) return this.sessions.get(toId(username)) || null;
+    // Single-account clients may omit the username
+    return this.sessions.size === 1 ? this.sessions.values().next().value : null;
+  }
+
+  authorize(username, token) {
+    const session = this.get(username);
+    return session && token && sameSecret(session.token, token) ? session : null;
+  }
 
-// --- SEND ENDPOINT ---
-app.post("/send", (req, res) => {
-  if (!ws || ws.readyState !== WebSocket.OPEN) {
-    return res.status(400).send("Not connected to Showdown");
+  disconnect(session) {
+    session.close();
+    if (this.sessions.get(session.id) === session) this.sessions.delete(session.id);
+    if (this.onClose) this.onClose(session);
   }
 
-  if (!loggedIn) {
-    return res.status(400).send("Not logged in yet");
+  closeAll() {
+    for (const session of [...this.sessions.values()]) this.disconnect(session);
   }
+}
+
+export function createRelay(options = {}) {
+  const hub = new EventHub();
+  const pool = new SessionPool({
+    ...options,
+    onMessage: (session, message) => hub.publish(session, message),
+    onClose: (session) => hub.closeSession(session),
+  });
+  const app = express();
+  app.use(express.json());
+
+  // --- CONNECT ENDPOINT ---
+  // Returns the session token; reconnecting with the same password returns the live session's token.
+  app.post("/connect", (req, res) => {
+    const { username, password } = req.body;
+    if (!username) return res.status(400).send("username is required");
+    const session = pool.connect(username, password);
+    if (!session) return res.status(409).send(`${username} is already connected with a different password`);
+    res.json({ token: session.token, ...session.status() });
+  });
+
+  // Every route after /connect needs the token, as "Authorization: Bearer <token>" or a token field
+  const authorized = (req, res) => {
+    const session = pool.authorize(req.body?.username, requestToken(req));
+    if (!session) res.status(401).send("Missing or invalid session token");
+    return session;
+  };
+
+  // --- SEND ENDPOINT ---
+  app.post("/send", (req, res) => {
+    const { message, messages } = req.body;
+    const session = authorized(req, res);
+    if (!session) return;
+
+    const batch = messages || [message];
+    let accepted = 0;
+    for (const item of batch) {
+      if (!session.send(item)) break;
+      accepted += 1;
+    }
+    if (accepted < batch.length) {
+      return res.status(503).json({ accepted, error: "Outgoing queue is full", ...session.status() });
+    }
+    if (VERBOSE) console.log(`➡️ ${session.username}:`, batch);
+    res.json({ accepted, ...session.status() });
+  });
+
+  app.post("/disconnect", (req, res) => {
+    const session = authorized(req, res);
+    if (!session) return;
+    pool.disconnect(session);
+    res.send("Disconnected");
+  });
+
+  app.get("/sessions", (req, res) => {
+    res.json([...pool.sessions.values()].map((session) => session.status()));
+  });
+
+  // --- EVENTS ENDPOINT (server-sent events) ---
+  // Subscribe after /connect with its token; sends made after subscribing are queued until login.
+  app.get("/events", (req, res) => {
+    const { username, token, rooms, maxBuffer } = parseSubscription(req.query);
+    const session = pool.authorize(username, requestToken(req) || token);
+    if (!session) return res.status(401).send("Missing or invalid session token");
+
+    res.writeHead(200, { "Content-Type": "text/event-stream", "Cache-Control": "no-cache", Connection: "keep-alive" });
+    res.flushHeaders();
+    const subscriber = hub.subscribe(session, rooms, {
+      backedUp: () => res.writableNeedDrain,
+      write: (data) => res.write(`data: ${data}\n\n`),
+      close: () => res.end(),
+    }, maxBuffer);
+    res.on("drain", () => subscriber.drain());
+    req.on("close", () => hub.unsubscribe(subscriber));
+  });
+
+  // --- EVENTS ENDPOINT (websocket) ---
+  const eventSockets = new WebSocketServer({ noServer: true, perMessageDeflate: false });
+  const attach = (server) => {
+    server.on("upgrade", (req, socket, head) => {
+      const url = new URL(req.url, "http://relay");
+      if (url.pathname !== "/events") return socket.destroy();
+      const { username, token, rooms, maxBuffer } = parseSubscription(Object.fromEntries(url.searchParams));
+      const header = req.headers.authorization || "";
+      const session = pool.authorize(username, header.startsWith("Bearer ") ? header.slice(7) : token);
+      if (!session) {
+        socket.end("HTTP/1.1 401 Unauthorized\r\nConnection: close\r\nContent-Length: 0\r\n\r\n");
+        return;
+      }
+      eventSockets.handleUpgrade(req, socket, head, (client) => {
+        const highWaterMark = 1 << 20;
+        const subscriber = hub.subscribe(session, rooms, {
+          backedUp: () => client.bufferedAmount > highWaterMark,
+          write: (data) => client.send(data, () => subscriber.drain()),
+          close: () => client.close(1000, "session closed"),
+        }, maxBuffer);
+        client.on("close", () => hub.unsubscribe(subscriber));
+      });
+    });
+    return server;
+  };
 
-  const { message } = req.body;
-  ws.send(message);
-  console.log("➡️ Sent:", message);
-  res.send("Message sent to Showdown");
-});
+  return { app, pool, hub, attach };
+}
 
 // --- START SERVER ---
-const PORT = 3000;
-app.listen(PORT, () => console.log(`Relay running on http://localhost:${PORT}`));
+if (import.meta.url === pathToFileURL(process.argv[1]).href) {
+  const PORT = Number(process.env.PORT) || 3000;
+  // Loopback only by default; set HOST to expose the relay on other interfaces
+  const HOST = process.env.HOST || "127.0.0.1";
+  const { app, attach } = createRelay();
+  attach(app.listen(PORT, HOST, () => console.log(`Relay running on http://${HOST}:${PORT}`)));
+}
@@ -0,0 +1,139 @@
+// Fake-upstream throughput check: runs the relay against a local stand-in for the
+// Showdown websocket and login server, then measures messages relayed per second.
+// The fake upstream echoes every message back as a battle-room frame, which is
+// pushed to one /events subscriber per session (alternating websocket and SSE).
+//
+//   npm run throughput -- [sessions] [messages per session] [batch size]
+import http from "node:http";
+import WebSocket, { WebSocketServer } from "ws";
+import { createRelay } from "./server.js";
+
+const SESSIONS = Number(process.argv[2]) || 20;
+const MESSAGES = Number(process.argv[3]) || 2000;
+const BATCH = Number(process.argv[4]) || 50;
+
+function listen(server) {
+  return new Promise((resolve) => server.listen(0, "127.0.0.1", () => resolve(server.address().port)));
+}
+
+async function startFakeUpstream() {
+  const counts = new Map();
+  const loginServer = http.createServer((req, res) => {
+    req.resume();
+    req.on("end", () => res.end(']{"assertion":"fake-assertion"}'));
+  });
+  const wss = new WebSocketServer({ port: 0, host: "127.0.0.1", perMessageDeflate: false });
+  await new Promise((resolve) => wss.on("listening", resolve));
+
+  wss.on("connection", (socket) => {
+    let user = null;
+    socket.send("|challstr|4|fakechallstr");
+    socket.on("message", (data) => {
+      const message = data.toString();
+      if (message.startsWith("|/trn ")) {
+        user = message.slice(6).split(",")[0];
+        socket.send(`|updateuser| ${user}|1|1|{}`);
+      } else if (user) {
+        counts.set(user, (counts.get(user) || 0) + 1);
+        socket.send(`>battle-fake-${user}\n|c|~|${message}`);
+        socket.send(`>lobby\n|c|~|${message}`);
+      }
+    });
+  });
+
+  return {
+    counts,
+    wsUrl: `ws://127.0.0.1:${wss.address().port}/showdown/websocket`,
+    loginUrl: `http://127.0.0.1:${await listen(loginServer)}/action.php`,
+    close: () => {
+      for (const client of wss.clients) client.terminate();
+      wss.close();
+      loginServer.close();
+    },
+  };
+}
+
+async function subscribeSse(base, username, token, onEvent) {
+  const res = await fetch(`${base}/events?username=${username}&rooms=battle-*`, { headers: { Authorization: `Bearer ${token}` } });
+  const decoder = new TextDecoder();
+  (async () => {
+    let buffer = "";
+    for await (const chunk of res.body) {
+      buffer += decoder.decode(chunk, { stream: true });
+      let end;
+      while ((end = buffer.indexOf("\n\n")) !== -1) {
+        onEvent(JSON.parse(buffer.slice(6, end)));
+        buffer = buffer.slice(end + 2);
+      }
+    }
+  })().catch(() => {});
+  return () => res.body.cancel().catch(() => {});
+}
+
+async function subscribeWebSocket(base, username, token, onEvent) {
+  const client = new WebSocket(`${base.replace("http", "ws")}/events?username=${username}&rooms=battle-*`, {
+    headers: { Authorization: `Bearer ${token}` },
+  });
+  client.on("message", (data) => onEvent(JSON.parse(data.toString())));
+  await new Promise((resolve) => client.on("open", resolve));
+  return () => client.terminate();
+}
+
+async function post(base, path, body, token) {
+  const res = await fetch(base + path, {
+    method: "POST",
+    headers: { "Content-Type": "application/json", ...(token && { Authorization: `Bearer ${token}` }) },
+    body: JSON.stringify(body),
+  });
+  if (!res.ok) throw new Error(`${path} failed with ${res.status}: ${await res.text()}`);
+  return res.json();
+}
+
+async function main() {
+  const upstream = await startFakeUpstream();
+  const { app, pool, attach } = createRelay({ server: upstream.wsUrl, loginServer: upstream.loginUrl, maxQueue: MESSAGES });
+  const relay = attach(http.createServer(app));
+  const base = `http://127.0.0.1:${await listen(relay)}`;
+  const usernames = Array.from({ length: SESSIONS }, (_, i) => `relaybot${i}`);
+
+  let pushed = 0;
+  let misrouted = 0;
+  const unsubscribe = [];
+
+  // Messages sent straight after /connect are queued until the login completes
+  const start = performance.now();
+  await Promise.all(usernames.map(async (username, i) => {
+    const { token } = await post(base, "/connect", { username, password: "fake" });
+    const onEvent = (event) => {
+      pushed += 1;
+      if (event.username !== username || !event.room.startsWith("battle-")) misrouted += 1;
+    };
+    unsubscribe.push(await (i % 2 ? subscribeSse : subscribeWebSocket)(base, username, token, onEvent));
+    for (let sent = 0; sent < MESSAGES; sent += BATCH) {
+      const messages = Array.from({ length: Math.min(BATCH, MESSAGES - sent) }, (_, i) => `|/cmd userdetails ${username} ${sent + i}`);
+      await post(base, "/send", { username, messages }, token);
+    }
+  }));
+
+  const expected = SESSIONS * MESSAGES;
+  const delivered = () => [...upstream.counts.values()].reduce((a, b) => a + b, 0);
+  while ((delivered() < expected || pushed < expected) && performance.now() - start < 30000) {
+    await new Promise((resolve) => setTimeout(resolve, 5));
+  }
+  const seconds = (performance.now() - start) / 1000;
+
+  const perSession = usernames.map((username) => upstream.counts.get(username) || 0);
+  console.log(`${SESSIONS} sessions x ${MESSAGES} messages (batches of ${BATCH})`);
+  console.log(`Delivered ${delivered()}/${expected} in ${seconds.toFixed(2)}s: ${Math.round(delivered() / seconds)} messages/s`);
+  console.log(`Per-session delivery: min ${Math.min(...perSession)}, max ${Math.max(...perSession)}`);
+  console.log(`Pushed ${pushed}/${expected} filtered frames to subscribers (${misrouted} misrouted)`);
+
+  unsubscribe.forEach((close) => close());
+  pool.closeAll();
+  relay.closeAllConnections();
+  relay.close();
+  upstream.close();
+  process.exitCode = delivered() === expected && pushed === expected && misrouted === 0 ? 0 : 1;
+}
+
+main();
@@ -0,0 +1,174 @@
+import asyncio
+import math
+import random
+import time
+from concurrent.futures import Executor
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from poke_env.battle import AbstractBattle, Pokemon
+
+from search_player import SearchModel
+
+CRIT_CHANCE = 1 / 24
+CRIT_MULTIPLIER = 1.5
+MIN_ROLL, MAX_ROLL = 0.85, 1.0
+Z_95 = 1.96
+
+
+class RolloutSpec(NamedTuple):
+    hp: Tuple[int, ...]
+    opponent_hp: int
+    moves: Tuple[Tuple[Tuple[int, float, int], ...], ...]
+    speeds: Tuple[float, ...]
+    opponent_moves: Tuple[Tuple[Tuple[int, ...], float, int], ...]
+    opponent_speed: float
+
+    @classmethod
+    def from_model(cls, model: SearchModel) -> 'RolloutSpec':
+        return cls(
+            hp=model.hp,
+            opponent_hp=model.opponent_hp,
+            moves=tuple(tuple(moves) for moves in model.moves),
+            speeds=tuple(model.speeds),
+            opponent_moves=tuple(model.opponent_moves),
+            opponent_speed=model.opponent_speed,
+        )
+
+
+def _strike(rng: random.Random, damage: int, accuracy: float) -> int:
+    if not damage or rng.random() >= accuracy:
+        return 0
+    roll = rng.uniform(MIN_ROLL, MAX_ROLL) / ((MIN_ROLL + MAX_ROLL) / 2)
+    if rng.random() < CRIT_CHANCE:
+        roll *= CRIT_MULTIPLIER
+    return round(damage * roll)
+
+
+def run_rollouts(spec: RolloutSpec, candidate: int, n: int, seed: int, horizon: int = 3, free_switch: bool = False,
+                 greedy: float = 0.8) -> List[float]:
+    rng = random.Random(seed)
+    moves = spec.moves[candidate]
+    best = max(moves, key=lambda move: move[0] * move[1]) if moves else None
+    others = sum(spec.hp) - spec.hp[candidate]
+    switching = candidate != 0 and not free_switch
+    results = []
+    for _ in range(n):
+        hp = spec.hp[candidate]
+        opponent_hp = spec.opponent_hp
+        for turn in range(horizon):
+            if hp <= 0 or opponent_hp <= 0:
+                break
+            reply = rng.choice(spec.opponent_moves) if spec.opponent_moves else None
+            ours = None if switching and turn == 0 or not moves else best if rng.random() < greedy else rng.choice(moves)
+            if ours is None:
+                ours_first = False
+            elif reply is None:
+                ours_first = True
+            else:
+                ours_key, theirs_key = (ours[2], spec.speeds[candidate]), (reply[2], spec.opponent_speed)
+                ours_first = ours_key > theirs_key or ours_key == theirs_key and rng.random() < 0.5
+            for attacker in ((0, 1) if ours_first else (1, 0)):
+                if hp <= 0 or opponent_hp <= 0:
+                    break
+                if attacker == 0 and ours is not None:
+                    opponent_hp -= _strike(rng, ours[0], ours[1])
+                elif attacker == 1 and reply is not None:
+                    hp -= _strike(rng, reply[0][candidate], reply[1])
+        results.append((others + max(hp, 0) - max(opponent_hp, 0)) / 100)
+    return results
+
+
+class _Estimate:
+
+    __slots__ = ('n', 'total', 'squares')
+
+    def __init__(self):
+        self.n = 0
+        self.total = 0.0
+        self.squares = 0.0
+
+    def add(self, values: List[float]):
+        self.n += len(values)
+        self.total += sum(values)
+        self.squares += sum(value * value for value in values)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.n if self.n else 0.0
+
+    @property
+    def half_width(self) -> float:
+        if self.n < 2:
+            return math.inf
+        variance = max(0.0, (self.squares - self.n * self.mean ** 2) / (self.n - 1))
+        return Z_95 * math.sqrt(variance / self.n)
+
+
+class RolloutSwitchEvaluator:
+
+    def __init__(self, rollout_budget: int = 2048, batch_size: int = 32, min_rollouts: int = 64, horizon: int = 3,
+                 time_budget: float = 0.1, switch_margin: float = 0.1, executor: Optional[Executor] = None,
+                 seed: Optional[int] = None):
+        self.rollout_budget = rollout_budget
+        self.batch_size = batch_size
+        self.min_rollouts = min_rollouts
+        self.horizon = horizon
+        self.time_budget = time_budget
+        self.switch_margin = switch_margin
+        self.executor = executor
+        self.last_evaluation: Dict[str, Any] = {}
+        self._rng = random.Random(seed)
+        self._in_flight = 0
+
+    def decision_budget(self) -> int:
+        return max(self.min_rollouts, self.rollout_budget // max(1, self._in_flight))
+
+    async def choose_switch(self, battle: AbstractBattle) -> Optional[Pokemon]:
+        if not battle.active_pokemon or not battle.opponent_active_pokemon or not battle.available_switches:
+            return None
+        start = time.perf_counter()
+        model = SearchModel(battle, ())
+        spec = RolloutSpec.from_model(model)
+        free_switch = model.hp[0] <= 0 or not battle.available_moves
+        candidates = list(range(1 if free_switch else 0, len(model.roster)))
+        estimates = {candidate: _Estimate() for candidate in candidates}
+
+        self._in_flight += 1
+        try:
+            budget = self.decision_budget()
+            deadline = start + self.time_budget
+            alive = list(candidates)
+            used = 0
+            while len(alive) > 1 and used < budget and time.perf_counter() < deadline:
+                batches = await self._run_batches(spec, alive, free_switch)
+                for candidate, values in zip(alive, batches):
+                    estimates[candidate].add(values)
+                used += self.batch_size * len(alive)
+                alive = self._separate(estimates, alive)
+        finally:
+            self._in_flight -= 1
+
+        best = max(alive, key=lambda candidate: estimates[candidate].mean)
+        switch = free_switch or best != 0 and (
+            0 not in alive or estimates[best].mean - estimates[0].mean > self.switch_margin)
+        self.last_evaluation = {
+            'rollouts': sum(estimate.n for estimate in estimates.values()),
+            'budget': budget,
+            'elapsed_ms': round((time.perf_counter() - start) * 1000, 3),
+            'estimates': {model.roster[candidate].species: round(estimates[candidate].mean, 3) for candidate in candidates},
+            'switch': model.roster[best].species if switch else None,
+        }
+        return model.roster[best] if switch else None
+
+    async def _run_batches(self, spec: RolloutSpec, candidates: List[int], free_switch: bool) -> List[List[float]]:
+        jobs = [(spec, candidate, self.batch_size, self._rng.getrandbits(32), self.horizon, free_switch)
+                for candidate in candidates]
+        if self.executor is None:
+            await asyncio.sleep(0)
+            return [run_rollouts(*job) for job in jobs]
+        return await asyncio.gather(*(asyncio.wrap_future(self.executor.submit(run_rollouts, *job)) for job in jobs))
+
+    def _separate(self, estimates: Dict[int, _Estimate], alive: List[int]) -> List[int]:
+        best_lower = max(estimates[candidate].mean - estimates[candidate].half_width for candidate in alive)
+        return [candidate for candidate in alive
+                if estimates[candidate].mean + estimates[candidate].half_width >= best_lower]
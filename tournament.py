@@ -0,0 +1,141 @@
+import asyncio
+import json
+import os
+import time
+from itertools import combinations
+from pathlib import Path
+from typing import Callable, Dict, List, Any
+
+from poke_env import ServerConfiguration
+from poke_env.player import Player
+
+LOCAL_SERVER = ServerConfiguration(
+    "ws://localhost:8000/showdown/websocket",
+    "http://localhost:8000/action.php?"
+)
+
+
+class BotConfig:
+    def __init__(self, name: str, factory: Callable[..., Player]):
+        self.name = name
+        self.factory = factory
+
+    def create(self, **kwargs) -> Player:
+        return self.factory(**kwargs)
+
+
+def write_json_atomic(path: Path, data: Dict[str, Any]):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+async def close_player(player: Player):
+    close = getattr(player, 'close', None)
+    if close is not None:
+        await close()
+    else:
+        await player.ps_client.stop_listening()
+
+
+class Tournament:
+    def __init__(
+        self,
+        bots: List[BotConfig],
+        n_battles: int = 50,
+        battle_format: str = "gen9randombattle",
+        server_configuration: ServerConfiguration = LOCAL_SERVER,
+        battle_budget: int = 30,
+        results_path: str = "project_site/battle_results.json",
+        resume: bool = False,
+    ):
+        self.bots = bots
+        self.n_battles = n_battles
+        self.battle_format = battle_format
+        self.server_configuration = server_configuration
+        self.battle_budget = battle_budget
+        self.results_path = Path(results_path)
+        self.resume = resume
+        self.results: Dict[str, Dict[str, Any]] = {}
+        self._write_lock = asyncio.Lock()
+
+    @property
+    def matchups(self):
+        return list(combinations(self.bots, 2))
+
+    @staticmethod
+    def matchup_key(p1: BotConfig, p2: BotConfig) -> str:
+        return f"{p1.name}_vs_{p2.name}"
+
+    async def run(self) -> Dict[str, Dict[str, Any]]:
+        if self.resume and self.results_path.exists():
+            with open(self.results_path) as f:
+                self.results = json.load(f)
+
+        pending = [(p1, p2) for p1, p2 in self.matchups if self.matchup_key(p1, p2) not in self.results]
+        if not pending:
+            print("All matchups already have results")
+            return self.results
+
+        per_matchup = max(1, self.battle_budget // len(pending))
+        print(f"Running {len(pending)} matchups x {self.n_battles} battles concurrently "
+              f"({per_matchup} concurrent battles each, budget {self.battle_budget})\n")
+
+        start = time.perf_counter()
+        outcomes = await asyncio.gather(
+            *(self._run_matchup(p1, p2, per_matchup) for p1, p2 in pending),
+            return_exceptions=True,
+        )
+        wall_clock = time.perf_counter() - start
+
+        for (p1, p2), outcome in zip(pending, outcomes):
+            if isinstance(outcome, BaseException):
+                print(f"Matchup {self.matchup_key(p1, p2)} failed: {outcome}")
+
+        battles = sum(outcome for outcome in outcomes if isinstance(outcome, int))
+        self.results["summary"] = {
+            "wall_clock_seconds": round(wall_clock, 2),
+            "battles": battles,
+            "battles_per_second": round(battles / wall_clock, 3) if wall_clock > 0 else 0.0,
+        }
+        async with self._write_lock:
+            write_json_atomic(self.results_path, self.results)
+
+        print(f"\n{battles} battles in {wall_clock:.1f}s ({self.results['summary']['battles_per_second']:.2f} battles/s)")
+        print(f"Results saved to {self.results_path}")
+        return self.results
+
+    async def _run_matchup(self, p1_config: BotConfig, p2_config: BotConfig, max_concurrent_battles: int) -> int:
+        key = self.matchup_key(p1_config, p2_config)
+        player_kwargs = dict(
+            battle_format=self.battle_format,
+            server_configuration=self.server_configuration,
+            max_concurrent_battles=max_concurrent_battles,
+        )
+        p1 = p1_config.create(**player_kwargs)
+        p2 = p2_config.create(**player_kwargs)
+
+        start = time.perf_counter()
+        try:
+            await p1.battle_against(p2, n_battles=self.n_battles)
+        finally:
+            await close_player(p1)
+            await close_player(p2)
+        elapsed = time.perf_counter() - start
+
+        finished = p1.n_finished_battles
+        async with self._write_lock:
+            self.results[key] = {
+                "p1_wins": p1.n_won_battles,
+                "p2_wins": p2.n_won_battles,
+                "battles": finished,
+                "elapsed_seconds": round(elapsed, 2),
+                "battles_per_second": round(finished / elapsed, 3) if elapsed > 0 else 0.0,
+            }
+            write_json_atomic(self.results_path, self.results)
+
+        print(f"{p1_config.name}: {p1.n_won_battles} wins / {p2_config.name}: {p2.n_won_battles} wins "
+              f"({finished} battles in {elapsed:.1f}s)")
+        return finished
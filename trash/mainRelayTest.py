@@ -1,25 +1,48 @@
+import json
 import requests
-import time
+
+RELAY = "http://localhost:3000"
+USERNAME = "peeepoo_man"
+
+def send(token, message):
+    resp = requests.post(f"{RELAY}/send", json={
+        "username": USERNAME,
+        "message": message
+    }, headers={"Authorization": f"Bearer {token}"})
+    print("Send response:", resp.text)
 
 def main():
-    # Step 1: connect to relay
-    resp = requests.post("http://localhost:3000/connect", json={
-        "username": "peeepoo_man",
+    # Step 1: connect to relay (reuses the session if this account is already connected with the same password)
+    resp = requests.post(f"{RELAY}/connect", json={
+        "username": USERNAME,
         "password": "Raeh147611"
     })
     print("Connect response:", resp.text)
+    resp.raise_for_status()
+    token = resp.json()["token"]
 
-    # Step 2: wait for login (Showdown handshake)
-    print("Waiting for login to complete...")
-    time.sleep(5)  # Wait 5 seconds
+    # Step 2: subscribe to the relay's event stream with the session token
+    events = requests.get(f"{RELAY}/events", params={"username": USERNAME},
+                          headers={"Authorization": f"Bearer {token}"}, stream=True)
 
-    # Step 3: send the challenge
-    resp = requests.post("http://localhost:3000/send", json={
-        #"message": "/pm OOmeNN hi from peeepoo_man!"
-        #"message": "/challenge OOmeNN, gen9vgc2025regj"
-        "message": "/cmd userdetails peeepoo_man"
-    })
-    print("Challenge response:", resp.text)
+    #command = "/pm OOmeNN hi from peeepoo_man!"
+    #command = "/challenge OOmeNN, gen9vgc2025regj"
+    command = f"/cmd userdetails {USERNAME}"
+
+    # Step 3: send the command (the relay queues it until the login completes), then wait for its answer
+    send(token, command)
+
+    for line in events.iter_lines(decode_unicode=True):
+        if not line.startswith("data: "):
+            continue
+        frame = json.loads(line[6:])["frame"]
+        if frame.startswith("|queryresponse|userdetails|"):
+            print("User details:", frame.split("|", 3)[3])
+            break
+        elif frame.startswith("|popup|"):
+            print("Popup:", frame)
+
+    events.close()
 
 if __name__ == "__main__":
     main()
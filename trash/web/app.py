@@ -1,6 +1,7 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify
 from flask_cors import CORS
-import asyncio
+import json
+from collections import deque
 from poke_env.player import RandomPlayer, MaxBasePowerPlayer
 from poke_env import ServerConfiguration
 import sys
@@ -9,6 +10,7 @@ import os
 # Add parent directory to path to import custom bots
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from battle_service import BattleService
 from custom_strategy_bot import (
     CustomStrategyPlayer,
     check_super_effective,
@@ -28,93 +30,98 @@ LOCAL_SERVER = ServerConfiguration(
 )
 
 class BattleTracker:
-    """Tracks all moves and events during a battle"""
-    def __init__(self):
-        self.turns = []
-        self.current_turn = {"turn_number": 0, "events": []}
-
-    def start_turn(self, turn_number):
-        """Start tracking a new turn"""
-        if self.current_turn["events"]:
-            self.turns.append(self.current_turn)
-        self.current_turn = {"turn_number": turn_number, "events": []}
-
-    def add_event(self, event_text):
-        """Add an event to the current turn"""
-        self.current_turn["events"].append(event_text)
-
-    def finalize(self):
-        """Finalize the last turn"""
-        if self.current_turn["events"]:
-            self.turns.append(self.current_turn)
-
-    def get_battle_log(self):
+    """Tracks moves and events per battle, keeping only the last max_turns turns of each"""
+    def __init__(self, listener=None, max_turns=100):
+        self.listener = listener
+        self.max_turns = max_turns
+        self.battles = {}
+
+    def _battle(self, battle_tag):
+        battle = self.battles.get(battle_tag)
+        if battle is None:
+            battle = self.battles[battle_tag] = {
+                "turns": deque(maxlen=self.max_turns),
+                "current_turn": {"turn_number": 0, "events": []},
+                "dropped_turns": 0,
+                "finished": False,
+                "winner": None,
+            }
+        return battle
+
+    def _close_turn(self, battle):
+        if battle["current_turn"]["events"]:
+            if len(battle["turns"]) == self.max_turns:
+                battle["dropped_turns"] += 1
+            battle["turns"].append(battle["current_turn"])
+
+    def _notify(self, battle_tag, event):
+        if self.listener:
+            event["battle_tag"] = battle_tag
+            self.listener(event)
+
+    def start_turn(self, battle_tag, turn_number):
+        """Start tracking a new turn, ignoring repeated calls for the current one"""
+        battle = self._battle(battle_tag)
+        if turn_number <= battle["current_turn"]["turn_number"]:
+            return
+        self._close_turn(battle)
+        battle["current_turn"] = {"turn_number": turn_number, "events": []}
+        self._notify(battle_tag, {"type": "turn", "turn_number": turn_number})
+
+    def add_event(self, battle_tag, event_text):
+        """Add an event to the current turn of a battle"""
+        battle = self._battle(battle_tag)
+        battle["current_turn"]["events"].append(event_text)
+        self._notify(battle_tag, {"type": "event", "turn_number": battle["current_turn"]["turn_number"], "text": event_text})
+
+    def finish(self, battle_tag, winner=None):
+        """Finalize the last turn; each player reports once, the winner names itself"""
+        battle = self._battle(battle_tag)
+        if not battle["finished"]:
+            self._close_turn(battle)
+            battle["finished"] = True
+        if winner:
+            battle["winner"] = winner
+
+    def finished_battles(self):
+        return [battle_tag for battle_tag, battle in self.battles.items() if battle["finished"]]
+
+    def get_battle_log(self, battle_tag):
         """Get formatted battle log"""
-        return self.turns
+        battle = self.battles.get(battle_tag)
+        return list(battle["turns"]) if battle else []
 
-class TrackedRandomPlayer(RandomPlayer):
-    def __init__(self, battle_tracker, bot_name, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.battle_tracker = battle_tracker
-        self.bot_name = bot_name
-        self._battles = {}
-
-    def choose_move(self, battle):
-        # Track battle instance
-        if battle.battle_tag not in self._battles:
-            self._battles[battle.battle_tag] = battle
-
-        # Update turn if needed
-        if battle.turn > self.battle_tracker.current_turn["turn_number"]:
-            self.battle_tracker.start_turn(battle.turn)
-
-        # Get move
-        move = super().choose_move(battle)
-
-        # Log the move
-        move_name = self._extract_move_name(move, battle)
-        active_pokemon = battle.active_pokemon
-        pokemon_name = active_pokemon.species if active_pokemon else "Unknown"
-
-        self.battle_tracker.add_event(f"{self.bot_name}'s {pokemon_name} used {move_name}")
-
-        return move
-
-    def _extract_move_name(self, order, battle):
-        """Extract readable move name from order"""
-        if hasattr(order, 'order') and order.order:
-            move = order.order
-            if hasattr(move, 'id'):
-                return move.id.replace('-', ' ').title()
-            elif hasattr(move, 'species'):
-                return f"Switch to {move.species}"
-        return "Unknown Move"
+    def export(self, battle_tag):
+        """Return a battle's log and stop tracking it"""
+        battle = self.battles.pop(battle_tag)
+        return {
+            "battle_tag": battle_tag,
+            "winner": battle["winner"],
+            "battle_log": list(battle["turns"]),
+            "dropped_turns": battle["dropped_turns"],
+        }
 
-class TrackedMaxDamagePlayer(MaxBasePowerPlayer):
+class TrackedPlayerMixin:
+    """Reports every decision to a battle-keyed BattleTracker and forgets battles once they close"""
     def __init__(self, battle_tracker, bot_name, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.battle_tracker = battle_tracker
         self.bot_name = bot_name
-        self._battles = {}
 
     def choose_move(self, battle):
-        if battle.battle_tag not in self._battles:
-            self._battles[battle.battle_tag] = battle
-
-        if battle.turn > self.battle_tracker.current_turn["turn_number"]:
-            self.battle_tracker.start_turn(battle.turn)
-
         move = super().choose_move(battle)
 
-        move_name = self._extract_move_name(move, battle)
-        active_pokemon = battle.active_pokemon
-        pokemon_name = active_pokemon.species if active_pokemon else "Unknown"
-
-        self.battle_tracker.add_event(f"{self.bot_name}'s {pokemon_name} used {move_name}")
+        if self.battle_tracker:
+            self.battle_tracker.start_turn(battle.battle_tag, battle.turn)
+            move_name = self._extract_move_name(move, battle)
+            active_pokemon = battle.active_pokemon
+            pokemon_name = active_pokemon.species if active_pokemon else "Unknown"
+            self.battle_tracker.add_event(battle.battle_tag, f"{self.bot_name}'s {pokemon_name} used {move_name}")
 
         return move
 
     def _extract_move_name(self, order, battle):
+        """Extract readable move name from order"""
         if hasattr(order, 'order') and order.order:
             move = order.order
             if hasattr(move, 'id'):
@@ -123,38 +130,30 @@ class TrackedMaxDamagePlayer(MaxBasePowerPlayer):
                 return f"Switch to {move.species}"
         return "Unknown Move"
 
-class TrackedCustomStrategyPlayer(CustomStrategyPlayer):
-    def __init__(self, battle_tracker, bot_name, *args, **kwargs):
-        super().__init__(battle_logger=None, *args, **kwargs)
-        self.battle_tracker = battle_tracker
-        self.bot_name = bot_name
-        self._battles = {}
-
-    def choose_move(self, battle):
-        if battle.battle_tag not in self._battles:
-            self._battles[battle.battle_tag] = battle
+    def _battle_finished_callback(self, battle):
+        super()._battle_finished_callback(battle)
+        if self.battle_tracker:
+            self.battle_tracker.finish(battle.battle_tag, self.bot_name if battle.won else None)
 
-        if battle.turn > self.battle_tracker.current_turn["turn_number"]:
-            self.battle_tracker.start_turn(battle.turn)
+    async def _handle_battle_message(self, split_messages):
+        # deinit is the last message of a room we left, so the battle can be dropped safely
+        battle_tag = split_messages[0][0][1:]
+        battle = self._battles.get(battle_tag)
+        if battle is not None and battle.finished and any(message[1:2] == ["deinit"] for message in split_messages[1:]):
+            del self._battles[battle_tag]
+            return
+        await super()._handle_battle_message(split_messages)
 
-        move = super().choose_move(battle)
+class TrackedRandomPlayer(TrackedPlayerMixin, RandomPlayer):
+    pass
 
-        move_name = self._extract_move_name(move, battle)
-        active_pokemon = battle.active_pokemon
-        pokemon_name = active_pokemon.species if active_pokemon else "Unknown"
+class TrackedMaxDamagePlayer(TrackedPlayerMixin, MaxBasePowerPlayer):
+    pass
 
-        self.battle_tracker.add_event(f"{self.bot_name}'s {pokemon_name} used {move_name}")
+class TrackedCustomStrategyPlayer(TrackedPlayerMixin, CustomStrategyPlayer):
+    pass
 
-        return move
-
-    def _extract_move_name(self, order, battle):
-        if hasattr(order, 'order') and order.order:
-            move = order.order
-            if hasattr(move, 'id'):
-                return move.id.replace('-', ' ').title()
-            elif hasattr(move, 'species'):
-                return f"Switch to {move.species}"
-        return "Unknown Move"
+BOT_TYPES = ("random", "maxdamage", "custom")
 
 def create_player(bot_type, bot_name, battle_tracker):
     """Create a player instance based on bot type"""
@@ -192,39 +191,7 @@ def create_player(bot_type, bot_name, battle_tracker):
     else:
         raise ValueError(f"Unknown bot type: {bot_type}")
 
-async def run_battle(bot1_type, bot2_type):
-    """Run a local battle between two bots and return results"""
-    battle_tracker = BattleTracker()
-
-    player1 = create_player(bot1_type, "Bot 1", battle_tracker)
-    player2 = create_player(bot2_type, "Bot 2", battle_tracker)
-
-    try:
-        # Start the battle - this runs locally without Showdown server
-        await player1.battle_against(player2, n_battles=1)
-
-        # Finalize tracking
-        battle_tracker.finalize()
-
-        # Determine winner
-        if player1.n_won_battles > player2.n_won_battles:
-            winner = f"Bot 1 ({bot1_type.title()})"
-        elif player2.n_won_battles > player1.n_won_battles:
-            winner = f"Bot 2 ({bot2_type.title()})"
-        else:
-            winner = "Tie"
-
-        battle_log = battle_tracker.get_battle_log()
-
-        return {
-            "winner": winner,
-            "battle_log": battle_log,
-            "bot1_wins": player1.n_won_battles,
-            "bot2_wins": player2.n_won_battles
-        }
-    finally:
-        await player1.close()
-        await player2.close()
+battle_service = BattleService(create_player, BattleTracker, BOT_TYPES)
 
 @app.route('/')
 def index():
@@ -239,14 +206,41 @@ def battle():
     if not bot1_type or not bot2_type:
         return jsonify({"error": "Both bot types must be specified"}), 400
 
-    # Run the battle
+    # Queue the battle; the client follows it through the events stream
     try:
-        result = asyncio.run(run_battle(bot1_type, bot2_type))
-        return jsonify(result)
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
-        return jsonify({"error": str(e)}), 500
+        job = battle_service.submit(bot1_type, bot2_type)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"job_id": job.id, "status": job.status, "events_url": f"/battle/{job.id}/events"}), 202
+
+@app.route('/battle/<job_id>')
+def battle_status(job_id):
+    job = battle_service.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown battle job"}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/battle/<job_id>/events')
+def battle_events(job_id):
+    job = battle_service.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown battle job"}), 404
+
+    def stream():
+        cursor = 0
+        while True:
+            events = job.wait_for_events(cursor)
+            if not events:
+                # Keep idle connections open through proxies
+                yield ": keepalive\n\n"
+                continue
+            cursor += len(events)
+            for event in events:
+                yield f"data: {json.dumps(event)}\n\n"
+            if events[-1]["type"] in ("finished", "failed"):
+                return
+
+    return Response(stream(), mimetype='text/event-stream', headers={"Cache-Control": "no-cache"})
 
 if __name__ == '__main__':
-    app.run(debug=True, port=5000)
+    app.run(debug=True, port=5000, threaded=True, use_reloader=False)
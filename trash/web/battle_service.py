@@ -0,0 +1,162 @@
+import asyncio
+import threading
+import time
+import uuid
+from collections import OrderedDict, defaultdict
+
+from poke_env.concurrency import POKE_LOOP
+
+
+class BattleJob:
+    """A queued battle request whose events can be streamed while it runs"""
+    def __init__(self, bot1_type, bot2_type):
+        self.id = uuid.uuid4().hex
+        self.bot1_type = bot1_type
+        self.bot2_type = bot2_type
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.events = []
+        self._condition = threading.Condition()
+
+    def publish(self, event):
+        """Append an event and wake up any stream waiting on this job"""
+        with self._condition:
+            self.events.append(event)
+            self._condition.notify_all()
+
+    def finish(self, status, result=None, error=None):
+        with self._condition:
+            self.status = status
+            self.result = result
+            self.error = error
+            self.events.append({"type": status, "result": result, "error": error})
+            self._condition.notify_all()
+
+    @property
+    def done(self):
+        return self.status in ("finished", "failed")
+
+    def wait_for_events(self, cursor, timeout=15.0):
+        """Block until there are events past cursor, the job is done, or timeout expires"""
+        with self._condition:
+            if cursor >= len(self.events) and not self.done:
+                self._condition.wait(timeout)
+            return self.events[cursor:]
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "bot1": self.bot1_type,
+            "bot2": self.bot2_type,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class BattleService:
+    """Runs battles on the poke-env event loop with a warm pool of logged-in players"""
+    def __init__(self, player_factory, tracker_factory, bot_types, workers=4, warm_players=1, max_finished_jobs=200):
+        self.player_factory = player_factory
+        self.tracker_factory = tracker_factory
+        self.bot_types = list(bot_types)
+        self.workers = workers
+        self.warm_players = warm_players
+        self.max_finished_jobs = max_finished_jobs
+        self.jobs = OrderedDict()
+        self._jobs_lock = threading.Lock()
+        self._queue = None
+        self._idle = {}
+        self._created = defaultdict(int)
+        self._started = False
+
+    def start(self):
+        """Log in the warm players and start the worker tasks"""
+        if not self._started:
+            asyncio.run_coroutine_threadsafe(self._start(), POKE_LOOP).result()
+            self._started = True
+
+    async def _start(self):
+        self._queue = asyncio.Queue()
+        self._idle = {bot_type: asyncio.Queue() for bot_type in self.bot_types}
+        for bot_type in self.bot_types:
+            for _ in range(self.warm_players):
+                self._idle[bot_type].put_nowait(self._create_player(bot_type))
+        for _ in range(self.workers):
+            POKE_LOOP.create_task(self._worker())
+
+    def submit(self, bot1_type, bot2_type):
+        """Queue a battle and return its job immediately"""
+        for bot_type in (bot1_type, bot2_type):
+            if bot_type not in self.bot_types:
+                raise ValueError(f"Unknown bot type: {bot_type}")
+        self.start()
+        job = BattleJob(bot1_type, bot2_type)
+        with self._jobs_lock:
+            self.jobs[job.id] = job
+        POKE_LOOP.call_soon_threadsafe(self._queue.put_nowait, job)
+        return job
+
+    def get(self, job_id):
+        with self._jobs_lock:
+            return self.jobs.get(job_id)
+
+    def _create_player(self, bot_type):
+        self._created[bot_type] += 1
+        return self.player_factory(bot_type, bot_type.title(), None)
+
+    async def _acquire(self, bot_type):
+        idle = self._idle[bot_type]
+        if idle.empty() and self._created[bot_type] < self.workers * 2:
+            return self._create_player(bot_type)
+        return await idle.get()
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run_job(job)
+            except Exception as e:
+                job.finish("failed", error=str(e))
+            finally:
+                self._forget_finished_jobs()
+
+    async def _run_job(self, job):
+        player1 = await self._acquire(job.bot1_type)
+        player2 = await self._acquire(job.bot2_type)
+        try:
+            job.status = "running"
+            job.publish({"type": "started", "bot1": job.bot1_type, "bot2": job.bot2_type})
+            battle = await self._play(job, player1, player2)
+        finally:
+            player1.battle_tracker = None
+            player2.battle_tracker = None
+            self._idle[job.bot1_type].put_nowait(player1)
+            self._idle[job.bot2_type].put_nowait(player2)
+
+        winners = {"Bot 1": f"Bot 1 ({job.bot1_type.title()})", "Bot 2": f"Bot 2 ({job.bot2_type.title()})"}
+        job.finish("finished", result={
+            "winner": winners.get(battle["winner"], "Tie"),
+            "battle_log": battle["battle_log"],
+            "bot1_wins": int(battle["winner"] == "Bot 1"),
+            "bot2_wins": int(battle["winner"] == "Bot 2"),
+        })
+
+    async def _play(self, job, player1, player2):
+        job.tracker = self.tracker_factory(job.publish)
+        player1.battle_tracker = job.tracker
+        player2.battle_tracker = job.tracker
+        player1.bot_name = "Bot 1"
+        player2.bot_name = "Bot 2"
+
+        await player1.battle_against(player2, n_battles=1)
+        return job.tracker.export(job.tracker.finished_battles()[-1])
+
+    def _forget_finished_jobs(self):
+        """Keep only the most recent finished jobs so the service has bounded memory"""
+        with self._jobs_lock:
+            finished = [job_id for job_id, job in self.jobs.items() if job.done]
+            for job_id in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+                del self.jobs[job_id]
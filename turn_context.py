@@ -0,0 +1,108 @@
+from collections import defaultdict
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from poke_env.battle import AbstractBattle
+
+from damage_calc import damage_ranges
+from set_inference import likely_threat
+from type_tables import move_multiplier, is_stab
+
+
+def _effectiveness(battle: AbstractBattle, move, target) -> float:
+    return move_multiplier(move, target) if target and move.type else 1.0
+
+
+def _stab(battle: AbstractBattle, move, target) -> bool:
+    active = battle.active_pokemon
+    return bool(active) and is_stab(move, active)
+
+
+def _boost_total(battle: AbstractBattle, move, target) -> int:
+    boosts = move.boosts
+    return sum(boosts.values()) if boosts else 0
+
+
+def _damage(battle: AbstractBattle, move, target):
+    return damage_ranges(battle, [move], target)[0]
+
+
+def _threat(battle: AbstractBattle, move, target) -> float:
+    active = battle.active_pokemon
+    return likely_threat(target, active) if target and active else 1.0
+
+
+FACTS: Dict[str, Callable[[AbstractBattle, Any, Any], Any]] = {
+    'effectiveness': _effectiveness,
+    'stab': _stab,
+    'boost_total': _boost_total,
+    'damage': _damage,
+    'threat': _threat,
+}
+
+
+def depends_on(*fact_names: str):
+    unknown = [name for name in fact_names if name not in FACTS]
+    if unknown:
+        raise ValueError(f"Unknown check facts: {unknown}")
+
+    def decorator(check_function):
+        check_function.depends_on = fact_names
+        return check_function
+    return decorator
+
+
+def compute_facts(battle: AbstractBattle, move, target, fact_names: Iterable[str]) -> Dict[str, Any]:
+    return {name: FACTS[name](battle, move, target) for name in fact_names}
+
+
+class TurnEvaluationContext:
+
+    def __init__(self, collect_stats: bool = False):
+        self.collect_stats = collect_stats
+        self._caches: Dict[str, Tuple[int, Dict[tuple, Dict[str, Any]]]] = {}
+        self._battle: Optional[AbstractBattle] = None
+        self._cache: Dict[tuple, Dict[str, Any]] = {}
+        self._active_species: Optional[str] = None
+        self.hits: Dict[str, int] = defaultdict(int)
+        self.misses: Dict[str, int] = defaultdict(int)
+
+    def begin(self, battle: AbstractBattle):
+        entry = self._caches.get(battle.battle_tag)
+        if entry is None or entry[0] != battle.turn:
+            entry = (battle.turn, {})
+            self._caches[battle.battle_tag] = entry
+        active = battle.active_pokemon
+        self._battle = battle
+        self._cache = entry[1]
+        self._active_species = active.species if active else None
+
+    def facts(self, battle: AbstractBattle, move, target, fact_names: Iterable[str], requester: str) -> Dict[str, Any]:
+        if battle is not self._battle:
+            self.begin(battle)
+        key = (move.id, target.species if target else None, self._active_species)
+
+        facts = self._cache.get(key)
+        if facts is None:
+            facts = self._cache[key] = {}
+        for name in fact_names:
+            if name in facts:
+                if self.collect_stats:
+                    self.hits[requester] += 1
+            else:
+                if self.collect_stats:
+                    self.misses[requester] += 1
+                facts[name] = FACTS[name](battle, move, target)
+        return facts
+
+    def forget(self, battle_tag: str):
+        self._caches.pop(battle_tag, None)
+        if self._battle is not None and self._battle.battle_tag == battle_tag:
+            self._battle = None
+            self._cache = {}
+
+    def hit_rates(self) -> Dict[str, float]:
+        return {
+            name: self.hits[name] / (self.hits[name] + self.misses[name])
+            for name in set(self.hits) | set(self.misses)
+            if self.hits[name] + self.misses[name]
+        }
@@ -0,0 +1,112 @@
+from datetime import datetime
+from typing import Optional, List, Dict, Any, Callable, Tuple
+from poke_env.battle import AbstractBattle, Move
+from poke_env.player.battle_order import BattleOrder
+
+TURN_FIELDS = [
+    'timestamp', 'battle_tag', 'turn', 'player_username',
+    'active_pokemon', 'active_hp', 'active_max_hp', 'active_hp_fraction',
+    'active_status', 'active_atk', 'active_def', 'active_spa', 'active_spd', 'active_spe',
+    'opponent_pokemon', 'opponent_hp', 'opponent_max_hp', 'opponent_hp_fraction',
+    'opponent_status', 'opponent_atk', 'opponent_def', 'opponent_spa', 'opponent_spd', 'opponent_spe',
+    'selected_move', 'selected_move_type', 'selected_move_category',
+    'selected_move_base_power', 'selected_move_accuracy',
+    'available_moves', 'available_switches',
+    'damage_dealt', 'fainted', 'won_battle'
+]
+
+
+_LOCALS = {
+    'active': "active = battle.active_pokemon",
+    'opponent': "opponent = battle.opponent_active_pokemon",
+    'active_stats': "active_stats = active.base_stats if active else None",
+    'opponent_stats': "opponent_stats = opponent.base_stats if opponent else None",
+}
+
+_LOCAL_DEPENDENCIES = {
+    'active': [],
+    'opponent': [],
+    'active_stats': ['active'],
+    'opponent_stats': ['opponent'],
+}
+
+FIELD_EXPRESSIONS: Dict[str, Tuple[str, List[str]]] = {
+    'timestamp': ("now().isoformat()", []),
+    'battle_tag': ("battle.battle_tag", []),
+    'turn': ("battle.turn", []),
+    'player_username': ("username", []),
+    'selected_move': ("move.id if move is not None else None", []),
+    'selected_move_type': ("move.type.name if move is not None and move.type else None", []),
+    'selected_move_category': ("move.category.name if move is not None and move.category else None", []),
+    'selected_move_base_power': ("move.base_power if move is not None else None", []),
+    'selected_move_accuracy': ("move.accuracy if move is not None else None", []),
+    'available_moves': ("'|'.join([m.id for m in battle.available_moves])", []),
+    'available_switches': ("'|'.join([p.species for p in battle.available_switches])", []),
+    'damage_dealt': ("damage_dealt", []),
+    'fainted': ("1 if opponent and opponent.fainted else 0", ['opponent']),
+    'won_battle': ("(1 if battle.won else 0 if battle.lost else -1) if battle.finished else None", []),
+}
+
+for _side in ('active', 'opponent'):
+    FIELD_EXPRESSIONS[f'{_side}_pokemon'] = (f"{_side}.species if {_side} else None", [_side])
+    FIELD_EXPRESSIONS[f'{_side}_hp'] = (f"{_side}.current_hp if {_side} else None", [_side])
+    FIELD_EXPRESSIONS[f'{_side}_max_hp'] = (f"{_side}.max_hp if {_side} else None", [_side])
+    FIELD_EXPRESSIONS[f'{_side}_hp_fraction'] = (f"{_side}.current_hp_fraction if {_side} else None", [_side])
+    FIELD_EXPRESSIONS[f'{_side}_status'] = (f"{_side}.status.name if {_side} and {_side}.status else None", [_side])
+    for _stat in ('atk', 'def', 'spa', 'spd', 'spe'):
+        FIELD_EXPRESSIONS[f'{_side}_{_stat}'] = (f"{_side}_stats.get('{_stat}') if {_side} else None", [f'{_side}_stats'])
+
+
+def _compile_extractor(fields: List[str]) -> Callable[..., Dict[str, Any]]:
+    needed: List[str] = []
+
+    def require(name: str):
+        for dependency in _LOCAL_DEPENDENCIES[name]:
+            require(dependency)
+        if name not in needed:
+            needed.append(name)
+
+    for name in fields:
+        for local in FIELD_EXPRESSIONS[name][1]:
+            require(local)
+
+    body = [f"    {_LOCALS[name]}" for name in needed]
+    items = ',\n'.join(f"        {name!r}: {FIELD_EXPRESSIONS[name][0]}" for name in fields)
+    source = (
+        "def extract(battle, username, move, damage_dealt):\n"
+        + ''.join(line + '\n' for line in body)
+        + "    return {\n" + items + "\n    }\n"
+    )
+    namespace = {'now': datetime.now}
+    exec(compile(source, f"<turn extractor {len(fields)} fields>", 'exec'), namespace)
+    return namespace['extract']
+
+
+class TurnFeatureExtractor:
+
+    def __init__(self, fields: Optional[List[str]] = None):
+        self.fields = list(fields) if fields is not None else list(TURN_FIELDS)
+        unknown = [name for name in self.fields if name not in FIELD_EXPRESSIONS]
+        if unknown:
+            raise ValueError(f"Unknown turn fields: {unknown}")
+        self._extract = _compile_extractor(self.fields)
+        self._track_damage = 'damage_dealt' in self.fields
+        self.previous_opponent_hp: Dict[str, int] = {}
+
+    def extract(self, battle: AbstractBattle, username: str, selected_move: Optional[BattleOrder] = None) -> Dict[str, Any]:
+        order = getattr(selected_move, 'order', None)
+        move = order if isinstance(order, Move) else None
+        damage_dealt = self._damage_dealt(battle) if self._track_damage else 0.0
+        return self._extract(battle, username, move, damage_dealt)
+
+    def forget(self, battle_tag: str):
+        self.previous_opponent_hp.pop(battle_tag, None)
+
+    def _damage_dealt(self, battle: AbstractBattle) -> float:
+        opponent = battle.opponent_active_pokemon
+        if not opponent:
+            return 0.0
+        current_hp = opponent.current_hp
+        previous_hp = self.previous_opponent_hp.get(battle.battle_tag, current_hp)
+        self.previous_opponent_hp[battle.battle_tag] = current_hp
+        return previous_hp - current_hp
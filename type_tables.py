@@ -0,0 +1,95 @@
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from poke_env.battle import Move, PokemonType
+from poke_env.data import GenData
+
+TYPES = list(PokemonType)
+TYPE_INDEX: Dict[Optional[PokemonType], int] = {t: i for i, t in enumerate(TYPES)}
+NO_TYPE = len(TYPES)
+TYPE_INDEX[None] = NO_TYPE
+N_TYPE_SLOTS = NO_TYPE + 1
+
+_NEUTRAL_TYPES = {PokemonType.THREE_QUESTION_MARKS, PokemonType.STELLAR}
+
+
+class TypeTables:
+
+    def __init__(self, gen: int):
+        self.gen = gen
+        data = GenData.from_gen(gen)
+        chart = data.type_chart
+
+        self.effectiveness = np.ones((N_TYPE_SLOTS, N_TYPE_SLOTS))
+        for attacker in TYPES:
+            for defender in TYPES:
+                if defender.name in chart and attacker.name in chart[defender.name]:
+                    self.effectiveness[TYPE_INDEX[attacker], TYPE_INDEX[defender]] = chart[defender.name][attacker.name]
+
+        self.pair_multiplier = self.effectiveness[:, :, None] * self.effectiveness[:, None, :]
+        for neutral in _NEUTRAL_TYPES:
+            self.pair_multiplier[TYPE_INDEX[neutral], :, :] = 1.0
+            self.pair_multiplier[:, TYPE_INDEX[neutral], :] = 1.0
+        self.pair_lookup = self.pair_multiplier.tolist()
+
+        self.species_types: Dict[str, Tuple[int, int]] = {}
+        self.species_mask: Dict[str, int] = {}
+        for species, entry in data.pokedex.items():
+            types = [PokemonType[name.upper()] for name in entry.get('types', []) if name.upper() in PokemonType.__members__][:2]
+            if not types:
+                continue
+            indices = (TYPE_INDEX[types[0]], TYPE_INDEX[types[1]] if len(types) > 1 else NO_TYPE)
+            self.species_types[species] = indices
+            self.species_mask[species] = type_mask(*indices)
+
+    def multiplier(self, attacking_type: int, type_1: int, type_2: int = NO_TYPE) -> float:
+        return self.pair_lookup[attacking_type][type_1][type_2]
+
+
+def type_mask(*indices: int) -> int:
+    mask = 0
+    for index in indices:
+        if index != NO_TYPE:
+            mask |= 1 << index
+    return mask
+
+
+@lru_cache(maxsize=None)
+def tables_for_gen(gen: int) -> TypeTables:
+    return TypeTables(gen)
+
+
+def tables_for_format(battle_format: str) -> TypeTables:
+    return tables_for_gen(int(battle_format[3]))
+
+
+def pokemon_type_indices(pokemon) -> Tuple[int, int]:
+    return TYPE_INDEX[pokemon.type_1], TYPE_INDEX[pokemon.type_2]
+
+
+def move_multiplier(move: Move, defender) -> float:
+    return tables_for_gen(defender.gen).pair_lookup[TYPE_INDEX[move.type]][TYPE_INDEX[defender.type_1]][TYPE_INDEX[defender.type_2]]
+
+
+def type_multiplier(attacking_type: PokemonType, defender) -> float:
+    return tables_for_gen(defender.gen).pair_lookup[TYPE_INDEX[attacking_type]][TYPE_INDEX[defender.type_1]][TYPE_INDEX[defender.type_2]]
+
+
+def is_stab(move: Move, attacker) -> bool:
+    move_type = move.type
+    return move_type is not None and (move_type is attacker.type_1 or move_type is attacker.type_2)
+
+
+def species_has_type(species: str, pokemon_type: PokemonType, gen: int) -> bool:
+    return bool(tables_for_gen(gen).species_mask.get(species, 0) & (1 << TYPE_INDEX[pokemon_type]))
+
+
+def best_stab_multiplier(attacker, defender) -> float:
+    lookup = tables_for_gen(defender.gen).pair_lookup
+    type_1, type_2 = pokemon_type_indices(defender)
+    return max(lookup[TYPE_INDEX[attacking_type]][type_1][type_2] for attacking_type in attacker.types)
+
+
+for _gen in (8, 9):
+    tables_for_gen(_gen)